@@ -1,14 +1,189 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from fastapi.responses import JSONResponse
-import librosa
-import soundfile as sf
-import io
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import asyncio
+import json
 import base64
-import os
-from app.processors.audio_processor import AudioProcessor
+from app.core.config import settings
+from app.core.executor import get_pool
+from app.core.lazy import lazy_import
+from app.utils.file_handler import FileHandler
+from app.utils.result_cache import result_cache, cached_response
 from app.core.logger import logger
 
 router = APIRouter(prefix="/audio", tags=["Audio Processing"])
+pool = get_pool("audio")
+
+# librosa and soundfile load on first use, or at startup when "audio" is in WARMUP_MODALITIES
+AudioProcessor = lazy_import("audio", "app.processors.audio_processor", "AudioProcessor")
+Spectrogram = lazy_import("audio", "app.processors.audio_processor", "Spectrogram")
+sf = lazy_import("audio", "soundfile")
+
+def _encode_base64(y, sr: int, encoding=None) -> str:
+    audio_bytes = AudioProcessor.encode(y, sr, **encoding) if encoding else AudioProcessor.save_audio(y, sr)
+    return base64.b64encode(audio_bytes).decode('utf-8')
+
+def _encoding_options(output_format: str, quality: int, compression: int):
+    try:
+        return AudioProcessor.encoding_options(output_format, quality, compression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _check_response_mode(response_mode: str, allowed) -> str:
+    response_mode = (response_mode or "json").lower()
+    if response_mode not in allowed:
+        raise HTTPException(status_code=400, detail=f"response_mode must be one of: {', '.join(allowed)}")
+    return response_mode
+
+def _check_resampling(sample_rate, res_type: str) -> None:
+    if res_type not in AudioProcessor.RESAMPLERS:
+        raise HTTPException(status_code=400, detail=f"res_type must be one of: {', '.join(AudioProcessor.RESAMPLERS)}")
+    if sample_rate is not None and not 1000 <= sample_rate <= 384000:
+        raise HTTPException(status_code=400, detail="sample_rate must be between 1000 and 384000")
+
+def _upload_audio(source, sample_rate, res_type: str):
+    with FileHandler.open_source(source) as buffer:
+        info = AudioProcessor.read_info(buffer)
+        y, sr = AudioProcessor.load(buffer, sr=sample_rate, res_type=res_type)
+        
+        # Echo the original bytes unless a different rate was requested
+        resampled = info is None or sr != info["sample_rate"]
+        if not resampled:
+            buffer.seek(0)
+            audio_base64 = base64.b64encode(buffer.read()).decode('utf-8')
+    
+    validation = AudioProcessor.validate_audio(y, sr)
+    if info is not None:
+        validation.update({
+            "num_channels": info["num_channels"],
+            "is_mono": info["num_channels"] == 1,
+            "format": info["format"],
+            "subtype": info["subtype"]
+        })
+    if resampled:
+        audio_base64 = _encode_base64(y, sr)
+    return validation, audio_base64, resampled
+
+def _run_preprocess(source, normalize: bool, remove_silence: bool, reduce_noise: bool,
+                    sample_rate=None, res_type: str = "soxr_hq"):
+    with FileHandler.open_source(source) as buffer:
+        y, sr = AudioProcessor.load(buffer, sr=sample_rate, res_type=res_type)
+    logger.info("Audio file loaded successfully")
+    
+    # Process the audio
+    result = AudioProcessor.preprocess(
+        y, sr,
+        normalize=normalize,
+        remove_silence=remove_silence,
+        reduce_noise=reduce_noise
+    )
+    
+    logger.info("Audio preprocessing completed")
+    return result
+
+def _preprocess_audio(source, normalize: bool, remove_silence: bool, reduce_noise: bool,
+                      sample_rate=None, res_type: str = "soxr_hq", encoding=None):
+    result = _run_preprocess(source, normalize, remove_silence, reduce_noise, sample_rate, res_type)
+    return {
+        "data": AudioProcessor.encode(result["processed_audio"], result["sample_rate"], **encoding),
+        "steps": result["steps"],
+        "sample_rate": result["sample_rate"]
+    }
+
+def _analyze_audio_stream(source):
+    with FileHandler.open_source(source) as f:
+        try:
+            return AudioProcessor.analyze_stream(f, settings.AUDIO_STREAM_BLOCK_SIZE)
+        except sf.LibsndfileError as e:
+            raise HTTPException(status_code=415, detail=f"Unsupported audio format for streaming: {str(e)}")
+
+def _preprocess_audio_stream(source, analysis, normalize: bool, remove_silence: bool, reduce_noise: bool,
+                             encoding):
+    with FileHandler.open_source(source) as f:
+        yield from AudioProcessor.preprocess_stream(
+            f,
+            analysis,
+            settings.AUDIO_STREAM_BLOCK_SIZE,
+            normalize=normalize,
+            remove_silence=remove_silence,
+            reduce_noise=reduce_noise,
+            **encoding
+        )
+
+def _stream_chunks(chunks, on_close=None):
+    """Drive a blocking chunk generator on the audio pool from a StreamingResponse"""
+    async def generate():
+        try:
+            # Each chunk is produced on the audio pool; the generator keeps the state
+            while (chunk := await pool.run(next, chunks, None)) is not None:
+                yield chunk
+        except Exception as e:
+            logger.error(f"Error streaming audio: {str(e)}")
+            raise
+        finally:
+            chunks.close()
+            if on_close is not None:
+                on_close()
+    return generate()
+
+def _load_audio(source, sample_rate=None, res_type: str = "soxr_hq"):
+    with FileHandler.open_source(source) as buffer:
+        return AudioProcessor.load(buffer, sr=sample_rate, res_type=res_type)
+
+def _render_augmentations(y, sr: int, group, encoding=None):
+    """Render a group of variants in one worker job; time stretches and pitch shifts share one STFT of y"""
+    spectrogram = Spectrogram(y)
+    results = []
+    for variant_id, name, params in group:
+        result = {"name": variant_id, "augmentation": name, "params": params}
+        try:
+            augmented = AudioProcessor.apply_augmentation(y, sr, name, params, spectrogram)
+            result.update({
+                "step": AudioProcessor.describe_augmentation(name, params),
+                "audio": _encode_base64(augmented, sr, encoding)
+            })
+        except Exception as e:
+            logger.error(f"Error rendering audio augmentation {variant_id}: {str(e)}")
+            result["error"] = str(e)
+        results.append(result)
+    return results
+
+async def _render_variants(y, sr: int, resolved, encoding=None):
+    """
+    Render variants on the audio process pool in one group per worker, so
+    the clip is sent to and transformed by each worker once, yielding each
+    group's variants as it finishes
+    """
+    workers = pool.concurrency(cpu_bound=True)
+    groups = [resolved[start::workers] for start in range(min(workers, len(resolved)))]
+    
+    async def render(group):
+        try:
+            return await pool.run(_render_augmentations, y, sr, group, encoding, cpu_bound=True)
+        except Exception as e:
+            logger.error(f"Error rendering audio augmentations: {str(e)}")
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            return [{"name": variant_id, "augmentation": name, "params": params, "error": detail}
+                    for variant_id, name, params in group]
+    
+    tasks = [asyncio.ensure_future(render(group)) for group in groups]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            for result in await finished:
+                yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def _parse_variants(variants: str):
+    if not variants or not variants.strip():
+        return None
+    variants = variants.strip()
+    if variants[0] in "[{":
+        try:
+            return json.loads(variants)
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid variants: {str(e)}")
+    return [name.strip() for name in variants.split(",") if name.strip()]
 
 @router.options("/upload")
 async def audio_upload_options():
@@ -22,26 +197,27 @@ async def audio_upload_options():
     )
 
 @router.post("/upload")
-async def upload_audio(file: UploadFile = File(...)):
+async def upload_audio(
+    file: UploadFile = File(...),
+    sample_rate: int = Form(None),
+    res_type: str = Form("soxr_hq")
+):
     if not file.content_type.startswith('audio/'):
         raise HTTPException(status_code=400, detail="File must be an audio file")
     
     try:
-        content = await file.read()
-        with io.BytesIO(content) as buffer:
-            y, sr = librosa.load(buffer)
-        
-        validation = AudioProcessor.validate_audio(y, sr)
-        
-        # Convert to base64 for frontend
-        audio_bytes = AudioProcessor.save_audio(y, sr)
-        audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
+        _check_resampling(sample_rate, res_type)
+        with await FileHandler.ingest_upload(file, settings.MAX_AUDIO_SIZE) as upload:
+            validation, audio_base64, resampled = await pool.run(
+                _upload_audio, upload.source, sample_rate, res_type, cpu_bound=True
+            )
         
         return JSONResponse(
             content={
                 "filename": file.filename,
                 "validation": validation,
-                "audio_data": audio_base64
+                "audio_data": audio_base64,
+                "content_type": "audio/wav" if resampled else file.content_type
             },
             headers={
                 "Access-Control-Allow-Origin": "*",
@@ -49,105 +225,250 @@ async def upload_audio(file: UploadFile = File(...)):
                 "Access-Control-Allow-Headers": "*"
             }
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing audio file: {str(e)}")
         raise HTTPException(status_code=500, detail="Error processing audio file")
 
 @router.post("/preprocess")
 async def preprocess_audio(
+    request: Request,
     file: UploadFile = File(...),
     normalize: bool = Form(default=True),
     remove_silence: bool = Form(default=True),
-    reduce_noise: bool = Form(default=True)
+    reduce_noise: bool = Form(default=True),
+    sample_rate: int = Form(None),
+    res_type: str = Form("soxr_hq"),
+    output_format: str = Form("wav"),
+    quality: int = Form(None),
+    compression: int = Form(None),
+    response_mode: str = Form("json")
 ):
+    """
+    Preprocess an audio clip. output_format is wav (16-bit PCM), flac, ogg
+    (Vorbis, quality 1-100) or npy (raw float32). response_mode "json" returns
+    base64 in JSON; "binary" returns the encoded audio as the body, cached and
+    served with Range support (also later from /api/v1/cache/results/{ETag});
+    "stream" sends the encoded audio in chunks as the encoder produces them.
+    """
     if not file.content_type.startswith('audio/'):
         raise HTTPException(status_code=400, detail="File must be an audio file")
     
     try:
+        _check_resampling(sample_rate, res_type)
+        encoding = _encoding_options(output_format, quality, compression)
+        response_mode = _check_response_mode(response_mode, ("json", "binary", "stream"))
+        media_type = AudioProcessor.media_type(encoding["output_format"])
+        filename = f"processed.{AudioProcessor.file_extension(encoding['output_format'])}"
         logger.info(f"Starting audio preprocessing for file: {file.filename}")
-        content = await file.read()
-        
-        # Save the file temporarily
-        temp_path = f"temp_{file.filename}"
-        try:
-            with open(temp_path, "wb") as temp_file:
-                temp_file.write(content)
-            
-            # Load audio using librosa
-            y, sr = librosa.load(temp_path, sr=None)  # Use original sample rate
-            logger.info("Audio file loaded successfully")
+        with await FileHandler.ingest_upload(file, settings.MAX_AUDIO_SIZE) as upload:
+            if response_mode == "stream":
+                result = await pool.run(
+                    _run_preprocess,
+                    upload.source,
+                    normalize=normalize,
+                    remove_silence=remove_silence,
+                    reduce_noise=reduce_noise,
+                    sample_rate=sample_rate,
+                    res_type=res_type,
+                    cpu_bound=True
+                )
+                y, sr = result["processed_audio"], result["sample_rate"]
+                chunks = AudioProcessor.encode_chunks(y, sr, **encoding, block_size=settings.AUDIO_STREAM_BLOCK_SIZE)
+                headers = {"Content-Disposition": f'inline; filename="{filename}"', "X-Sample-Rate": str(sr)}
+                content_length = AudioProcessor.encoded_length(encoding["output_format"], len(y))
+                if content_length is not None:
+                    headers["Content-Length"] = str(content_length)
+                return StreamingResponse(_stream_chunks(chunks), media_type=media_type, headers=headers)
             
-            # Process the audio
-            result = AudioProcessor.preprocess(
-                y, sr,
-                normalize=normalize,
-                remove_silence=remove_silence,
-                reduce_noise=reduce_noise
+            key = result_cache.make_key(
+                upload.hash,
+                "audio/preprocess",
+                {
+                    "normalize": normalize,
+                    "remove_silence": remove_silence,
+                    "reduce_noise": reduce_noise,
+                    "sample_rate": sample_rate,
+                    "res_type": res_type if sample_rate else None,
+                    "encoding": encoding,
+                    "response_mode": response_mode
+                },
+                AudioProcessor.VERSION
             )
             
-            logger.info("Audio preprocessing completed")
+            async def compute():
+                result = await pool.run(
+                    _preprocess_audio,
+                    upload.source,
+                    normalize=normalize,
+                    remove_silence=remove_silence,
+                    reduce_noise=reduce_noise,
+                    sample_rate=sample_rate,
+                    res_type=res_type,
+                    encoding=encoding,
+                    cpu_bound=True
+                )
+                data = result.pop("data")
+                if response_mode == "binary":
+                    return Response(
+                        content=data,
+                        media_type=media_type,
+                        headers={
+                            "Content-Disposition": f'inline; filename="{filename}"',
+                            "X-Sample-Rate": str(result["sample_rate"])
+                        }
+                    )
+                return JSONResponse(
+                    content={
+                        "processed_audio": base64.b64encode(data).decode('utf-8'),
+                        "media_type": media_type,
+                        **result,
+                        "success": True,
+                        "message": "Audio preprocessing completed successfully"
+                    }
+                )
             
-            # Convert processed audio to bytes and encode in base64
-            audio_bytes = AudioProcessor.save_audio(result["processed_audio"], result["sample_rate"])
-            audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-            
-            return JSONResponse(
-                content={
-                    "processed_audio": audio_base64,
-                    "steps": result["steps"],
-                    "sample_rate": result["sample_rate"],
-                    "success": True,
-                    "message": "Audio preprocessing completed successfully"
-                }
-            )
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-                
+            return await cached_response(request, key, compute)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error preprocessing audio: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/augment")
-async def augment_audio(file: UploadFile = File(...)):
+async def augment_audio(
+    request: Request,
+    file: UploadFile = File(...),
+    variants: str = Form(None),
+    seed: int = Form(None),
+    stream: bool = Form(False),
+    sample_rate: int = Form(None),
+    res_type: str = Form("soxr_hq"),
+    output_format: str = Form("wav"),
+    quality: int = Form(None),
+    compression: int = Form(None)
+):
+    """
+    Augment an audio clip. variants selects from AudioProcessor.AUGMENTATIONS,
+    e.g. "pitch_shifted,reversed" or
+    {"pitch_shifted": {"n_steps": [-4, 4], "count": 10}, "time_stretched": {"rate": 0.8}}.
+    Ranges are drawn uniformly (reproducibly when seed is given). Variants render
+    in parallel on the audio process pool, one group per worker sharing an STFT;
+    with stream=true (or Accept: application/x-ndjson) each is sent as one
+    NDJSON line as soon as its group finishes.
+    output_format is wav, flac, ogg or npy, as for /preprocess.
+    """
     if not file.content_type.startswith('audio/'):
         raise HTTPException(status_code=400, detail="File must be an audio file")
     
     try:
-        content = await file.read()
-        
-        # Save the file temporarily
-        temp_path = f"temp_{file.filename}"
+        _check_resampling(sample_rate, res_type)
+        encoding = _encoding_options(output_format, quality, compression)
+        media_type = AudioProcessor.media_type(encoding["output_format"])
         try:
-            with open(temp_path, "wb") as temp_file:
-                temp_file.write(content)
-            
-            # Load audio using librosa
-            y, sr = librosa.load(temp_path, sr=None)  # Use original sample rate
-            
-            result = AudioProcessor.augment(y, sr)
-            augmented_files = {}
-            
-            # Convert each augmented audio to base64
-            for name, audio in result["augmented_audio"].items():
-                audio_bytes = AudioProcessor.save_audio(audio, result["sample_rate"])
-                augmented_files[name] = base64.b64encode(audio_bytes).decode('utf-8')
+            resolved = AudioProcessor.resolve_augmentations(_parse_variants(variants), seed)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        with await FileHandler.ingest_upload(file, settings.MAX_AUDIO_SIZE) as upload:
+            if stream or "application/x-ndjson" in request.headers.get("accept", ""):
+                y, sr = await pool.run(_load_audio, upload.source, sample_rate, res_type, cpu_bound=True)
+                
+                async def generate():
+                    async for result in _render_variants(y, sr, resolved, encoding):
+                        yield (json.dumps({**result, "media_type": media_type, "sample_rate": sr}) + "\n").encode('utf-8')
+                
+                return StreamingResponse(generate(), media_type="application/x-ndjson")
             
-            return JSONResponse(
-                content={
-                    "steps": result["steps"],
-                    "augmented_audio": augmented_files,
-                    "sample_rate": result["sample_rate"],
-                    "success": True,
-                    "message": "Audio augmentation completed successfully"
-                }
+            key = result_cache.make_key(
+                upload.hash,
+                "audio/augment",
+                {
+                    "variants": resolved,
+                    "sample_rate": sample_rate,
+                    "res_type": res_type if sample_rate else None,
+                    "encoding": encoding
+                },
+                AudioProcessor.VERSION
             )
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+            
+            async def compute():
+                y, sr = await pool.run(_load_audio, upload.source, sample_rate, res_type, cpu_bound=True)
+                results = {}
+                async for result in _render_variants(y, sr, resolved, encoding):
+                    if "error" in result:
+                        raise HTTPException(status_code=500, detail=f"Error rendering {result['name']}: {result['error']}")
+                    results[result["name"]] = result
                 
+                ordered = [results[variant_id] for variant_id, _, _ in resolved]
+                return JSONResponse(
+                    content={
+                        "steps": [result["step"] for result in ordered],
+                        "augmented_audio": {result["name"]: result["audio"] for result in ordered},
+                        "media_type": media_type,
+                        "sample_rate": sr,
+                        "success": True,
+                        "message": "Audio augmentation completed successfully"
+                    }
+                )
+            
+            return await cached_response(request, key, compute)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error augmenting audio: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/preprocess/stream")
+async def preprocess_audio_stream(
+    file: UploadFile = File(...),
+    normalize: bool = Form(default=True),
+    remove_silence: bool = Form(default=True),
+    reduce_noise: bool = Form(default=True),
+    output_format: str = Form("wav"),
+    quality: int = Form(None),
+    compression: int = Form(None)
+):
+    """
+    Preprocess long recordings block by block and stream the result as mono
+    wav, flac, ogg or npy. Memory use does not grow with the duration of the input.
+    """
+    if not file.content_type.startswith('audio/'):
+        raise HTTPException(status_code=400, detail="File must be an audio file")
+    
+    encoding = _encoding_options(output_format, quality, compression)
+    upload = await FileHandler.ingest_upload(file, settings.MAX_AUDIO_STREAM_SIZE)
+    try:
+        analysis = await pool.run(_analyze_audio_stream, upload.source)
+    except HTTPException:
+        upload.close()
+        raise
+    except Exception as e:
+        upload.close()
+        logger.error(f"Error analyzing audio stream: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    chunks = _preprocess_audio_stream(
+        upload.source,
+        analysis,
+        normalize=normalize,
+        remove_silence=remove_silence,
+        reduce_noise=reduce_noise,
+        encoding=encoding
+    )
+    
+    start, end = analysis["trim"] if remove_silence else (0, analysis["length"])
+    extension = AudioProcessor.file_extension(encoding["output_format"])
+    headers = {
+        "Content-Disposition": f'attachment; filename="preprocessed.{extension}"',
+        "X-Sample-Rate": str(analysis["sample_rate"])
+    }
+    content_length = AudioProcessor.encoded_length(encoding["output_format"], end - start)
+    if content_length is not None:
+        headers["Content-Length"] = str(content_length)
+    return StreamingResponse(
+        _stream_chunks(chunks, on_close=upload.close),
+        media_type=AudioProcessor.media_type(encoding["output_format"]),
+        headers=headers
+    )
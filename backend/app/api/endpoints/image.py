@@ -1,12 +1,27 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from fastapi.responses import JSONResponse
-from PIL import Image
-import io
-from app.processors.image_processor import ImageProcessor
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from contextlib import ExitStack
+from typing import List
+import asyncio
+import json
+import os
+import tempfile
+import zipfile
+from app.core.config import settings
+from app.core.executor import get_pool
+from app.core.lazy import lazy_import
+from app.utils.file_handler import FileHandler
+from app.utils.result_cache import result_cache, cached_response
+from app.utils.multipart import encode_end, encode_multipart, encode_part, multipart_media_type, new_boundary
 from app.core.logger import logger
 import base64
 
 router = APIRouter(prefix="/image", tags=["Image Processing"])
+pool = get_pool("image")
+
+# PIL and NumPy load on first use, or at startup when "image" is in WARMUP_MODALITIES
+Image = lazy_import("image", "PIL.Image")
+ImageProcessor = lazy_import("image", "app.processors.image_processor", "ImageProcessor")
 
 # Helper function to create CORS headers
 def get_cors_headers():
@@ -17,6 +32,122 @@ def get_cors_headers():
         "Access-Control-Expose-Headers": "*"
     }
 
+def _encode_base64(data: bytes) -> str:
+    return base64.b64encode(data).decode('utf-8')
+
+def _encoding_options(output_format: str, quality: int, compression: int):
+    try:
+        return ImageProcessor.encoding_options(output_format, quality, compression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _check_response_mode(response_mode: str, allowed) -> str:
+    response_mode = (response_mode or "json").lower()
+    if response_mode not in allowed:
+        raise HTTPException(status_code=400, detail=f"response_mode must be one of: {', '.join(allowed)}")
+    return response_mode
+
+def _upload_image(source):
+    with FileHandler.open_source(source) as f:
+        # Image.open only parses the header; the pixels are never decoded here
+        image = Image.open(f)
+        validation = ImageProcessor.validate_image(image)
+        content_type = Image.MIME.get(image.format, "application/octet-stream")
+        original_size = image.size
+        
+        # Echo the original bytes instead of re-encoding them
+        f.seek(0)
+        img_base64 = base64.b64encode(f.read()).decode('utf-8')
+        return validation, img_base64, original_size, content_type
+
+def _preprocess_image(source, resize, grayscale: bool, normalize: bool, encoding):
+    with FileHandler.open_source(source) as f:
+        image = Image.open(f)
+        original_size = image.size
+        
+        result = ImageProcessor.preprocess(
+            image,
+            resize=resize,
+            grayscale=grayscale,
+            normalize=normalize
+        )
+    
+    return {
+        "data": ImageProcessor.encode(result["processed_image"], **encoding),
+        "original_size": original_size,
+        "processed_size": result["processed_image"].size,
+        "steps": result["steps"]
+    }
+
+def _preprocess_image_batch(named_sources, resize, grayscale: bool, normalize: bool, encoding):
+    images = []
+    original_sizes = []
+    for _, source in named_sources:
+        with FileHandler.open_source(source) as f:
+            image = Image.open(f)
+            original_sizes.append(image.size)
+            if resize and ImageProcessor._is_downscale(image.size, resize):
+                ImageProcessor.draft(image, resize)
+            image.load()
+        images.append(image)
+    
+    result = ImageProcessor.preprocess_batch(
+        images,
+        resize=resize,
+        grayscale=grayscale,
+        normalize=normalize
+    )
+    
+    items = []
+    for (name, _), original_size, processed in zip(named_sources, original_sizes, result["processed_images"]):
+        items.append({
+            "name": name,
+            "data": ImageProcessor.encode(processed, **encoding),
+            "original_size": original_size,
+            "processed_size": processed.size
+        })
+    return {"items": items, "steps": result["steps"]}
+
+def _augment_image(source, variants, encoding):
+    with FileHandler.open_source(source) as f:
+        result = ImageProcessor.augment(Image.open(f), variants)
+    
+    augmented_images = {
+        name: ImageProcessor.encode(img, **encoding) for name, img in result["augmented_images"].items()
+    }
+    
+    return {
+        "steps": result["steps"],
+        "augmented_images": augmented_images
+    }
+
+def _load_image(source) -> "Image.Image":
+    with FileHandler.open_source(source) as f:
+        image = Image.open(f)
+        image.load()
+    return image if image.mode == 'RGB' else image.convert('RGB')
+
+def _augment_variant(image: "Image.Image", name: str, params, encoding):
+    augmented = ImageProcessor.apply_augmentation(image, name, params)
+    return {
+        "name": name,
+        "step": ImageProcessor.describe_augmentation(name, params),
+        "size": augmented.size,
+        "data": ImageProcessor.encode(augmented, **encoding)
+    }
+
+def _parse_variants(variants: str):
+    """Accept a JSON list/object or a comma-separated list of variant names"""
+    if not variants or not variants.strip():
+        return None
+    variants = variants.strip()
+    if variants[0] in "[{":
+        try:
+            return json.loads(variants)
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid variants: {str(e)}")
+    return [name.strip() for name in variants.split(",") if name.strip()]
+
 @router.options("/{path:path}")
 async def options_route(path: str):
     return JSONResponse(
@@ -30,95 +161,288 @@ async def upload_image(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="File must be an image")
     
     try:
-        content = await file.read()
-        image = Image.open(io.BytesIO(content))
-        validation = ImageProcessor.validate_image(image)
-        
-        # Convert image to base64
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format=image.format or 'PNG')
-        img_base64 = base64.b64encode(img_byte_arr.getvalue()).decode('utf-8')
+        with await FileHandler.ingest_upload(file, settings.MAX_IMAGE_SIZE) as upload:
+            validation, img_base64, original_size, content_type = await pool.run(_upload_image, upload.source)
         
         return JSONResponse(
             content={
                 "filename": file.filename,
                 "validation": validation,
                 "image_data": img_base64,
-                "original_size": image.size
+                "content_type": content_type,
+                "original_size": original_size
             },
             headers=get_cors_headers()
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing image: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/preprocess")
 async def preprocess_image(
+    request: Request,
     file: UploadFile = File(...),
     resize_width: int = Form(None),
     resize_height: int = Form(None),
     grayscale: bool = Form(False),
-    normalize: bool = Form(False)
+    normalize: bool = Form(False),
+    output_format: str = Form("png"),
+    quality: int = Form(None),
+    compression: int = Form(None),
+    response_mode: str = Form("json")
 ):
+    """
+    Preprocess an image. output_format is png, jpeg, webp or npy (raw uint8 array).
+    response_mode "json" returns base64 in JSON, "binary" returns the encoded
+    image as the body, and "multipart" returns a multipart/mixed body with a JSON
+    metadata part followed by the image part.
+    """
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
     
     try:
-        content = await file.read()
-        image = Image.open(io.BytesIO(content))
-        original_size = image.size
-        
-        result = ImageProcessor.preprocess(
-            image,
-            resize=(resize_width, resize_height) if resize_width and resize_height else None,
-            grayscale=grayscale,
-            normalize=normalize
-        )
+        resize = (resize_width, resize_height) if resize_width and resize_height else None
+        encoding = _encoding_options(output_format, quality, compression)
+        response_mode = _check_response_mode(response_mode, ("json", "binary", "multipart"))
+        media_type = ImageProcessor.media_type(encoding["output_format"])
+        filename = f"processed.{ImageProcessor.file_extension(encoding['output_format'])}"
         
-        # Convert processed image to base64
-        img_byte_arr = io.BytesIO()
-        result["processed_image"].save(img_byte_arr, format='PNG')
-        img_base64 = base64.b64encode(img_byte_arr.getvalue()).decode('utf-8')
-        
-        return JSONResponse(
-            content={
-                "processed_image": img_base64,
-                "original_size": original_size,
-                "processed_size": result["processed_image"].size,
-                "steps": result["steps"]
-            },
-            headers=get_cors_headers()
-        )
+        with await FileHandler.ingest_upload(file, settings.MAX_IMAGE_SIZE) as upload:
+            key = result_cache.make_key(
+                upload.hash,
+                "image/preprocess",
+                {
+                    "resize": resize,
+                    "grayscale": grayscale,
+                    "normalize": normalize,
+                    "encoding": encoding,
+                    "response_mode": response_mode
+                },
+                ImageProcessor.VERSION
+            )
+            
+            async def compute():
+                result = await pool.run(
+                    _preprocess_image,
+                    upload.source,
+                    resize=resize,
+                    grayscale=grayscale,
+                    normalize=normalize,
+                    encoding=encoding,
+                    cpu_bound=True
+                )
+                data = result.pop("data")
+                if response_mode == "binary":
+                    return Response(
+                        content=data,
+                        media_type=media_type,
+                        headers={**get_cors_headers(), "Content-Disposition": f'inline; filename="{filename}"'}
+                    )
+                if response_mode == "multipart":
+                    body, multipart_type = encode_multipart([
+                        (json.dumps({**result, "media_type": media_type}).encode('utf-8'), "application/json", None),
+                        (data, media_type, {"Content-Disposition": f'attachment; filename="{filename}"'})
+                    ])
+                    return Response(content=body, media_type=multipart_type, headers=get_cors_headers())
+                return JSONResponse(
+                    content={"processed_image": _encode_base64(data), "media_type": media_type, **result},
+                    headers=get_cors_headers()
+                )
+            
+            return await cached_response(request, key, compute, headers=get_cors_headers())
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error preprocessing image: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/augment")
-async def augment_image(file: UploadFile = File(...)):
+async def augment_image(
+    request: Request,
+    file: UploadFile = File(...),
+    variants: str = Form(None),
+    stream: bool = Form(False),
+    output_format: str = Form("png"),
+    quality: int = Form(None),
+    compression: int = Form(None),
+    response_mode: str = Form("json")
+):
+    """
+    Augment an image. variants selects a subset of ImageProcessor.AUGMENTATIONS,
+    e.g. "rotated,blurred" or {"rotated": {"angle": 45}, "blurred": {"radius": 4}}.
+    output_format is png, jpeg, webp or npy. response_mode "ndjson" (also
+    stream=true or Accept: application/x-ndjson) sends one JSON line per variant,
+    and "multipart" one multipart/mixed part per variant, each as soon as it is
+    encoded; "json" returns every variant base64-encoded in one object.
+    """
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
     
     try:
-        content = await file.read()
-        image = Image.open(io.BytesIO(content))
+        selection = _parse_variants(variants)
+        try:
+            resolved = ImageProcessor.resolve_augmentations(selection)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        encoding = _encoding_options(output_format, quality, compression)
+        response_mode = _check_response_mode(response_mode, ("json", "ndjson", "multipart"))
+        if stream or "application/x-ndjson" in request.headers.get("accept", ""):
+            response_mode = "ndjson"
+        media_type = ImageProcessor.media_type(encoding["output_format"])
+        extension = ImageProcessor.file_extension(encoding["output_format"])
         
-        result = ImageProcessor.augment(image)
-        augmented_images = {}
+        with await FileHandler.ingest_upload(file, settings.MAX_IMAGE_SIZE) as upload:
+            if response_mode != "json":
+                image = await pool.run(_load_image, upload.source)
+                boundary = new_boundary()
+                
+                def format_variant(variant) -> bytes:
+                    data = variant.pop("data")
+                    if response_mode == "multipart":
+                        return encode_part(boundary, data, media_type, {
+                            "Content-Disposition": f'attachment; name="{variant["name"]}"; filename="{variant["name"]}.{extension}"',
+                            "X-Augmentation-Step": variant["step"]
+                        })
+                    return (json.dumps({**variant, "image": _encode_base64(data), "media_type": media_type}) + "\n").encode('utf-8')
+                
+                async def generate():
+                    for name, params in resolved:
+                        try:
+                            variant = await pool.run(_augment_variant, image, name, params, encoding, cpu_bound=True)
+                            yield format_variant(variant)
+                        except Exception as e:
+                            logger.error(f"Error augmenting image variant {name}: {str(e)}")
+                            error = json.dumps({"name": name, "error": str(e)})
+                            if response_mode == "multipart":
+                                yield encode_part(boundary, error.encode('utf-8'), "application/json")
+                            else:
+                                yield (error + "\n").encode('utf-8')
+                    if response_mode == "multipart":
+                        yield encode_end(boundary)
+                
+                stream_type = multipart_media_type(boundary) if response_mode == "multipart" else "application/x-ndjson"
+                return StreamingResponse(generate(), media_type=stream_type, headers=get_cors_headers())
+            
+            key = result_cache.make_key(
+                upload.hash,
+                "image/augment",
+                {"variants": resolved, "encoding": encoding},
+                ImageProcessor.VERSION
+            )
+            
+            async def compute():
+                result = await pool.run(_augment_image, upload.source, dict(resolved), encoding, cpu_bound=True)
+                result["augmented_images"] = {
+                    name: _encode_base64(data) for name, data in result["augmented_images"].items()
+                }
+                return JSONResponse(content={**result, "media_type": media_type}, headers=get_cors_headers())
+            
+            return await cached_response(request, key, compute, headers=get_cors_headers())
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error augmenting image: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/preprocess/batch")
+async def preprocess_image_batch(
+    files: List[UploadFile] = File(...),
+    resize_width: int = Form(None),
+    resize_height: int = Form(None),
+    grayscale: bool = Form(False),
+    normalize: bool = Form(False),
+    output_format: str = Form("png"),
+    quality: int = Form(None),
+    compression: int = Form(None)
+):
+    """Preprocess many images (or zip/tar archives of images) and return a zip of encoded results"""
+    try:
+        resize = (resize_width, resize_height) if resize_width and resize_height else None
+        encoding = _encoding_options(output_format, quality, compression)
+        extension = ImageProcessor.file_extension(encoding["output_format"])
+        allowed_extensions = {ext.lower() for ext in settings.ALLOWED_IMAGE_EXTENSIONS}
         
-        # Convert all augmented images to base64
-        for name, img in result["augmented_images"].items():
-            img_byte_arr = io.BytesIO()
-            img.save(img_byte_arr, format='PNG')
-            img_byte_arr = img_byte_arr.getvalue()
-            augmented_images[name] = base64.b64encode(img_byte_arr).decode('utf-8')
+        with ExitStack() as stack:
+            named_sources = []
+            for file in files:
+                if FileHandler.is_archive(file.filename or ""):
+                    upload = stack.enter_context(
+                        await FileHandler.ingest_upload(file, settings.MAX_UPLOAD_SIZE)
+                    )
+                    named_sources += await pool.run(
+                        FileHandler.extract_archive,
+                        upload,
+                        allowed_extensions,
+                        settings.MAX_IMAGE_SIZE,
+                        settings.MAX_IMAGE_BATCH_FILES - len(named_sources)
+                    )
+                elif file.content_type and file.content_type.startswith('image/'):
+                    upload = stack.enter_context(
+                        await FileHandler.ingest_upload(file, settings.MAX_IMAGE_SIZE)
+                    )
+                    named_sources.append((file.filename, upload.source))
+                else:
+                    raise HTTPException(status_code=400, detail=f"File must be an image or archive: {file.filename}")
+                
+                if len(named_sources) > settings.MAX_IMAGE_BATCH_FILES:
+                    raise HTTPException(status_code=413, detail="Too many images in batch")
+            
+            if not named_sources:
+                raise HTTPException(status_code=400, detail="No images found in upload")
+            
+            # One chunk per worker; each chunk is stacked and processed as a batch
+            chunk_count = min(pool.concurrency(cpu_bound=True), len(named_sources))
+            chunk_size = -(-len(named_sources) // chunk_count)
+            chunks = [named_sources[i:i + chunk_size] for i in range(0, len(named_sources), chunk_size)]
+            results = await asyncio.gather(*[
+                pool.run(
+                    _preprocess_image_batch,
+                    chunk,
+                    resize=resize,
+                    grayscale=grayscale,
+                    normalize=normalize,
+                    encoding=encoding,
+                    cpu_bound=True
+                )
+                for chunk in chunks
+            ])
         
-        return JSONResponse(
-            content={
-                "steps": result["steps"],
-                "augmented_images": augmented_images
-            },
-            headers=get_cors_headers()
+        archive = tempfile.SpooledTemporaryFile(max_size=settings.UPLOAD_SPOOL_THRESHOLD)
+        manifest = {"steps": results[0]["steps"], "files": []}
+        with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_STORED) as zf:
+            index = 0
+            for result in results:
+                for item in result["items"]:
+                    stem = os.path.splitext(os.path.basename(item["name"] or "image"))[0]
+                    arcname = f"{index:05d}_{stem}.{extension}"
+                    zf.writestr(arcname, item["data"])
+                    manifest["files"].append({
+                        "source": item["name"],
+                        "output": arcname,
+                        "original_size": item["original_size"],
+                        "processed_size": item["processed_size"]
+                    })
+                    index += 1
+            zf.writestr("manifest.json", json.dumps(manifest, indent=2))
+        archive.seek(0)
+        
+        def iter_archive():
+            with archive:
+                while chunk := archive.read(settings.UPLOAD_CHUNK_SIZE):
+                    yield chunk
+        
+        return StreamingResponse(
+            iter_archive(),
+            media_type="application/zip",
+            headers={
+                **get_cors_headers(),
+                "Content-Disposition": 'attachment; filename="preprocessed_images.zip"'
+            }
         )
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error augmenting image: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        logger.error(f"Error preprocessing image batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
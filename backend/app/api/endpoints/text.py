@@ -1,12 +1,83 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from collections import deque
+from typing import Optional
+import asyncio
+import json
+import os
 from app.core.logger import logger
-from app.processors.text_processor import TextProcessor
+from app.core.config import settings
+from app.core.executor import get_pool
+from app.core.lazy import lazy_import, lazy_instance
+from app.utils.file_handler import FileHandler
+from app.utils.result_cache import result_cache, cached_response
 
 router = APIRouter(prefix="/text", tags=["Text Processing"])
+pool = get_pool("text")
 
-# Initialize TextProcessor
-text_processor = TextProcessor()
+# NLTK and the TextProcessor load on first use, or at startup when "text" is in WARMUP_MODALITIES
+TextProcessor = lazy_import("text", "app.processors.text_processor", "TextProcessor")
+process_shard = lazy_import("text", "app.processors.text_processor", "process_shard")
+DuplicateFilter = lazy_import("text", "app.processors.text_processor", "DuplicateFilter")
+text_processor = lazy_instance("text", "TextProcessor", lambda: TextProcessor(tokenizer=settings.TEXT_TOKENIZER))
+DedupIndex = lazy_import("text", "app.utils.dedup_index", "DedupIndex")
+dedup_index = lazy_instance("text", "DedupIndex", lambda: DedupIndex(
+    settings.DEDUP_INDEX_PATH or None,
+    num_perm=settings.DEDUP_NUM_PERM,
+    bands=settings.DEDUP_BANDS,
+    shingle_size=settings.DEDUP_SHINGLE_SIZE,
+    threshold=settings.DEDUP_THRESHOLD
+))
+
+def _iter_document_shards(source, input_format: str, text_field: str, id_field: str, duplicates=None):
+    with FileHandler.open_source(source) as f:
+        documents = TextProcessor.iter_documents(
+            f,
+            input_format,
+            text_field=text_field,
+            id_field=id_field,
+            max_document_size=settings.MAX_TEXT_SIZE
+        )
+        if duplicates is not None:
+            # Runs here, in input order, so the first of a group of duplicates is the one kept
+            documents = duplicates.mark(documents)
+        yield from TextProcessor.iter_shards(documents)
+
+def _check_duplicate(text: str, doc_id: str, add: bool = True, exclude_self: bool = False):
+    return dedup_index.check(doc_id, TextProcessor.dedup_tokens(text), add=add, exclude_self=exclude_self)
+
+def _fingerprint(text: str):
+    return dedup_index.fingerprint(TextProcessor.dedup_tokens(text))
+
+def _lemma_cache_stats():
+    return {**TextProcessor.lemma_cache_info(), "pid": os.getpid()}
+
+async def _process_shards(first_shard, shards, ordered: bool):
+    """Fan shards out to the text process pool, yielding (shard, records) pairs in input or completion order"""
+    # Two shards per worker keeps every worker busy while bounding memory and queue use
+    limit = 2 * pool.concurrency(cpu_bound=True)
+    pending = deque()
+    submitted = {}
+    shard = first_shard
+    try:
+        while shard is not None or pending:
+            while shard is not None and len(pending) < limit:
+                task = asyncio.ensure_future(pool.run(process_shard, shard, settings.TEXT_TOKENIZER, cpu_bound=True))
+                pending.append(task)
+                submitted[task] = shard
+                shard = await pool.run(next, shards, None)
+            if ordered:
+                task = pending.popleft()
+                records = await task
+                yield submitted.pop(task), records
+                continue
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.remove(task)
+                yield submitted.pop(task), task.result()
+    finally:
+        for task in pending:
+            task.cancel()
 
 @router.post("/upload")
 async def upload_text(file: UploadFile = File(...)):
@@ -16,11 +87,11 @@ async def upload_text(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="Unsupported file type")
 
     try:
-        content = await file.read()
-        text = content.decode('utf-8', errors='replace')
+        with await FileHandler.ingest_upload(file, settings.MAX_TEXT_SIZE) as upload:
+            text = upload.read().decode('utf-8', errors='replace')
         
         # Validate text
-        validation = text_processor.validate_text(text)
+        validation = await pool.run(text_processor.validate_text, text)
         if not validation["is_valid"]:
             raise HTTPException(status_code=400, detail=validation.get("error", "Invalid text content"))
 
@@ -30,41 +101,200 @@ async def upload_text(file: UploadFile = File(...)):
             "filename": file.filename,
             "validation": validation
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing text file: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/preprocess")
-async def preprocess_text(file: UploadFile = File(...)):
+async def preprocess_text(request: Request, file: UploadFile = File(...), include_original: bool = Form(True),
+                          dedup: bool = Form(False), doc_id: Optional[str] = Form(None)):
+    """
+    Preprocess a text file. With dedup=true, exact and near duplicates of
+    earlier submissions are reported as {"duplicate"} instead. Documents are
+    indexed under doc_id, or their content hash, once they preprocess; an
+    explicit doc_id never matches its own earlier versions.
+    """
     try:
-        content = await file.read()
-        text = content.decode('utf-8', errors='replace')
+        with await FileHandler.ingest_upload(file, settings.MAX_TEXT_SIZE) as upload:
+            text = upload.read().decode('utf-8', errors='replace')
+            key = result_cache.make_key(
+                upload.hash,
+                "text/preprocess",
+                {"include_original": include_original},
+                TextProcessor.VERSION
+            )
         
-        # Use TextProcessor to preprocess the text
-        result = text_processor.preprocess(text)
+        if dedup:
+            # Duplicates of earlier submissions are reported instead of preprocessed
+            fingerprint = await pool.run(_fingerprint, text)
+            match = await pool.run(dedup_index.check_fingerprint, doc_id or upload.hash, fingerprint, False, doc_id is not None)
+            if match is not None:
+                return {"duplicate": match}
         
-        return {
-            "processed_text": result["processed_text"],
-            "original_text": result["original_text"],
-            "steps": result["steps"]
-        }
+        async def compute():
+            # Use TextProcessor to preprocess the text
+            result = await pool.run(text_processor.preprocess, text, cpu_bound=True)
+            
+            content = {
+                "processed_text": result["processed_text"],
+                "steps": result["steps"]
+            }
+            if include_original:
+                content["original_text"] = result["original_text"]
+            return JSONResponse(content=content)
+        
+        response = await cached_response(request, key, compute)
+        if dedup:
+            # Only documents that preprocessed successfully join the index
+            await pool.run(dedup_index.add, doc_id or upload.hash, fingerprint)
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error preprocessing text: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/preprocess/stream")
+async def preprocess_text_stream(file: UploadFile = File(...), include_original: bool = Form(False)):
+    """
+    Preprocess text up to MAX_TEXT_STREAM_SIZE in bounded memory, streaming one
+    JSON line per input chunk: {"processed_text"} plus {"original_text"} when
+    include_original is set. Concatenating the processed_text values gives the
+    /preprocess result; MAX_TEXT_SIZE bounds a single sentence instead of the file.
+    """
+    upload = await FileHandler.ingest_upload(file, settings.MAX_TEXT_STREAM_SIZE)
+    source = FileHandler.open_source(upload.source)
+    
+    def close():
+        source.close()
+        upload.close()
+    
+    try:
+        records = text_processor.preprocess_stream(
+            source,
+            settings.UPLOAD_CHUNK_SIZE,
+            include_original=include_original,
+            max_sentence_size=settings.MAX_TEXT_SIZE
+        )
+    except Exception as e:
+        close()
+        logger.error(f"Error preprocessing text stream: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def generate():
+        try:
+            # The generator carries the open sentence between chunks, so it runs on the thread pool
+            while (record := await pool.run(next, records, None)) is not None:
+                yield (json.dumps(record) + "\n").encode('utf-8')
+        except Exception as e:
+            logger.error(f"Error streaming text: {str(e)}")
+            raise
+        finally:
+            records.close()
+            close()
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.post("/preprocess/batch")
+async def preprocess_text_batch(
+    file: UploadFile = File(...),
+    input_format: str = Form("auto"),
+    text_field: str = Form("text"),
+    id_field: str = Form("id"),
+    ordered: bool = Form(True),
+    dedup: bool = Form(False)
+):
+    """
+    Preprocess a corpus of documents and stream one JSON line per document,
+    {"id", "processed_text"} or {"id", "error"}. input_format is jsonl, csv
+    (with a header row), lines (one document per line) or auto (from the file
+    extension). Shards run on the text process pool; ordered=false emits them
+    as they finish. dedup=true drops exact and near duplicates, within the
+    corpus and of earlier submissions, as {"id", "duplicate"} records.
+    """
+    input_format = (input_format or "auto").lower()
+    if input_format == "auto":
+        input_format = TextProcessor.detect_input_format(file.filename)
+    if input_format not in TextProcessor.INPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"input_format must be one of: auto, {', '.join(TextProcessor.INPUT_FORMATS)}")
+    
+    upload = await FileHandler.ingest_upload(file, settings.MAX_TEXT_BATCH_SIZE)
+    duplicates = DuplicateFilter(dedup_index) if dedup else None
+    shards = _iter_document_shards(upload.source, input_format, text_field, id_field, duplicates)
+    try:
+        # Read the first shard up front so a bad header fails the request instead of the stream
+        first_shard = await pool.run(next, shards, None)
+    except ValueError as e:
+        shards.close()
+        upload.close()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        shards.close()
+        upload.close()
+        logger.error(f"Error reading text batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def generate():
+        try:
+            async for shard, records in _process_shards(first_shard, shards, ordered):
+                if duplicates is not None:
+                    # Only documents that processed without error join the index
+                    await pool.run(duplicates.commit, shard, records)
+                yield "".join(json.dumps(record) + "\n" for record in records).encode('utf-8')
+        except Exception as e:
+            logger.error(f"Error streaming text batch: {str(e)}")
+            raise
+        finally:
+            shards.close()
+            upload.close()
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.post("/dedup")
+async def dedup_text(file: UploadFile = File(...), doc_id: str = Form(None), add: bool = Form(True)):
+    """
+    Check a document against the persistent dedup index. Returns the best
+    exact or near-duplicate match, if any; unmatched documents are added
+    under doc_id (default: the content hash) unless add is false. Documents
+    stored under an explicit doc_id are not reported as matches of it.
+    """
+    try:
+        with await FileHandler.ingest_upload(file, settings.MAX_TEXT_SIZE) as upload:
+            text = upload.read().decode('utf-8', errors='replace')
+        match = await pool.run(_check_duplicate, text, doc_id or upload.hash, add, doc_id is not None)
+        return {"id": doc_id or upload.hash, "duplicate": match is not None, "match": match}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error checking text for duplicates: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/dedup/stats")
+async def dedup_stats():
+    return await pool.run(dedup_index.stats)
+
+@router.get("/lemma-cache")
+async def lemma_cache_stats():
+    """Lemma cache statistics of one text worker process (caches are per process)"""
+    return await pool.run(_lemma_cache_stats, cpu_bound=True)
+
 @router.post("/augment")
 async def augment_text(file: UploadFile = File(...)):
     try:
-        content = await file.read()
-        text = content.decode('utf-8', errors='replace')
+        with await FileHandler.ingest_upload(file, settings.MAX_TEXT_SIZE) as upload:
+            text = upload.read().decode('utf-8', errors='replace')
         
         # Use TextProcessor to augment the text
-        result = text_processor.augment(text)
+        result = await pool.run(text_processor.augment, text, cpu_bound=True)
         
         return {
             "augmented_texts": result["augmented_texts"],
             "steps": result["steps"]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error augmenting text: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
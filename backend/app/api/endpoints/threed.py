@@ -1,16 +1,258 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from fastapi.responses import JSONResponse
-import trimesh
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from contextlib import ExitStack
+from typing import List, Optional
+import asyncio
 import io
+import secrets
+import json
 import os
-import numpy as np
-from app.processors.threed_processor import ThreeDProcessor
+from app.core.config import settings
+from app.core.executor import get_pool
+from app.core.lazy import lazy_import, lazy_instance
+from app.utils.file_handler import FileHandler
+from app.utils.result_cache import result_cache, cached_response
+from app.utils.multipart import encode_end, encode_part, multipart_media_type, new_boundary
 from app.core.logger import logger
 
 router = APIRouter(prefix="/3d", tags=["3D Processing"])
+pool = get_pool("3d")
+
+# trimesh loads on first use, or at startup when "3d" is in WARMUP_MODALITIES
+threed_processor = lazy_import("3d", "app.processors.threed_processor")
+ThreeDProcessor = lazy_import("3d", "app.processors.threed_processor", "ThreeDProcessor")
+mesh_analytics = lazy_import("3d", "app.processors.mesh_analytics")
+mesh_indexes = lazy_instance("3d", "MeshIndexCache", lambda: mesh_analytics.MeshIndexCache(settings.MESH_INDEX_CACHE_BYTES))
+
+def wants_binary(request: Request, format: Optional[str]) -> bool:
+    """Binary mesh transport is selected with ?format=binary or the Accept header"""
+    if format:
+        return format.lower() == "binary"
+    return threed_processor.MESH_BINARY_MEDIA_TYPE in request.headers.get("accept", "")
+
+def binary_response(content: bytes) -> Response:
+    return Response(content=content, media_type=threed_processor.MESH_BINARY_MEDIA_TYPE)
+
+def _upload_mesh(source, file_type: str, filename: str, binary: bool):
+    with FileHandler.open_source(source) as f:
+        mesh = ThreeDProcessor.load_mesh(f, file_type)
+    validation = ThreeDProcessor.validate_mesh(mesh)
+    if binary:
+        return ThreeDProcessor.mesh_to_binary(
+            {"mesh_data": mesh},
+            metadata={"filename": filename, "validation": validation}
+        )
+    
+    return {
+        "filename": filename,
+        "validation": validation,
+        "mesh_data": ThreeDProcessor.mesh_to_dict(mesh)
+    }
+
+def _preprocess_mesh(source, file_type: str, remove_duplicates: bool,
+                     fix_normals: bool, fill_holes: bool, binary: bool):
+    with FileHandler.open_source(source) as f:
+        mesh = ThreeDProcessor.load_mesh(f, file_type)
+    
+    result = ThreeDProcessor.preprocess(
+        mesh,
+        remove_duplicates=remove_duplicates,
+        fix_normals=fix_normals,
+        fill_holes=fill_holes,
+        workers=settings.MESH_CLEANUP_WORKERS
+    )
+    
+    if binary:
+        return ThreeDProcessor.mesh_to_binary(
+            {"processed_mesh": result["processed_mesh"]},
+            metadata={"statistics": result["statistics"], "steps": result["steps"], "timings": result["timings"]}
+        )
+    
+    return {
+        "processed_mesh": ThreeDProcessor.mesh_to_dict(result["processed_mesh"]),
+        "statistics": result["statistics"],
+        "steps": result["steps"],
+        "timings": result["timings"]
+    }
+
+def _load_mesh(source, file_type: str):
+    with FileHandler.open_source(source) as f:
+        return ThreeDProcessor.load_mesh(f, file_type)
+
+def _lod_level(mesh, ratio: float) -> bytes:
+    lod = ThreeDProcessor.lod_mesh(mesh, ratio)
+    return ThreeDProcessor.mesh_to_binary(
+        {f"lod_{ratio:g}": lod},
+        metadata={"level": ratio, "face_count": len(lod.faces), "source_face_count": len(mesh.faces)}
+    )
+
+def _parse_lod_levels(levels: Optional[str]) -> List[float]:
+    if not levels:
+        return list(settings.MESH_LOD_LEVELS)
+    try:
+        ratios = [float(level) for level in levels.split(",") if level.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="levels must be comma-separated face ratios, e.g. 0.01,0.05,0.25,1")
+    if not ratios or not all(0 < ratio <= 1 for ratio in ratios):
+        raise HTTPException(status_code=400, detail="levels must be between 0 (exclusive) and 1")
+    return ratios
+
+async def _cache_get(key: str):
+    if not settings.RESULT_CACHE_ENABLED:
+        return None
+    return await run_in_threadpool(result_cache.get, key)
+
+async def _cache_put(key: str, body: bytes, media_type: str) -> None:
+    if settings.RESULT_CACHE_ENABLED:
+        await run_in_threadpool(result_cache.put, key, body, media_type)
+
+def _build_index(source, file_type: str):
+    with FileHandler.open_source(source) as f:
+        arrays = ThreeDProcessor.load_arrays(f, file_type, fallback_limit=settings.MAX_3D_SIZE)
+    return mesh_analytics.MeshIndex(arrays.vertices, arrays.faces)
+
+def _mesh_metrics(source, file_type: str):
+    with FileHandler.open_source(source) as f:
+        arrays = ThreeDProcessor.load_arrays(f, file_type, fallback_limit=settings.MAX_3D_SIZE)
+    return mesh_analytics.mesh_metrics(arrays.vertices, arrays.faces)
+
+def _or_none(values, mask) -> list:
+    """JSON has no NaN; misses become null"""
+    return [value if keep else None for value, keep in zip(values.tolist(), mask.tolist())]
+
+def _query_points(value: str, name: str):
+    return mesh_analytics.parse_points(value, name, settings.MAX_MESH_QUERY_POINTS)
+
+def _closest_points(index, points: str):
+    result = index.closest_points(_query_points(points, "points"))
+    return {
+        "points": result["points"].tolist(),
+        "distances": result["distances"].tolist(),
+        "faces": result["faces"].tolist()
+    }
+
+def _ray_cast(index, origins: str, directions: str):
+    result = index.ray_cast(_query_points(origins, "origins"), _query_points(directions, "directions"))
+    hit = result["hit"]
+    return {
+        "hit": hit.tolist(),
+        "distances": _or_none(result["distances"], hit),
+        "locations": _or_none(result["locations"], hit),
+        "faces": _or_none(result["faces"], hit),
+        "normals": _or_none(result["normals"], hit)
+    }
+
+def _sample_points(index, count: int, seed: Optional[int]):
+    result = index.sample(count, seed=seed)
+    return {key: value.tolist() for key, value in result.items()}
+
+def _distance_field(index, points: Optional[str], grid: Optional[int], signed: bool):
+    if grid:
+        queries, lower, upper = index.grid(grid)
+    else:
+        queries = _query_points(points, "points")
+    result = index.distance(queries, signed=signed)
+    response = {"distances": result["distances"].tolist(), "signed": result["signed"]}
+    if grid:
+        response["grid"] = {"resolution": grid, "lower": lower.tolist(), "upper": upper.tolist()}
+    return response
+
+async def _mesh_index(file: Optional[UploadFile], mesh_id: Optional[str]):
+    """
+    (mesh_id, index) for an upload, indexed once per content hash, or for the
+    mesh_id of an earlier upload while its index is still cached.
+    """
+    if file is None:
+        if not mesh_id:
+            raise HTTPException(status_code=400, detail="Provide a file or a mesh_id")
+        index = mesh_indexes.get(mesh_id)
+        if index is None:
+            raise HTTPException(status_code=404, detail="Mesh index not found; upload the file again")
+        return mesh_id, index
+    
+    file_type = os.path.splitext(file.filename)[1][1:]
+    with await FileHandler.ingest_upload(file, settings.MAX_3D_SCAN_SIZE) as upload:
+        mesh_id = result_cache.make_key(upload.hash, "3d/index", {"file_type": file_type}, ThreeDProcessor.VERSION)
+        # Thread pool: the index stays in this process for later queries
+        index = await pool.run(mesh_indexes.get_or_build, mesh_id, lambda: _build_index(upload.source, file_type))
+    return mesh_id, index
+
+async def _run_query(file: Optional[UploadFile], mesh_id: Optional[str], func, *args):
+    try:
+        mesh_id, index = await _mesh_index(file, mesh_id)
+        result = await pool.run(func, index, *args)
+        return JSONResponse(content={"mesh_id": mesh_id, **result})
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error querying 3D mesh: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _augment_mesh(source, file_type: str, scale: float,
+                  rotate_x: float, rotate_y: float, rotate_z: float, binary: bool):
+    with FileHandler.open_source(source) as f:
+        mesh = ThreeDProcessor.load_mesh(f, file_type)
+    
+    result = ThreeDProcessor.augment(
+        mesh,
+        scale=scale,
+        rotate_x=rotate_x,
+        rotate_y=rotate_y,
+        rotate_z=rotate_z
+    )
+    
+    if binary:
+        return ThreeDProcessor.mesh_to_binary(
+            result["augmented_meshes"],
+            metadata={"steps": result["steps"]}
+        )
+    
+    augmented_meshes = {}
+    for name, augmented in result["augmented_meshes"].items():
+        augmented_meshes[name] = ThreeDProcessor.mesh_to_dict(augmented)
+    
+    return {
+        "augmented_meshes": augmented_meshes,
+        "steps": result["steps"]
+    }
+
+def _augment_batch(source, file_type: str, count: int, seed: int, scale_min: float, scale_max: float,
+                   max_rotation: float, max_translation: float, mirror_probability: float,
+                   normals: bool, binary: bool) -> bytes:
+    with FileHandler.open_source(source) as f:
+        mesh = ThreeDProcessor.load_mesh(f, file_type)
+    if count * len(mesh.vertices) > settings.MAX_MESH_AUGMENT_VERTICES:
+        raise ValueError(
+            f"{count} variants of {len(mesh.vertices)} vertices exceed {settings.MAX_MESH_AUGMENT_VERTICES} vertices per batch"
+        )
+    
+    params = ThreeDProcessor.random_augmentations(
+        count,
+        seed=seed,
+        scale_range=(scale_min, scale_max),
+        max_rotation=max_rotation,
+        max_translation=max_translation,
+        mirror_probability=mirror_probability
+    )
+    # The packed mesh format always carries normals
+    batch = ThreeDProcessor.augment_batch(mesh, params, normals=normals or binary)
+    if binary:
+        return ThreeDProcessor.batch_to_binary(batch, metadata={
+            "seed": seed,
+            "params": {key: value.tolist() for key, value in params.items()},
+            "flipped": batch["flipped"].tolist()
+        })
+    return ThreeDProcessor.batch_to_npz(batch)
 
 @router.post("/upload")
-async def upload_threed(file: UploadFile = File(...)):
+async def upload_threed(
+    request: Request,
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, description="Set to 'binary' for packed mesh buffers")
+):
     allowed_extensions = {'.obj', '.stl', '.off', '.ply'}
     file_ext = os.path.splitext(file.filename)[1].lower()
     
@@ -21,79 +263,415 @@ async def upload_threed(file: UploadFile = File(...)):
         )
     
     try:
-        content = await file.read()
         file_type = file_ext[1:]  # Remove the dot from extension
+        binary = wants_binary(request, format)
+        with await FileHandler.ingest_upload(file, settings.MAX_3D_SIZE) as upload:
+            result = await pool.run(
+                _upload_mesh, upload.source, file_type, file.filename, binary, cpu_bound=True
+            )
         
-        mesh = ThreeDProcessor.load_mesh(content, file_type)
-        validation = ThreeDProcessor.validate_mesh(mesh)
-        mesh_data = ThreeDProcessor.mesh_to_dict(mesh)
-        
-        return JSONResponse(content={
-            "filename": file.filename,
-            "validation": validation,
-            "mesh_data": mesh_data
-        })
+        if binary:
+            return binary_response(result)
+        return JSONResponse(content=result)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing 3D file: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/preprocess")
 async def preprocess_3d(
+    request: Request,
     file: UploadFile = File(...),
     remove_duplicates: bool = Form(True),
     fix_normals: bool = Form(True),
-    fill_holes: bool = Form(True)
+    fill_holes: bool = Form(True),
+    format: Optional[str] = Query(None, description="Set to 'binary' for packed mesh buffers")
 ):
     try:
-        content = await file.read()
         file_type = os.path.splitext(file.filename)[1][1:]
-        mesh = ThreeDProcessor.load_mesh(content, file_type)
-        
-        result = ThreeDProcessor.preprocess(
-            mesh,
-            remove_duplicates=remove_duplicates,
-            fix_normals=fix_normals,
-            fill_holes=fill_holes
-        )
-        
-        return {
-            "processed_mesh": ThreeDProcessor.mesh_to_dict(result["processed_mesh"]),
-            "statistics": result["statistics"],
-            "steps": result["steps"]
-        }
+        binary = wants_binary(request, format)
+        with await FileHandler.ingest_upload(file, settings.MAX_3D_SIZE) as upload:
+            key = result_cache.make_key(
+                upload.hash,
+                "3d/preprocess",
+                {
+                    "file_type": file_type,
+                    "remove_duplicates": remove_duplicates,
+                    "fix_normals": fix_normals,
+                    "fill_holes": fill_holes,
+                    "binary": binary
+                },
+                ThreeDProcessor.VERSION
+            )
+            
+            async def compute():
+                result = await pool.run(
+                    _preprocess_mesh,
+                    upload.source,
+                    file_type,
+                    remove_duplicates=remove_duplicates,
+                    fix_normals=fix_normals,
+                    fill_holes=fill_holes,
+                    binary=binary,
+                    cpu_bound=True
+                )
+                if binary:
+                    return binary_response(result)
+                return JSONResponse(content=result)
+            
+            return await cached_response(request, key, compute)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error preprocessing 3D file: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/augment")
 async def augment_3d(
+    request: Request,
     file: UploadFile = File(...),
     scale: float = Form(1.0),
     rotate_x: float = Form(0.0),
     rotate_y: float = Form(0.0),
-    rotate_z: float = Form(0.0)
+    rotate_z: float = Form(0.0),
+    format: Optional[str] = Query(None, description="Set to 'binary' for packed mesh buffers")
+):
+    try:
+        file_type = os.path.splitext(file.filename)[1][1:]
+        binary = wants_binary(request, format)
+        with await FileHandler.ingest_upload(file, settings.MAX_3D_SIZE) as upload:
+            key = result_cache.make_key(
+                upload.hash,
+                "3d/augment",
+                {
+                    "file_type": file_type,
+                    "scale": scale,
+                    "rotate_x": rotate_x,
+                    "rotate_y": rotate_y,
+                    "rotate_z": rotate_z,
+                    "binary": binary
+                },
+                ThreeDProcessor.VERSION
+            )
+            
+            async def compute():
+                result = await pool.run(
+                    _augment_mesh,
+                    upload.source,
+                    file_type,
+                    scale=scale,
+                    rotate_x=rotate_x,
+                    rotate_y=rotate_y,
+                    rotate_z=rotate_z,
+                    binary=binary,
+                    cpu_bound=True
+                )
+                if binary:
+                    return binary_response(result)
+                return JSONResponse(content=result)
+            
+            return await cached_response(request, key, compute)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error augmenting 3D file: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/augment/batch")
+async def augment_batch_3d(
+    request: Request,
+    file: UploadFile = File(...),
+    count: int = Form(16),
+    seed: Optional[int] = Form(None),
+    scale_min: float = Form(0.8),
+    scale_max: float = Form(1.2),
+    max_rotation: float = Form(180.0, description="Degrees, drawn per axis from [-max, max]"),
+    max_translation: float = Form(0.0, description="Mesh units, drawn per axis from [-max, max]"),
+    mirror_probability: float = Form(0.0),
+    normals: bool = Form(True),
+    format: Optional[str] = Query(None, description="Set to 'binary' for packed mesh buffers; default is a .npz archive")
 ):
+    """
+    N random rigid and scale augmentations of one mesh for dataset
+    generation, applied to the shared vertices in one batched matmul. The
+    .npz archive holds stacked positions (and normals), the shared faces,
+    the matrices and parameters, and "flipped" for mirrored variants whose
+    winding must be reversed. Results are cached only when a seed is given;
+    the seed used is returned in X-Augment-Seed.
+    """
+    if not 0 < count <= settings.MAX_MESH_AUGMENT_VARIANTS:
+        raise HTTPException(status_code=400, detail=f"count must be between 1 and {settings.MAX_MESH_AUGMENT_VARIANTS}")
+    if not 0 < scale_min <= scale_max:
+        raise HTTPException(status_code=400, detail="scale range must satisfy 0 < scale_min <= scale_max")
+    if not 0 <= mirror_probability <= 1:
+        raise HTTPException(status_code=400, detail="mirror_probability must be between 0 and 1")
+    
     try:
-        content = await file.read()
         file_type = os.path.splitext(file.filename)[1][1:]
-        mesh = ThreeDProcessor.load_mesh(content, file_type)
+        binary = wants_binary(request, format)
+        cacheable = seed is not None
+        if seed is None:
+            seed = secrets.randbelow(2 ** 31)
+        headers = {"X-Augment-Seed": str(seed)}
+        if not binary:
+            headers["Content-Disposition"] = f'attachment; filename="augmentations_{seed}.npz"'
         
-        result = ThreeDProcessor.augment(
-            mesh,
-            scale=scale,
-            rotate_x=rotate_x,
-            rotate_y=rotate_y,
-            rotate_z=rotate_z
+        with await FileHandler.ingest_upload(file, settings.MAX_3D_SIZE) as upload:
+            async def compute():
+                result = await pool.run(
+                    _augment_batch,
+                    upload.source,
+                    file_type,
+                    count=count,
+                    seed=seed,
+                    scale_min=scale_min,
+                    scale_max=scale_max,
+                    max_rotation=max_rotation,
+                    max_translation=max_translation,
+                    mirror_probability=mirror_probability,
+                    normals=normals,
+                    binary=binary,
+                    cpu_bound=True
+                )
+                if binary:
+                    return binary_response(result)
+                return Response(content=result, media_type="application/x-npz")
+            
+            if not cacheable:
+                response = await compute()
+                response.headers.update(headers)
+                return response
+            
+            key = result_cache.make_key(
+                upload.hash,
+                "3d/augment/batch",
+                {
+                    "file_type": file_type,
+                    "count": count,
+                    "seed": seed,
+                    "scale_min": scale_min,
+                    "scale_max": scale_max,
+                    "max_rotation": max_rotation,
+                    "max_translation": max_translation,
+                    "mirror_probability": mirror_probability,
+                    "normals": normals,
+                    "binary": binary
+                },
+                ThreeDProcessor.VERSION
+            )
+            return await cached_response(request, key, compute, headers=headers)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error augmenting 3D batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/lod")
+async def lod_3d(file: UploadFile = File(...), levels: Optional[str] = Form(None)):
+    """
+    Stream a level-of-detail pyramid as multipart/mixed, coarsest level first,
+    so a viewer can show the model at once and refine it as parts arrive.
+    levels are face ratios (default MESH_LOD_LEVELS); full resolution is always
+    the last part. Each part is one application/x-mesh-binary mesh with
+    X-LOD-Level and X-LOD-Key headers; the key refetches that level from
+    /api/v1/cache/results/{key}. Levels are cached by content hash.
+    """
+    ratios = _parse_lod_levels(levels)
+    file_type = os.path.splitext(file.filename)[1][1:]
+    upload = await FileHandler.ingest_upload(file, settings.MAX_3D_SIZE)
+    
+    def level_key(ratio: float) -> str:
+        return result_cache.make_key(
+            upload.hash, "3d/lod", {"file_type": file_type, "level": ratio}, ThreeDProcessor.VERSION
         )
+    
+    # The pyramid's levels depend on the face count, so they are cached too
+    index_key = result_cache.make_key(
+        upload.hash, "3d/lod", {"file_type": file_type, "levels": sorted(set(ratios))}, ThreeDProcessor.VERSION
+    )
+    mesh = None
+    try:
+        index = await _cache_get(index_key)
+        if index is not None:
+            pyramid = json.loads(index.body)["levels"]
+        else:
+            mesh = await pool.run(_load_mesh, upload.source, file_type)
+            pyramid = ThreeDProcessor.lod_levels(ratios, len(mesh.faces))
+    except Exception as e:
+        upload.close()
+        logger.error(f"Error loading 3D file for LOD: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    media_type = threed_processor.MESH_BINARY_MEDIA_TYPE
+    boundary = new_boundary()
+    
+    async def generate():
+        nonlocal mesh
+        try:
+            for ratio in pyramid:
+                key = level_key(ratio)
+                cached = await _cache_get(key)
+                if cached is not None:
+                    body = cached.body
+                else:
+                    if mesh is None:
+                        mesh = await pool.run(_load_mesh, upload.source, file_type)
+                    # Thread pool: the loaded mesh is shared across levels
+                    body = await pool.run(_lod_level, mesh, ratio)
+                    await _cache_put(key, body, media_type)
+                yield encode_part(boundary, body, media_type, {
+                    "Content-Disposition": f'attachment; name="lod_{ratio:g}"',
+                    "X-LOD-Level": f"{ratio:g}",
+                    "X-LOD-Key": key
+                })
+            if index is None:
+                await _cache_put(index_key, json.dumps({"levels": pyramid}).encode('utf-8'), "application/json")
+            yield encode_end(boundary)
+        except Exception as e:
+            logger.error(f"Error streaming LOD pyramid: {str(e)}")
+            raise
+        finally:
+            upload.close()
+    
+    return StreamingResponse(generate(), media_type=multipart_media_type(boundary))
+
+@router.post("/index")
+async def index_3d(file: UploadFile = File(...)):
+    """
+    Build (or reuse) the spatial index of a mesh and return its mesh_id and
+    validation metrics. Query endpoints accept the mesh_id instead of the
+    file while the index stays in the cache (MESH_INDEX_CACHE_BYTES).
+    """
+    try:
+        mesh_id, index = await _mesh_index(file, None)
+        return JSONResponse(content={
+            "mesh_id": mesh_id,
+            "metrics": index.metrics,
+            "build_seconds": round(index.build_seconds, 3)
+        })
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error indexing 3D file: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/index/stats")
+async def index_stats_3d():
+    return mesh_indexes.stats()
+
+@router.post("/closest")
+async def closest_3d(
+    file: Optional[UploadFile] = File(None),
+    mesh_id: Optional[str] = Form(None),
+    points: str = Form(..., description="JSON list of [x, y, z] query points")
+):
+    """Closest surface point, distance and face for each query point"""
+    return await _run_query(file, mesh_id, _closest_points, points)
+
+@router.post("/raycast")
+async def raycast_3d(
+    file: Optional[UploadFile] = File(None),
+    mesh_id: Optional[str] = Form(None),
+    origins: str = Form(..., description="JSON list of [x, y, z] ray origins, or one origin for all rays"),
+    directions: str = Form(..., description="JSON list of [x, y, z] ray directions")
+):
+    """First hit of each ray; misses are null"""
+    return await _run_query(file, mesh_id, _ray_cast, origins, directions)
+
+@router.post("/sample")
+async def sample_3d(
+    file: Optional[UploadFile] = File(None),
+    mesh_id: Optional[str] = Form(None),
+    count: int = Form(1000),
+    seed: Optional[int] = Form(None)
+):
+    """Points sampled uniformly over the surface area, with their faces and normals"""
+    if not 0 < count <= settings.MAX_MESH_QUERY_POINTS:
+        raise HTTPException(status_code=400, detail=f"count must be between 1 and {settings.MAX_MESH_QUERY_POINTS}")
+    return await _run_query(file, mesh_id, _sample_points, count, seed)
+
+@router.post("/distance")
+async def distance_3d(
+    file: Optional[UploadFile] = File(None),
+    mesh_id: Optional[str] = Form(None),
+    points: Optional[str] = Form(None, description="JSON list of [x, y, z] query points"),
+    grid: Optional[int] = Form(None, description="Sample a grid^3 field over the padded bounds instead of points"),
+    signed: bool = Form(True)
+):
+    """
+    Distance to the surface for points or a regular grid (x varying slowest).
+    Distances are signed, positive inside, when requested and the mesh is
+    watertight; "signed" in the response says which was returned.
+    """
+    if grid is None and not points:
+        raise HTTPException(status_code=400, detail="Provide points or a grid resolution")
+    if grid is not None and not 2 <= grid <= settings.MAX_MESH_DISTANCE_GRID:
+        raise HTTPException(status_code=400, detail=f"grid must be between 2 and {settings.MAX_MESH_DISTANCE_GRID}")
+    return await _run_query(file, mesh_id, _distance_field, points, grid, signed)
+
+@router.post("/metrics")
+async def metrics_3d(files: List[UploadFile] = File(...)):
+    """
+    Validation metrics for a batch of meshes, for dataset QA. Metrics are
+    cached by content hash, and meshes already indexed reuse their index,
+    so re-running QA over a dataset only hashes the unchanged files.
+    """
+    if len(files) > settings.MAX_MESH_METRICS_BATCH_FILES:
+        raise HTTPException(status_code=413, detail="Too many meshes in batch")
+    
+    semaphore = asyncio.Semaphore(pool.concurrency(cpu_bound=True))
+    
+    async def measure(file: UploadFile, upload):
+        file_type = os.path.splitext(file.filename)[1][1:]
+        mesh_id = result_cache.make_key(upload.hash, "3d/index", {"file_type": file_type}, ThreeDProcessor.VERSION)
+        key = result_cache.make_key(upload.hash, "3d/metrics", {"file_type": file_type}, ThreeDProcessor.VERSION)
+        result = {"filename": file.filename, "mesh_id": mesh_id}
+        index = mesh_indexes.get(mesh_id)
+        if index is not None:
+            return {**result, "metrics": index.metrics}
+        cached = await _cache_get(key)
+        if cached is not None:
+            return {**result, "metrics": json.loads(cached.body)}
+        try:
+            async with semaphore:
+                metrics = await pool.run(_mesh_metrics, upload.source, file_type, cpu_bound=True)
+        except Exception as e:
+            logger.error(f"Error measuring {file.filename}: {str(e)}")
+            return {**result, "error": str(e)}
+        await _cache_put(key, json.dumps(metrics).encode('utf-8'), "application/json")
+        return {**result, "metrics": metrics}
+    
+    try:
+        with ExitStack() as stack:
+            uploads = []
+            total_size = 0
+            for file in files:
+                upload = stack.enter_context(await FileHandler.ingest_upload(file, settings.MAX_3D_SCAN_SIZE))
+                uploads.append(upload)
+                total_size += upload.size
+                if total_size > settings.MAX_MESH_METRICS_BATCH_SIZE:
+                    raise HTTPException(status_code=413, detail="Mesh batch too large")
+            results = await asyncio.gather(*[measure(file, upload) for file, upload in zip(files, uploads)])
         
-        augmented_meshes = {}
-        for name, mesh in result["augmented_meshes"].items():
-            augmented_meshes[name] = ThreeDProcessor.mesh_to_dict(mesh)
-        
-        return {
-            "augmented_meshes": augmented_meshes,
-            "steps": result["steps"]
-        }
+        measured = [result["metrics"] for result in results if "metrics" in result]
+        return JSONResponse(content={
+            "results": results,
+            "summary": {
+                "meshes": len(results),
+                "errors": len(results) - len(measured),
+                "watertight": sum(metrics["is_watertight"] for metrics in measured),
+                "with_degenerate_faces": sum(metrics["degenerate_faces"] > 0 for metrics in measured),
+                "with_duplicate_faces": sum(metrics["duplicate_faces"] > 0 for metrics in measured),
+                "with_unreferenced_vertices": sum(metrics["unreferenced_vertices"] > 0 for metrics in measured)
+            }
+        })
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error augmenting 3D file: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.error(f"Error measuring 3D batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
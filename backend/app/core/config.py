@@ -1,6 +1,9 @@
 # backend/app/core/config.py
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
+import os
+
+_CPU_COUNT = os.cpu_count() or 1
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Data Preprocessor API"
@@ -8,6 +11,15 @@ class Settings(BaseSettings):
     
     # File upload settings
     MAX_UPLOAD_SIZE: int = 100 * 1024 * 1024  # 100MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 1MB
+    UPLOAD_SPOOL_THRESHOLD: int = 8 * 1024 * 1024  # 8MB, larger uploads go to disk
+    UPLOAD_TEMP_DIR: str = "uploads/temp"
+
+    # Result cache settings
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MEMORY_BYTES: int = 256 * 1024 * 1024  # 256MB
+    RESULT_CACHE_DIR: str = "uploads/cache"  # empty string disables the disk tier
+    RESULT_CACHE_TTL: int = 24 * 3600  # seconds
     
     # Image settings
     ALLOWED_IMAGE_TYPES: List[str] = [
@@ -17,6 +29,8 @@ class Settings(BaseSettings):
     ]
     MAX_IMAGE_SIZE: int = 10 * 1024 * 1024  # 10MB
     MAX_IMAGE_DIMENSION: int = 4096
+    MAX_IMAGE_BATCH_FILES: int = 10000
+    ALLOWED_IMAGE_EXTENSIONS: List[str] = [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".tif", ".tiff"]
     
     # Audio settings
     ALLOWED_AUDIO_TYPES: List[str] = [
@@ -25,6 +39,8 @@ class Settings(BaseSettings):
         "audio/x-wav"
     ]
     MAX_AUDIO_SIZE: int = 50 * 1024 * 1024  # 50MB
+    MAX_AUDIO_STREAM_SIZE: int = 2 * 1024 * 1024 * 1024  # 2GB, streamed preprocessing only
+    AUDIO_STREAM_BLOCK_SIZE: int = 65536  # frames per block
     
     # Text settings
     ALLOWED_TEXT_TYPES: List[str] = [
@@ -32,6 +48,16 @@ class Settings(BaseSettings):
         "application/octet-stream"
     ]
     MAX_TEXT_SIZE: int = 5 * 1024 * 1024  # 5MB
+    MAX_TEXT_STREAM_SIZE: int = 2 * 1024 * 1024 * 1024  # 2GB, streamed preprocessing only; MAX_TEXT_SIZE applies per sentence
+    TEXT_TOKENIZER: str = "fast"  # "fast" or "nltk"; identical output, see text_processor.TOKENIZERS
+    MAX_TEXT_BATCH_SIZE: int = 2 * 1024 * 1024 * 1024  # 2GB, batch preprocessing only; MAX_TEXT_SIZE applies per document
+    NLTK_DATA_DIR: str = ""  # searched before NLTK's default paths; empty uses the defaults only
+    NLTK_DOWNLOAD: bool = False  # fetch missing NLTK packages into NLTK_DATA_DIR instead of failing
+    DEDUP_INDEX_PATH: str = "uploads/dedup/index.sqlite3"  # empty string keeps the index in memory
+    DEDUP_NUM_PERM: int = 128  # MinHash signature length
+    DEDUP_BANDS: int = 32  # LSH bands; must divide DEDUP_NUM_PERM
+    DEDUP_SHINGLE_SIZE: int = 5  # words per shingle
+    DEDUP_THRESHOLD: float = 0.8  # estimated Jaccard similarity for a near duplicate
     
     # 3D settings
     ALLOWED_3D_TYPES: List[str] = [
@@ -40,6 +66,40 @@ class Settings(BaseSettings):
         "application/octet-stream"
     ]
     MAX_3D_SIZE: int = 50 * 1024 * 1024  # 50MB
+    MAX_3D_SCAN_SIZE: int = 2 * 1024 * 1024 * 1024  # 2GB, binary STL/PLY for /3d/index and /3d/metrics only; other formats keep MAX_3D_SIZE
+    MESH_CLEANUP_WORKERS: int = min(4, _CPU_COUNT)  # threads per preprocess job for component repairs (NumPy/SciPy release the GIL)
+    MESH_LOD_LEVELS: List[float] = [0.01, 0.05, 0.25, 1.0]  # face ratios of the /3d/lod pyramid, coarsest first
+    MESH_INDEX_CACHE_BYTES: int = 512 * 1024 * 1024  # 512MB of spatial indexes kept for /3d/index queries
+    MAX_MESH_QUERY_POINTS: int = 100000  # points, rays or samples per analytics request
+    MAX_MESH_DISTANCE_GRID: int = 64  # distance field resolution per axis
+    MAX_MESH_METRICS_BATCH_FILES: int = 1000
+    MAX_MESH_METRICS_BATCH_SIZE: int = 8 * 1024 * 1024 * 1024  # 8GB of meshes per /3d/metrics request; MAX_3D_SCAN_SIZE applies per mesh
+    MAX_MESH_AUGMENT_VARIANTS: int = 256  # variants per /3d/augment/batch request
+    MAX_MESH_AUGMENT_VERTICES: int = 50000000  # variants x vertices per batch, ~600MB of float32 positions
+
+    # Worker pool settings (per modality, 0 processes = thread pool only)
+    WORKER_THREADS: Dict[str, int] = {
+        "image": _CPU_COUNT,
+        "audio": 2,
+        "text": 2,
+        "3d": 2
+    }
+    WORKER_PROCESSES: Dict[str, int] = {
+        "image": 0,
+        "audio": _CPU_COUNT,
+        "text": _CPU_COUNT,
+        "3d": _CPU_COUNT
+    }
+    WORKER_QUEUE_SIZE: Dict[str, int] = {
+        "image": 32,
+        "audio": 8,
+        "text": 16,
+        "3d": 8
+    }
+    WORKER_RETRY_AFTER: int = 5  # seconds
+
+    # Modalities whose processors load at startup; the rest load on first request
+    WARMUP_MODALITIES: List[str] = []
 
     class Config:
         case_sensitive = True
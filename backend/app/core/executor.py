@@ -0,0 +1,148 @@
+# backend/app/core/executor.py
+import asyncio
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+from fastapi import HTTPException
+from app.core.config import settings
+from app.core.logger import logger
+
+
+class _BoundedExecutor:
+    """Wraps an executor with a bounded number of running plus queued jobs"""
+
+    def __init__(self, name: str, factory: Callable[[], Executor], workers: int, queue_size: int):
+        self.name = name
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self._factory = factory
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        # Pools are created lazily so idle modalities don't hold threads or processes
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._factory()
+                logger.info(f"Started {self.name} pool with {self.workers} workers")
+            return self._executor
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._pending >= self.capacity:
+                logger.warning(f"{self.name} pool is saturated ({self._pending} jobs pending)")
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"Server busy, {self.name} queue is full",
+                    headers={"Retry-After": str(settings.WORKER_RETRY_AFTER)}
+                )
+            self._pending += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        self._acquire()
+        try:
+            future = self._get_executor().submit(partial(func, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        # The slot is freed when the job ends, not when a cancelled request stops waiting for it
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "pending": self._pending,
+            "started": self._executor is not None
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+class WorkerPool:
+    """Thread and process pools for a single modality.
+
+    Thread jobs suit work that releases the GIL (PIL, NumPy, file decoding);
+    CPU-bound pure-Python work should go to the process pool. Callables and
+    arguments sent to the process pool must be picklable.
+    """
+
+    def __init__(self, modality: str, thread_workers: int, process_workers: int, queue_size: int):
+        self.modality = modality
+        self.threads = _BoundedExecutor(
+            f"{modality} thread",
+            partial(ThreadPoolExecutor, max_workers=thread_workers, thread_name_prefix=f"{modality}-worker"),
+            thread_workers,
+            queue_size
+        )
+        self.processes = None
+        if process_workers > 0:
+            self.processes = _BoundedExecutor(
+                f"{modality} process",
+                partial(ProcessPoolExecutor, max_workers=process_workers),
+                process_workers,
+                queue_size
+            )
+
+    async def run(self, func: Callable, *args, cpu_bound: bool = False, **kwargs) -> Any:
+        """Run func off the event loop; cpu_bound jobs use the process pool when configured"""
+        if cpu_bound and self.processes is not None:
+            return await self.processes.run(func, *args, **kwargs)
+        return await self.threads.run(func, *args, **kwargs)
+
+    def concurrency(self, cpu_bound: bool = False) -> int:
+        """Number of workers a job of this kind would be spread across"""
+        if cpu_bound and self.processes is not None:
+            return self.processes.workers
+        return self.threads.workers
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "threads": self.threads.stats(),
+            "processes": self.processes.stats() if self.processes else None
+        }
+
+    def shutdown(self) -> None:
+        self.threads.shutdown()
+        if self.processes is not None:
+            self.processes.shutdown()
+
+
+_pools: Dict[str, WorkerPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(modality: str) -> WorkerPool:
+    """Return the shared worker pool for a modality ('image', 'audio', 'text' or '3d')"""
+    with _pools_lock:
+        if modality not in _pools:
+            _pools[modality] = WorkerPool(
+                modality,
+                thread_workers=settings.WORKER_THREADS.get(modality, 1),
+                process_workers=settings.WORKER_PROCESSES.get(modality, 0),
+                queue_size=settings.WORKER_QUEUE_SIZE.get(modality, 0)
+            )
+        return _pools[modality]
+
+
+def pool_stats() -> Dict[str, Any]:
+    with _pools_lock:
+        return {modality: pool.stats() for modality, pool in _pools.items()}
+
+
+def shutdown_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown()
+        _pools.clear()
@@ -0,0 +1,113 @@
+# backend/app/core/lazy.py
+import importlib
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from app.core.logger import logger
+
+
+def _import_target(module: str, attribute: Optional[str]) -> Any:
+    target = importlib.import_module(module)
+    return getattr(target, attribute) if attribute else target
+
+
+class LazyObject:
+    """Stand-in that builds the real object on first use or at warmup.
+
+    Attribute access and calls are forwarded to the real object, so a lazy
+    processor class can be used exactly like the class. Imported targets
+    pickle as the real object, so they can be passed to process pools.
+    """
+
+    def __init__(self, modality: str, name: str, loader: Callable[[], Any],
+                 import_target: Optional[Tuple[str, Optional[str]]] = None):
+        self._modality = modality
+        self._name = name
+        self._loader = loader
+        self._import_target = import_target
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._value = None
+        self._seconds: Optional[float] = None
+        self._error: Optional[str] = None
+
+    def _load(self) -> Any:
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                start = time.perf_counter()
+                try:
+                    self._value = self._loader()
+                except Exception as e:
+                    self._error = str(e)
+                    logger.error(f"Error loading {self._name} for {self._modality}: {str(e)}")
+                    raise
+                self._seconds = time.perf_counter() - start
+                self._error = None
+                self._loaded = True
+                logger.info(f"Loaded {self._name} for {self._modality} in {self._seconds:.2f}s")
+        return self._value
+
+    # Proxy state is underscored so it never shadows an attribute of the real object
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__") or "_loader" not in self.__dict__:
+            raise AttributeError(name)
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self._load()(*args, **kwargs)
+
+    def __reduce__(self):
+        if self._import_target is None:
+            raise TypeError(f"Lazy {self._name} cannot be pickled")
+        return _import_target, self._import_target
+
+
+_registry: Dict[str, List[LazyObject]] = {}
+_registry_lock = threading.Lock()
+
+
+def _register(lazy: LazyObject) -> LazyObject:
+    with _registry_lock:
+        _registry.setdefault(lazy._modality, []).append(lazy)
+    return lazy
+
+
+def lazy_import(modality: str, module: str, attribute: Optional[str] = None) -> LazyObject:
+    """Lazy stand-in for a module, or an attribute of it, belonging to a modality"""
+    name = f"{module}.{attribute}" if attribute else module
+    return _register(LazyObject(modality, name, lambda: _import_target(module, attribute), (module, attribute)))
+
+
+def lazy_instance(modality: str, name: str, factory: Callable[[], Any]) -> LazyObject:
+    """Lazy stand-in for an object built by factory on first use"""
+    return _register(LazyObject(modality, name, factory))
+
+
+def warmup(modalities: Optional[Iterable[str]] = None) -> None:
+    """Load everything registered for the given modalities (all when None); failures are logged and reported by readiness"""
+    with _registry_lock:
+        selected = {m: list(items) for m, items in _registry.items() if modalities is None or m in modalities}
+    for modality, items in selected.items():
+        for lazy in items:
+            try:
+                lazy._load()
+            except Exception:
+                break
+
+
+def readiness() -> Dict[str, Dict[str, Any]]:
+    """Per modality: whether everything it needs is loaded, total load time and any load error"""
+    with _registry_lock:
+        items = {m: list(lazies) for m, lazies in _registry.items()}
+    report = {}
+    for modality, lazies in items.items():
+        errors = [lazy._error for lazy in lazies if lazy._error]
+        report[modality] = {
+            "warm": all(lazy._loaded for lazy in lazies),
+            "load_seconds": round(sum(lazy._seconds or 0.0 for lazy in lazies), 3)
+        }
+        if errors:
+            report[modality]["error"] = errors[0]
+    return report
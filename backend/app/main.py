@@ -1,9 +1,14 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 from app.core.config import settings
+from app.core.executor import pool_stats, shutdown_pools
+from app.core.lazy import readiness, warmup
+from app.utils.result_cache import result_cache, stored_response
 from app.api.endpoints import text_router, image_router, audio_router, threed_router
+import asyncio
 import os
 from app.core.logger import logger
 
@@ -61,10 +66,43 @@ app.include_router(image_router, prefix="/api/v1")
 app.include_router(audio_router, prefix="/api/v1")
 app.include_router(threed_router, prefix="/api/v1")
 
+@app.on_event("startup")
+async def warmup_modalities():
+    # Loads in the background so the server answers health checks meanwhile; /api/v1/ready reports progress
+    if settings.WARMUP_MODALITIES:
+        app.state.warmup = asyncio.create_task(run_in_threadpool(warmup, settings.WARMUP_MODALITIES))
+
+@app.on_event("shutdown")
+async def shutdown_worker_pools():
+    shutdown_pools()
+
 # Health check endpoint
 @app.get("/api/v1/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "workers": pool_stats()}
+
+# Readiness: 503 until every modality in WARMUP_MODALITIES is loaded; others load on first request
+@app.get("/api/v1/ready")
+async def ready_check():
+    modalities = readiness()
+    ready = all(modalities.get(m, {}).get("warm", False) for m in settings.WARMUP_MODALITIES)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "warming", "modalities": modalities}
+    )
+
+# Result cache statistics
+@app.get("/api/v1/cache/stats")
+async def cache_stats():
+    return result_cache.stats()
+
+# Cached results by key (the ETag of the response that produced them), with Range support
+@app.get("/api/v1/cache/results/{key}")
+async def cached_result(request: Request, key: str):
+    response = await stored_response(request, key)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Result not found in cache")
+    return response
 
 # Status check endpoints for each service
 @app.get("/api/v1/image/status")
@@ -86,18 +124,25 @@ async def threed_status():
 # Error handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return {
-        "detail": str(exc.detail),
-        "status_code": exc.status_code
-    }
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={
+            "detail": str(exc.detail),
+            "status_code": exc.status_code
+        },
+        headers=getattr(exc, "headers", None)
+    )
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
     logger.error(f"Unhandled exception: {str(exc)}")
-    return {
-        "detail": "Internal server error",
-        "status_code": 500
-    }
+    return JSONResponse(
+        status_code=500,
+        content={
+            "detail": "Internal server error",
+            "status_code": 500
+        }
+    )
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,11 +1,423 @@
 import librosa
 import numpy as np
 import soundfile as sf
-from typing import Dict, Any
+from typing import Dict, Any, BinaryIO, Callable, Iterator, List, Optional, Tuple, Union
 import io
+import struct
 from app.core.logger import logger
 
+class Spectrogram:
+    """STFT of a mono signal, computed on first use and shared by every step that needs it"""
+
+    N_FFT = 2048
+    HOP_LENGTH = 512
+    # Frames per block for in-place spectral masks; bounds the size of temporaries
+    BLOCK_FRAMES = 1024
+
+    def __init__(self, y: np.ndarray, n_fft: int = N_FFT, hop_length: int = HOP_LENGTH):
+        self.y = y
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self._stft: Optional[np.ndarray] = None
+
+    @property
+    def stft(self) -> np.ndarray:
+        if self._stft is None:
+            self._stft = librosa.stft(self.y, n_fft=self.n_fft, hop_length=self.hop_length)
+        return self._stft
+
+    def mean_magnitude(self) -> float:
+        D = self.stft
+        total = 0.0
+        for start in range(0, D.shape[1], self.BLOCK_FRAMES):
+            total += float(np.abs(D[:, start:start + self.BLOCK_FRAMES]).sum(dtype=np.float64))
+        return total / D.size
+
+    def spectral_gate(self, floor_ratio: float, length: Optional[int] = None) -> np.ndarray:
+        """
+        Subtract a noise floor of floor_ratio * mean magnitude from every bin.
+        The complex bins are scaled in place by max(|D| - floor, 0) / |D|, which
+        keeps the phase without an angle/exp round trip. Consumes the cached STFT.
+        """
+        D = self.stft
+        noise_floor = floor_ratio * self.mean_magnitude()
+        for start in range(0, D.shape[1], self.BLOCK_FRAMES):
+            block = D[:, start:start + self.BLOCK_FRAMES]
+            magnitude = np.abs(block)
+            gain = np.maximum(magnitude - noise_floor, 0)
+            np.divide(gain, magnitude, out=gain, where=magnitude > 0)
+            block *= gain
+        self._stft = None
+        return librosa.istft(D, n_fft=self.n_fft, hop_length=self.hop_length, length=length)
+
+    def phase_vocoder(self, rate: float) -> np.ndarray:
+        """
+        Vectorized equivalent of librosa.phase_vocoder on the cached STFT.
+        Output frames are produced in blocks, so only one block of magnitudes and
+        phases is held at a time. The phase is accumulated in float64 and wrapped,
+        which also avoids the drift librosa's float32 accumulator shows on long signals.
+        """
+        D = self.stft
+        n_bins, n_frames = D.shape
+        time_steps = np.arange(0, n_frames, rate, dtype=np.float64)
+        stretched = np.empty((n_bins, len(time_steps)), dtype=D.dtype)
+        two_pi = 2.0 * np.pi
+        phase_acc = np.angle(D[:, 0]).astype(np.float64)
+
+        for start in range(0, len(time_steps), self.BLOCK_FRAMES):
+            steps = time_steps[start:start + self.BLOCK_FRAMES]
+            first = int(steps[0])
+            last = int(steps[-1]) + 2
+            columns = D[:, first:min(last, n_frames)]
+            if columns.shape[1] < last - first:
+                # Zero columns past the end, as librosa pads them
+                columns = np.pad(columns, ((0, 0), (0, last - first - columns.shape[1])))
+            magnitude = np.abs(columns)
+            phase = np.angle(columns)
+
+            index = steps.astype(np.int64) - first
+            alpha = (steps % 1.0).astype(np.float32)
+            mag = (1.0 - alpha) * magnitude[:, index] + alpha * magnitude[:, index + 1]
+
+            # Analysis and synthesis hops are equal, so the expected advance plus the
+            # wrapped deviation is just the frame-to-frame phase difference mod 2*pi
+            advance = phase[:, index + 1] - phase[:, index]
+            accumulated = np.cumsum(advance, axis=1, dtype=np.float64)
+            accumulated += phase_acc[:, None]
+            frame_phase = np.empty_like(accumulated)
+            frame_phase[:, 0] = phase_acc
+            frame_phase[:, 1:] = accumulated[:, :-1]
+            phase_acc = np.mod(accumulated[:, -1], two_pi)
+            frame_phase = (frame_phase - two_pi * np.floor(frame_phase / two_pi)).astype(np.float32)
+
+            block = stretched[:, start:start + len(steps)]
+            block.real = mag * np.cos(frame_phase)
+            block.imag = mag * np.sin(frame_phase)
+        return stretched
+
+    def time_stretch(self, rate: float) -> np.ndarray:
+        """Equivalent to librosa.effects.time_stretch, reusing the cached STFT"""
+        stretched = self.phase_vocoder(rate)
+        return librosa.istft(
+            stretched,
+            n_fft=self.n_fft,
+            hop_length=self.hop_length,
+            dtype=self.y.dtype,
+            length=int(round(self.y.shape[-1] / rate))
+        )
+
+    def pitch_shift(self, sr: int, n_steps: float, bins_per_octave: int = 12,
+                    res_type: str = "soxr_hq") -> np.ndarray:
+        """Equivalent to librosa.effects.pitch_shift, reusing the cached STFT"""
+        rate = 2.0 ** (-float(n_steps) / bins_per_octave)
+        shifted = librosa.resample(self.time_stretch(rate), orig_sr=float(sr) / rate, target_sr=sr, res_type=res_type)
+        return librosa.util.fix_length(shifted, size=self.y.shape[-1])
+
+class StreamingDenoiser:
+    """
+    Spectral gate over a stream of blocks using overlap-add STFT.
+    Frames and window match librosa.stft/istft with center=True; the noise floor
+    is floor_ratio times the running mean magnitude of every frame seen so far.
+    Memory is bounded by one block plus n_fft samples of overlap.
+    """
+
+    def __init__(self, floor_ratio: float = 0.1, n_fft: int = Spectrogram.N_FFT,
+                 hop_length: int = Spectrogram.HOP_LENGTH):
+        if n_fft % hop_length:
+            raise ValueError("n_fft must be a multiple of hop_length")
+        self.floor_ratio = floor_ratio
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.window = librosa.filters.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+        # Centered framing: the stream starts with n_fft // 2 zeros, which are dropped from the output
+        pad = n_fft // 2
+        self._input = np.zeros(pad, dtype=np.float32)
+        self._output = np.zeros(pad, dtype=np.float32)
+        self._norm = np.zeros(pad, dtype=np.float32)
+        self._skip = pad
+        self._received = 0
+        self._emitted = 0
+        self._magnitude_sum = 0.0
+        self._magnitude_count = 0
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Feed a block of samples; returns the output samples that are complete"""
+        self._received += len(block)
+        return self._run(block.astype(np.float32, copy=False), final=False)
+
+    def flush(self) -> np.ndarray:
+        """Finish the stream; returns the remaining output samples"""
+        return self._run(np.zeros(self.n_fft // 2, dtype=np.float32), final=True)
+
+    def _run(self, block: np.ndarray, final: bool) -> np.ndarray:
+        self._input = np.concatenate([self._input, block])
+        self._output = np.concatenate([self._output, np.zeros(len(block), dtype=np.float32)])
+        self._norm = np.concatenate([self._norm, np.zeros(len(block), dtype=np.float32)])
+
+        n_frames = max(0, (len(self._input) - self.n_fft) // self.hop_length + 1)
+        if n_frames:
+            frames = np.lib.stride_tricks.sliding_window_view(self._input, self.n_fft)[::self.hop_length][:n_frames]
+            spectrum = np.fft.rfft(frames * self.window, axis=1)
+            magnitude = np.abs(spectrum)
+            self._magnitude_sum += float(magnitude.sum())
+            self._magnitude_count += magnitude.size
+            noise_floor = self.floor_ratio * self._magnitude_sum / self._magnitude_count
+
+            gain = np.maximum(magnitude - noise_floor, 0)
+            np.divide(gain, magnitude, out=gain, where=magnitude > 0)
+            spectrum *= gain
+            frames = np.fft.irfft(spectrum, n=self.n_fft, axis=1).astype(np.float32) * self.window
+            self._overlap_add(self._output, frames)
+            self._overlap_add(self._norm, np.broadcast_to(self.window ** 2, frames.shape))
+
+        # Samples before the next frame start receive no further contributions
+        done = len(self._input) if final else n_frames * self.hop_length
+        output = self._output[:done]
+        norm = self._norm[:done]
+        output = np.divide(output, norm, out=output.copy(), where=norm > np.finfo(np.float32).tiny)
+        self._input = self._input[done:]
+        self._output = self._output[done:]
+        self._norm = self._norm[done:]
+
+        if self._skip:
+            skipped = min(self._skip, len(output))
+            output = output[skipped:]
+            self._skip -= skipped
+        output = output[:self._received - self._emitted]
+        self._emitted += len(output)
+        return output
+
+    def _overlap_add(self, target: np.ndarray, frames: np.ndarray) -> None:
+        # Every (n_fft // hop)-th frame tiles the signal without overlap, so each
+        # phase is one contiguous add
+        ratio = self.n_fft // self.hop_length
+        for phase in range(ratio):
+            selected = frames[phase::ratio]
+            if len(selected):
+                start = phase * self.hop_length
+                target[start:start + selected.size] += selected.reshape(-1)
+
+class _ForwardSink:
+    """
+    Write-only file object for libsndfile that hands bytes out as soon as they
+    are written. Bytes already taken cannot change, so writes that seek back
+    into them (header fix-ups at close) are dropped.
+    """
+
+    def __init__(self):
+        self.pending = bytearray()
+        self.taken = 0
+        self.position = 0
+        self.size = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        end = self.position + len(data)
+        if end > self.taken:
+            skip = max(0, self.taken - self.position)
+            start = self.position + skip - self.taken
+            self.pending[start:start + len(data) - skip] = data[skip:]
+        self.position = end
+        self.size = max(self.size, end)
+        return len(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = offset
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+    def take(self) -> bytes:
+        data = bytes(self.pending)
+        self.taken += len(data)
+        self.pending.clear()
+        return data
+
+class StreamingEncoder:
+    """
+    Encode mono float audio incrementally so the first bytes can be sent before
+    the last samples exist. WAV and npy headers are written up front from
+    n_samples; FLAC and OGG go through libsndfile, whose header fix-ups at close
+    are lost except the FLAC total sample count, patched in from n_samples.
+    """
+
+    # Offset of the 64-bit field in STREAMINFO whose low 36 bits are the total sample count
+    FLAC_TOTAL_SAMPLES_OFFSET = 18
+
+    def __init__(self, sr: int, output_format: str = "wav", quality: Optional[int] = None,
+                 compression: Optional[int] = None, n_samples: Optional[int] = None):
+        self.output_format = output_format
+        self.n_samples = n_samples
+        self._header = b""
+        self._file = None
+        if output_format in ("wav", "npy") and n_samples is None:
+            raise ValueError(f"{output_format} output needs the number of samples up front")
+        if output_format == "wav":
+            self._header = AudioProcessor.wav_header(sr, n_samples)
+        elif output_format == "npy":
+            header = io.BytesIO()
+            np.lib.format.write_array_header_1_0(
+                header, {"descr": "<f4", "fortran_order": False, "shape": (n_samples,)}
+            )
+            self._header = header.getvalue()
+        else:
+            self._sink = _ForwardSink()
+            self._file = sf.SoundFile(
+                self._sink, 'w', samplerate=sr, channels=1,
+                **AudioProcessor.soundfile_options(output_format, quality, compression)
+            )
+            self._patched = n_samples is None or output_format != "flac"
+
+    def write(self, samples: np.ndarray) -> bytes:
+        """Encode a block of samples; returns the bytes that are ready to send"""
+        header, self._header = self._header, b""
+        if self.output_format == "npy":
+            return header + samples.astype('<f4', copy=False).tobytes()
+        samples = np.clip(samples, -1.0, 1.0)
+        if self._file is None:
+            return header + (samples * 32767).round().astype('<i2').tobytes()
+        self._file.write(samples)
+        return self._take()
+
+    def close(self) -> bytes:
+        """Finish the stream; returns the remaining bytes"""
+        if self._file is None:
+            header, self._header = self._header, b""
+            return header
+        self._file.close()
+        return self._take()
+
+    def _take(self) -> bytes:
+        pending = self._sink.pending
+        if not self._patched:
+            # Hold bytes back until STREAMINFO is complete, then fill in the length
+            offset = self.FLAC_TOTAL_SAMPLES_OFFSET
+            if len(pending) < offset + 8:
+                return b""
+            field = int.from_bytes(pending[offset:offset + 8], "big")
+            field = (field & ~((1 << 36) - 1)) | self.n_samples
+            pending[offset:offset + 8] = field.to_bytes(8, "big")
+            self._patched = True
+        return self._sink.take()
+
 class AudioProcessor:
+    # Bump when processing output changes so cached results are invalidated
+    VERSION = "2"
+
+    # res_type values accepted by librosa.resample
+    RESAMPLERS = (
+        "soxr_vhq", "soxr_hq", "soxr_mq", "soxr_lq", "soxr_qq",
+        "kaiser_best", "kaiser_fast", "fft", "scipy", "polyphase",
+        "linear", "zero_order_hold", "sinc_best", "sinc_medium", "sinc_fastest"
+    )
+
+    # output_format -> (soundfile format, subtype, media type, file extension); None means a raw .npy array
+    OUTPUT_FORMATS = {
+        "wav": ("WAV", "PCM_16", "audio/wav", "wav"),
+        "flac": ("FLAC", "PCM_16", "audio/flac", "flac"),
+        "ogg": ("OGG", "VORBIS", "audio/ogg", "ogg"),
+        "npy": (None, None, "application/x-npy", "npy")
+    }
+
+    @staticmethod
+    def encoding_options(output_format: Optional[str] = "wav",
+                         quality: Optional[int] = None,
+                         compression: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Validate output encoding options
+        Args:
+            output_format: wav (16-bit PCM), flac, ogg (Vorbis) or npy (raw float32)
+            quality: 1-100 Vorbis quality for ogg
+            compression: 0-9 effort level for flac
+        """
+        output_format = (output_format or "wav").lower()
+        if output_format == "vorbis":
+            output_format = "ogg"
+        if output_format not in AudioProcessor.OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        if quality is not None and not 1 <= quality <= 100:
+            raise ValueError("quality must be between 1 and 100")
+        if compression is not None and not 0 <= compression <= 9:
+            raise ValueError("compression must be between 0 and 9")
+        return {"output_format": output_format, "quality": quality, "compression": compression}
+
+    @staticmethod
+    def media_type(output_format: str) -> str:
+        return AudioProcessor.OUTPUT_FORMATS[output_format][2]
+
+    @staticmethod
+    def file_extension(output_format: str) -> str:
+        return AudioProcessor.OUTPUT_FORMATS[output_format][3]
+
+    @staticmethod
+    def encoded_length(output_format: str, n_samples: int) -> Optional[int]:
+        """Size of a StreamingEncoder's output when it is known before encoding (wav and npy)"""
+        if output_format == "wav":
+            return 44 + 2 * n_samples
+        if output_format == "npy":
+            return len(StreamingEncoder(0, "npy", n_samples=n_samples).close()) + 4 * n_samples
+        return None
+
+    @staticmethod
+    def soundfile_options(output_format: str, quality: Optional[int] = None,
+                          compression: Optional[int] = None) -> Dict[str, Any]:
+        """soundfile format arguments; libsndfile's compression_level runs from 0 (best quality) to 1"""
+        sf_format, subtype = AudioProcessor.OUTPUT_FORMATS[output_format][:2]
+        options = {"format": sf_format, "subtype": subtype}
+        if output_format == "ogg" and quality is not None:
+            options["compression_level"] = 1.0 - quality / 100
+        elif output_format == "flac" and compression is not None:
+            options["compression_level"] = compression / 9
+        return options
+
+    @staticmethod
+    def read_info(file: BinaryIO) -> Optional[Dict[str, Any]]:
+        """Read format metadata from the file header without decoding samples; None if unsupported"""
+        try:
+            info = sf.info(file)
+        except sf.LibsndfileError:
+            return None
+        finally:
+            file.seek(0)
+        return {
+            "duration": info.duration,
+            "sample_rate": info.samplerate,
+            "num_channels": info.channels,
+            "frames": info.frames,
+            "format": info.format,
+            "subtype": info.subtype
+        }
+
+    @staticmethod
+    def load(file: BinaryIO, sr: Optional[int] = None, mono: bool = True,
+             res_type: str = "soxr_hq") -> Tuple[np.ndarray, int]:
+        """
+        Decode audio from a file object at its native rate.
+        Resamples only when sr is given and differs from the native rate.
+        Formats libsndfile cannot read fall back to librosa.load.
+        """
+        try:
+            y, native_sr = sf.read(file, dtype='float32', always_2d=True)
+            if mono:
+                # Average the interleaved channels with one matrix-vector product;
+                # much faster than librosa.to_mono on the transposed frames
+                y = y @ np.full(y.shape[1], 1.0 / y.shape[1], dtype=np.float32)
+            else:
+                y = np.ascontiguousarray(y.T)
+        except sf.LibsndfileError:
+            file.seek(0)
+            y, native_sr = librosa.load(file, sr=None, mono=mono)
+
+        if sr and sr != native_sr:
+            y = librosa.resample(y, orig_sr=native_sr, target_sr=sr, res_type=res_type)
+            native_sr = sr
+        return y, native_sr
+
     @staticmethod
     def validate_audio(y: np.ndarray, sr: int) -> Dict[str, Any]:
         try:
@@ -48,20 +460,9 @@ class AudioProcessor:
             # Noise reduction
             if reduce_noise:
                 try:
-                    # Simple noise reduction using spectral gating
-                    D = librosa.stft(y)
-                    D_mag = np.abs(D)
-                    D_phase = np.angle(D)
-                    
-                    # Estimate noise floor
-                    noise_floor = np.mean(D_mag) * 0.1
-                    
-                    # Apply soft thresholding
-                    D_mag = np.maximum(D_mag - noise_floor, 0)
-                    
-                    # Reconstruct signal
-                    D_denoised = D_mag * np.exp(1j * D_phase)
-                    y = librosa.istft(D_denoised, length=original_length)
+                    # Simple noise reduction using spectral gating: soft-threshold
+                    # the magnitude at 10% of its mean
+                    y = Spectrogram(y).spectral_gate(0.1, length=original_length)
                     
                     steps.append("Reduced noise")
                 except Exception as e:
@@ -94,8 +495,113 @@ class AudioProcessor:
             raise
 
     @staticmethod
-    def save_audio(y: np.ndarray, sr: int) -> bytes:
-        """Convert numpy array to audio bytes"""
+    def analyze_stream(file: BinaryIO, block_size: int, top_db: float = 20,
+                       frame_length: int = 2048, hop_length: int = 512) -> Dict[str, Any]:
+        """
+        First pass over a seekable audio file, one block at a time.
+        Returns the sample rate, length, peak and the sample range that
+        librosa.effects.trim(top_db=top_db) would keep. Only one power value per
+        hop is retained, so the signal itself is never held in memory.
+        """
+        info = sf.info(file)
+        file.seek(0)
+        peak = 0.0
+        powers = []
+        length = 0
+        # Centered frames: frame_length // 2 zeros before the first sample and after the last
+        tail = np.zeros(frame_length // 2, dtype=np.float64)
+
+        def frame_powers(buffer: np.ndarray) -> int:
+            n_frames = max(0, (len(buffer) - frame_length) // hop_length + 1)
+            if n_frames:
+                cumulative = np.concatenate([[0.0], np.cumsum(buffer ** 2)])
+                starts = np.arange(n_frames) * hop_length
+                powers.append((cumulative[starts + frame_length] - cumulative[starts]) / frame_length)
+            return n_frames * hop_length
+
+        for block in sf.blocks(file, blocksize=block_size, dtype='float32', always_2d=True):
+            mono = block.mean(axis=1)
+            length += len(mono)
+            if len(mono):
+                peak = max(peak, float(np.max(np.abs(mono))))
+            buffer = np.concatenate([tail, mono])
+            tail = buffer[frame_powers(buffer):]
+        frame_powers(np.concatenate([tail, np.zeros(frame_length // 2)]))
+
+        power = np.concatenate(powers) if powers else np.zeros(0)
+        # Same decibel threshold as librosa.effects.trim, relative to the loudest frame
+        amin = 1e-10
+        db = 10 * np.log10(np.maximum(amin, power)) - 10 * np.log10(max(amin, float(power.max(initial=0))))
+        non_silent = np.flatnonzero(db > -top_db)
+        if len(non_silent):
+            trim = (int(non_silent[0]) * hop_length, min(length, (int(non_silent[-1]) + 1) * hop_length))
+        else:
+            trim = (0, 0)
+
+        return {
+            "sample_rate": info.samplerate,
+            "channels": info.channels,
+            "length": length,
+            "peak": peak,
+            "trim": trim
+        }
+
+    @staticmethod
+    def preprocess_stream(file: BinaryIO, analysis: Dict[str, Any], block_size: int,
+                          normalize: bool = True, remove_silence: bool = True,
+                          reduce_noise: bool = True, output_format: str = "wav",
+                          quality: Optional[int] = None,
+                          compression: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Second pass: stream the preprocessed audio as mono output_format.
+        Unlike preprocess, trimmed silence is removed rather than padded back,
+        and the final peak normalization uses the gain from analyze_stream
+        (samples already sent cannot be rescaled), followed by clipping.
+        """
+        start, end = analysis["trim"] if remove_silence else (0, analysis["length"])
+        gain = 1.0 / analysis["peak"] if normalize and analysis["peak"] > 0 else 1.0
+        denoiser = StreamingDenoiser(0.1) if reduce_noise else None
+
+        encoder = StreamingEncoder(analysis["sample_rate"], output_format, quality, compression,
+                                   n_samples=end - start)
+
+        file.seek(0)
+        offset = 0
+        for block in sf.blocks(file, blocksize=block_size, dtype='float32', always_2d=True):
+            mono = block.mean(axis=1)
+            block_start = offset
+            offset += len(mono)
+            mono = mono[max(0, start - block_start):max(0, end - block_start)]
+            if not len(mono):
+                continue
+            mono = mono * gain
+            if denoiser is not None:
+                mono = denoiser.process(mono)
+            if len(mono):
+                chunk = encoder.write(mono)
+                if chunk:
+                    yield chunk
+        if denoiser is not None:
+            remaining = denoiser.flush()
+            chunk = encoder.write(remaining) if len(remaining) else b""
+            if chunk:
+                yield chunk
+        remaining = encoder.close()
+        if remaining:
+            yield remaining
+
+    @staticmethod
+    def wav_header(sr: int, n_samples: int, channels: int = 1, sample_width: int = 2) -> bytes:
+        """RIFF header for PCM data that will follow in chunks"""
+        data_size = n_samples * channels * sample_width
+        return b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE" + b"fmt " + struct.pack(
+            "<IHHIIHH", 16, 1, channels, sr, sr * channels * sample_width, channels * sample_width, sample_width * 8
+        ) + b"data" + struct.pack("<I", data_size)
+
+    @staticmethod
+    def encode(y: np.ndarray, sr: int, output_format: str = "wav",
+               quality: Optional[int] = None, compression: Optional[int] = None) -> bytes:
+        """Encode a mono signal with options from encoding_options"""
         try:
             # Ensure the array is real-valued
             if np.iscomplexobj(y):
@@ -108,37 +614,162 @@ class AudioProcessor:
             # Convert to float32
             y = y.astype(np.float32)
             
-            # Save to buffer
             buffer = io.BytesIO()
-            sf.write(buffer, y, sr, format='WAV', subtype='PCM_16')
-            buffer.seek(0)
-            return buffer.read()
+            if output_format == "npy":
+                np.save(buffer, y, allow_pickle=False)
+            else:
+                sf.write(buffer, y, sr, **AudioProcessor.soundfile_options(output_format, quality, compression))
+            return buffer.getvalue()
         except Exception as e:
-            logger.error(f"Error saving audio: {str(e)}")
+            logger.error(f"Error encoding audio as {output_format}: {str(e)}")
             raise
 
     @staticmethod
-    def augment(y: np.ndarray, sr: int) -> Dict[str, Any]:
-        try:
-            augmented_audio = {}
-            steps = []
+    def encode_chunks(y: np.ndarray, sr: int, output_format: str = "wav",
+                      quality: Optional[int] = None, compression: Optional[int] = None,
+                      block_size: int = 65536) -> Iterator[bytes]:
+        """Encode a mono signal block by block, yielding bytes as the encoder produces them"""
+        if np.iscomplexobj(y):
+            y = np.abs(y)
+        peak = np.max(np.abs(y)) if len(y) else 0.0
+        gain = 1.0 / peak if peak > 1.0 else 1.0
+        encoder = StreamingEncoder(sr, output_format, quality, compression, n_samples=len(y))
+        for start in range(0, len(y), block_size):
+            chunk = encoder.write((y[start:start + block_size] * gain).astype(np.float32))
+            if chunk:
+                yield chunk
+        remaining = encoder.close()
+        if remaining:
+            yield remaining
+
+    @staticmethod
+    def save_audio(y: np.ndarray, sr: int) -> bytes:
+        """Convert numpy array to audio bytes"""
+        return AudioProcessor.encode(y, sr, "wav")
+
+    # name -> (function(y, sr, spectrogram, **params), default parameters, step description)
+    AUGMENTATIONS: Dict[str, Tuple[Callable[..., np.ndarray], Dict[str, Any], str]] = {
+        "time_stretched": (
+            lambda y, sr, spectrogram, rate: spectrogram.time_stretch(rate),
+            {"rate": 1.5},
+            "Time stretched ({rate:g}x)"
+        ),
+        "pitch_shifted": (
+            lambda y, sr, spectrogram, n_steps: spectrogram.pitch_shift(sr, n_steps=n_steps),
+            {"n_steps": 4.0},
+            "Pitch shifted ({n_steps:+g} semitones)"
+        ),
+        "volume_increased": (
+            lambda y, sr, spectrogram: librosa.util.normalize(y * 1.5),
+            {},
+            "Volume increased"
+        ),
+        "reversed": (
+            lambda y, sr, spectrogram: y[::-1],
+            {},
+            "Reversed"
+        ),
+        "gain": (
+            lambda y, sr, spectrogram, factor: np.clip(y * factor, -1.0, 1.0),
+            {"factor": 0.5},
+            "Gain ({factor:g}x)"
+        ),
+        "noise_added": (
+            lambda y, sr, spectrogram, snr_db, seed: AudioProcessor._add_noise(y, snr_db, int(seed)),
+            {"snr_db": 20.0, "seed": 0},
+            "Added noise ({snr_db:g} dB SNR)"
+        )
+    }
+    DEFAULT_AUGMENTATIONS = ("time_stretched", "pitch_shifted", "volume_increased", "reversed")
+    MAX_AUGMENTATIONS = 100
 
-            # Time stretching
-            augmented_audio["time_stretched"] = librosa.effects.time_stretch(y, rate=1.5)
-            steps.append("Time stretched (1.5x)")
+    @staticmethod
+    def resolve_augmentations(variants: Optional[Union[List[Any], Dict[str, Dict[str, Any]]]] = None,
+                              seed: Optional[int] = None) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Expand a variant selection into concrete renders
+        Args:
+            variants: None for the defaults; a list of names or of
+                {"name": ..., **params} objects; or a mapping of name to params.
+                A parameter given as [low, high] is drawn uniformly per render,
+                and "count" requests that many draws.
+            seed: Seed for the random draws, so a request is reproducible
+        Returns:
+            List of (variant id, augmentation name, parameters)
+        """
+        if variants is None:
+            variants = list(AudioProcessor.DEFAULT_AUGMENTATIONS)
+        if isinstance(variants, dict):
+            variants = [{"name": name, **(params or {})} for name, params in variants.items()]
+
+        rng = np.random.default_rng(seed)
+        resolved = []
+        for spec in variants:
+            spec = {"name": spec} if isinstance(spec, str) else dict(spec)
+            name = spec.pop("name", None)
+            if name not in AudioProcessor.AUGMENTATIONS:
+                raise ValueError(f"Unknown augmentation: {name}")
+            count = spec.pop("count", 1)
+            if not isinstance(count, int) or count < 1:
+                raise ValueError(f"count for {name} must be a positive integer")
+            _, defaults, _ = AudioProcessor.AUGMENTATIONS[name]
+            unknown = set(spec) - set(defaults)
+            if unknown:
+                raise ValueError(f"Unknown parameters for {name}: {', '.join(sorted(unknown))}")
 
-            # Pitch shifting
-            augmented_audio["pitch_shifted"] = librosa.effects.pitch_shift(y, sr=sr, n_steps=4)
-            steps.append("Pitch shifted (+4 semitones)")
+            for index in range(count):
+                params = dict(defaults)
+                if "seed" in defaults and "seed" not in spec:
+                    params["seed"] = int(rng.integers(2 ** 31))
+                for key, value in spec.items():
+                    try:
+                        if isinstance(value, (list, tuple)):
+                            low, high = (float(v) for v in value)
+                            params[key] = float(rng.uniform(low, high))
+                        else:
+                            params[key] = float(value)
+                    except (TypeError, ValueError):
+                        raise ValueError(f"Parameter {key} for {name} must be a number or a [low, high] range")
+                variant_id = name if count == 1 else f"{name}_{index}"
+                resolved.append((variant_id, name, params))
 
-            # Volume adjustment
-            augmented_audio["volume_increased"] = y * 1.5
-            augmented_audio["volume_increased"] = librosa.util.normalize(augmented_audio["volume_increased"])
-            steps.append("Volume increased")
+        ids = [variant_id for variant_id, _, _ in resolved]
+        if len(set(ids)) != len(ids):
+            raise ValueError("Each augmentation may only be listed once; use count for repeats")
+        if len(resolved) > AudioProcessor.MAX_AUGMENTATIONS:
+            raise ValueError(f"At most {AudioProcessor.MAX_AUGMENTATIONS} augmentations per request")
+        return resolved
 
-            # Reverse
-            augmented_audio["reversed"] = y[::-1]
-            steps.append("Reversed")
+    @staticmethod
+    def apply_augmentation(y: np.ndarray, sr: int, name: str, params: Dict[str, Any],
+                           spectrogram: Optional[Spectrogram] = None) -> np.ndarray:
+        func, _, _ = AudioProcessor.AUGMENTATIONS[name]
+        return func(y, sr, spectrogram or Spectrogram(y), **params)
+
+    @staticmethod
+    def describe_augmentation(name: str, params: Dict[str, Any]) -> str:
+        return AudioProcessor.AUGMENTATIONS[name][2].format(**params)
+
+    @staticmethod
+    def _add_noise(y: np.ndarray, snr_db: float, seed: int) -> np.ndarray:
+        signal_power = float(np.mean(y ** 2)) if len(y) else 0.0
+        noise_power = signal_power / (10 ** (snr_db / 10))
+        noise = np.random.default_rng(seed).standard_normal(len(y)).astype(y.dtype)
+        return y + noise * np.sqrt(noise_power).astype(y.dtype)
+
+    @staticmethod
+    def augment(y: np.ndarray, sr: int,
+                variants: Optional[Union[List[Any], Dict[str, Dict[str, Any]]]] = None,
+                seed: Optional[int] = None) -> Dict[str, Any]:
+        try:
+            augmented_audio = {}
+            steps = []
+            # Time stretching and pitch shifting share one STFT of the input
+            spectrogram = Spectrogram(y)
+
+            for variant_id, name, params in AudioProcessor.resolve_augmentations(variants, seed):
+                augmented_audio[variant_id] = AudioProcessor.apply_augmentation(y, sr, name, params, spectrogram)
+                steps.append(AudioProcessor.describe_augmentation(name, params))
 
             return {
                 "augmented_audio": augmented_audio,
@@ -147,4 +778,4 @@ class AudioProcessor:
             }
         except Exception as e:
             logger.error(f"Error augmenting audio: {str(e)}")
-            raise
\ No newline at end of file
+            raise
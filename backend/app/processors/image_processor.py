@@ -2,7 +2,7 @@ from PIL import Image, ImageEnhance, ImageFilter
 
 import numpy as np
 
-from typing import Dict, Any, Tuple, Optional
+from typing import Dict, Any, Callable, Iterator, List, Tuple, Optional, Union
 
 import io
 
@@ -10,6 +10,146 @@ import io
 
 class ImageProcessor:
 
+    # Bump when processing output changes so cached results are invalidated
+
+    VERSION = "5"
+
+
+
+    # PIL's fixed-point ITU-R 601-2 luma weights (scaled by 65536)
+
+    _LUMA_WEIGHTS = np.array([19595.0, 38470.0, 7471.0], dtype=np.float32)
+
+    # Pixels per strip of the fused per-pixel steps; keeps their float32 working set in cache
+
+    PIXEL_BLOCK = 1 << 16
+
+
+
+    # output_format -> (PIL format, media type, file extension); None means a raw .npy array
+
+    OUTPUT_FORMATS = {
+
+        "png": ("PNG", "image/png", "png"),
+
+        "jpeg": ("JPEG", "image/jpeg", "jpg"),
+
+        "webp": ("WEBP", "image/webp", "webp"),
+
+        "npy": (None, "application/x-npy", "npy")
+
+    }
+
+
+
+    @staticmethod
+
+    def encoding_options(output_format: Optional[str] = "png",
+
+                         quality: Optional[int] = None,
+
+                         compression: Optional[int] = None) -> Dict[str, Any]:
+
+        """
+
+        Validate output encoding options
+
+        Args:
+
+            output_format: png, jpeg, webp or npy
+
+            quality: 1-100 for jpeg and webp (100 makes webp lossless)
+
+            compression: 0-9 effort level for png (zlib level) and webp (encoder method)
+
+        """
+
+        output_format = (output_format or "png").lower()
+
+        if output_format == "jpg":
+
+            output_format = "jpeg"
+
+        if output_format not in ImageProcessor.OUTPUT_FORMATS:
+
+            raise ValueError(f"Unsupported output format: {output_format}")
+
+        if quality is not None and not 1 <= quality <= 100:
+
+            raise ValueError("quality must be between 1 and 100")
+
+        if compression is not None and not 0 <= compression <= 9:
+
+            raise ValueError("compression must be between 0 and 9")
+
+        return {"output_format": output_format, "quality": quality, "compression": compression}
+
+
+
+    @staticmethod
+
+    def media_type(output_format: str) -> str:
+
+        return ImageProcessor.OUTPUT_FORMATS[output_format][1]
+
+
+
+    @staticmethod
+
+    def file_extension(output_format: str) -> str:
+
+        return ImageProcessor.OUTPUT_FORMATS[output_format][2]
+
+
+
+    @staticmethod
+
+    def encode(image: Image.Image, output_format: str = "png",
+
+               quality: Optional[int] = None, compression: Optional[int] = None) -> bytes:
+
+        """Encode an image with options from encoding_options"""
+
+        pil_format = ImageProcessor.OUTPUT_FORMATS[output_format][0]
+
+        buffer = io.BytesIO()
+
+        if pil_format is None:
+
+            np.save(buffer, np.asarray(image), allow_pickle=False)
+
+        elif pil_format == "PNG":
+
+            image.save(buffer, format="PNG", compress_level=6 if compression is None else compression)
+
+        elif pil_format == "JPEG":
+
+            if image.mode not in ("RGB", "L"):
+
+                image = image.convert("RGB")
+
+            image.save(buffer, format="JPEG", quality=min(quality or 85, 95))
+
+        else:
+
+            image.save(
+
+                buffer,
+
+                format="WEBP",
+
+                quality=quality or 80,
+
+                lossless=quality == 100,
+
+                method=4 if compression is None else round(compression * 6 / 9)
+
+            )
+
+        return buffer.getvalue()
+
+
+
     @staticmethod
 
     def validate_image(image: Image.Image) -> Dict[str, Any]:
@@ -52,15 +192,43 @@ class ImageProcessor:
 
             normalize: Normalize pixel values if True
 
+
+
+        When resize shrinks the image it is applied first, so the filters run on
+
+        fewer pixels; an image that has not been loaded yet is decoded at reduced
+
+        scale where the format supports it.
+
         """
 
         try:
 
+            steps = []
+
+
+
+            downscale = ImageProcessor._is_downscale(image.size, resize)
+
+            if downscale and ImageProcessor.draft(image, resize):
+
+                steps.append(f"Decoded at reduced size {image.size[0]}×{image.size[1]}")
+
+
+
             # Make a copy of the image
 
             processed_image = image.copy()
 
-            steps = []
+
+
+            if downscale:
+
+                original_size = processed_image.size
+
+                processed_image = ImageProcessor._shrink(processed_image, resize)
+
+                steps.append(f"Resized from {original_size[0]}×{original_size[1]} to {resize[0]}×{resize[1]}")
 
 
 
@@ -92,164 +260,782 @@ class ImageProcessor:
 
 
 
-            # Enhance contrast
+            # Contrast, grayscale and normalize are per-pixel, so they run in float32
 
-            enhancer = ImageEnhance.Contrast(processed_image)
+            # on cache-sized strips instead of allocating a new PIL image per step
 
-            processed_image = enhancer.enhance(1.2)
+            pixels = ImageProcessor._fused_contrast(np.asarray(processed_image), 1.2, grayscale)
 
             steps.append("Enhanced contrast")
 
+            if grayscale:
 
+                steps.append("Converted to grayscale")
 
-            # Convert to grayscale if specified
+            extrema = None
 
-            if grayscale:
+            if normalize:
 
-                processed_image = processed_image.convert('L')
+                extrema = Image.fromarray(pixels).getextrema()
 
-                processed_image = processed_image.convert('RGB')  # Convert back to RGB for consistency
+                steps.append("Normalized pixel values")
 
-                steps.append("Converted to grayscale")
 
 
+            # Upscaling is done last to preserve quality
 
-            # Normalize pixel values if specified
+            if resize and all(resize) and not downscale:
 
-            if normalize:
+                original_size = processed_image.size
 
-                img_array = np.array(processed_image)
+                if extrema is not None:
 
-                # Normalize each channel separately
+                    pixels = ImageProcessor._map_strips(
 
-                for channel in range(3):
+                        pixels, lambda strip: ImageProcessor._normalize_levels(strip, extrema)
 
-                    channel_data = img_array[:,:,channel]
+                    )
 
-                    min_val = np.min(channel_data)
+                    extrema = None
 
-                    max_val = np.max(channel_data)
+                processed_image = Image.fromarray(pixels).resize(resize, Image.Resampling.LANCZOS)
 
-                    if max_val > min_val:
+                pixels = np.asarray(processed_image)
 
-                        img_array[:,:,channel] = ((channel_data - min_val) * 255 / (max_val - min_val)).astype(np.uint8)
+                steps.append(f"Resized from {original_size[0]}×{original_size[1]} to {resize[0]}×{resize[1]}")
 
-                processed_image = Image.fromarray(img_array)
 
-                steps.append("Normalized pixel values")
 
+            # Normalize (unless done before resizing), color balance and brightness in one pass
 
+            processed_image = Image.fromarray(ImageProcessor._fused_color_brightness(pixels, 1.2, 1.1, extrema))
 
-            # Resize if specified (do this last to preserve quality)
+            steps.append("Adjusted color balance")
 
-            if resize and all(resize):
+            steps.append("Optimized brightness")
 
-                original_size = processed_image.size
 
-                processed_image = processed_image.resize(resize, Image.Resampling.LANCZOS)
 
-                steps.append(f"Resized from {original_size[0]}×{original_size[1]} to {resize[0]}×{resize[1]}")
+            return {
 
+                "processed_image": processed_image,
 
+                "steps": steps
 
-            # Auto-adjust color balance
+            }
 
-            processed_image = ImageEnhance.Color(processed_image).enhance(1.2)
 
-            steps.append("Adjusted color balance")
 
+        except Exception as e:
 
+            raise ValueError(f"Error preprocessing image: {str(e)}")
 
-            # Auto-adjust brightness
 
-            processed_image = ImageEnhance.Brightness(processed_image).enhance(1.1)
 
-            steps.append("Optimized brightness")
+    @staticmethod
 
+    def draft(image: Image.Image, size: Tuple[int, int]) -> bool:
 
+        """
 
-            return {
+        Ask the decoder for a reduced-size decode no smaller than size.
 
-                "processed_image": processed_image,
+        Only JPEG supports this (1/2, 1/4 or 1/8 scale from the DCT); it must be
 
-                "steps": steps
+        called before the image is loaded. Returns True if the size changed.
 
-            }
+        """
 
+        if image.format != 'JPEG' or getattr(image, 'im', None) is not None:
 
+            return False
 
-        except Exception as e:
+        original_size = image.size
 
-            raise ValueError(f"Error preprocessing image: {str(e)}")
+        image.draft('RGB', size)
+
+        return image.size != original_size
+
+
+
+    @staticmethod
+
+    def _is_downscale(size: Tuple[int, int], resize: Optional[Tuple[int, int]]) -> bool:
+
+        return bool(resize and all(resize) and resize[0] <= size[0] and resize[1] <= size[1]
+
+                    and tuple(resize) != tuple(size))
+
+
+
+    @staticmethod
+
+    def _shrink(image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+
+        # reducing_gap lets PIL box-reduce by an integer factor before the LANCZOS pass
+
+        return image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
 
 
 
     @staticmethod
 
-    def augment(image: Image.Image) -> Dict[str, Any]:
+    def preprocess_batch(images: List[Image.Image],
+
+                         resize: Optional[Tuple[int, int]] = None,
+
+                         grayscale: bool = False,
+
+                         normalize: bool = False) -> Dict[str, Any]:
 
         """
 
-        Apply various augmentations to the image
+        Preprocess many images with the same pipeline as preprocess
+
+        Args:
+
+            images: Input PIL Images
+
+            resize: Optional tuple of (width, height) applied to every image
+
+            grayscale: Convert to grayscale if True
+
+            normalize: Normalize pixel values if True
+
+        Neighbourhood filters run per image; per-pixel steps run as single
+
+        vectorized passes over stacks of same-sized images.
 
         """
 
         try:
 
-            # Make sure we're working with RGB image
+            steps = ["Applied noise reduction", "Enhanced sharpness", "Enhanced contrast"]
 
-            if image.mode != 'RGB':
 
-                image = image.convert('RGB')
 
-            
+            # Median filter and sharpening depend on neighbouring pixels, keep them in PIL
 
-            augmented_images = {
+            filtered = []
 
-                "rotated": image.rotate(90, expand=True),
+            shrunk = 0
 
-                "flipped": image.transpose(Image.FLIP_LEFT_RIGHT),
+            for image in images:
 
-                "brightened": ImageProcessor._adjust_brightness(image, 1.3),
+                downscale = ImageProcessor._is_downscale(image.size, resize)
 
-                "darkened": ImageProcessor._adjust_brightness(image, 0.7),
+                if downscale:
 
-                "high_contrast": ImageEnhance.Contrast(image).enhance(1.5),
+                    ImageProcessor.draft(image, resize)
 
-                "saturated": ImageEnhance.Color(image).enhance(1.5),
+                if image.mode != 'RGB':
 
-                "blurred": image.filter(ImageFilter.GaussianBlur(radius=2)),
+                    image = image.convert('RGB')
 
-                "sharpened": image.filter(ImageFilter.SHARPEN)
+                if downscale:
 
-            }
+                    image = ImageProcessor._shrink(image, resize)
 
-            
+                    shrunk += 1
 
-            return {
+                image = image.filter(ImageFilter.MedianFilter(size=3))
+
+                filtered.append(ImageEnhance.Sharpness(image).enhance(1.5))
+
+
+
+            def contrast_stage(batch: np.ndarray) -> np.ndarray:
+
+                batch = ImageProcessor._enhance_contrast(batch, 1.2)
+
+                if grayscale:
+
+                    batch = np.repeat(ImageProcessor._luminance(batch)[..., None], 3, axis=-1)
+
+                if normalize:
+
+                    batch = ImageProcessor._normalize_channels(batch)
+
+                return batch
+
+
+
+            def color_stage(batch: np.ndarray) -> np.ndarray:
+
+                batch = ImageProcessor._enhance_color(batch, 1.2)
+
+                return ImageProcessor._blend(0.0, batch, 1.1)
+
+
+
+            if grayscale:
+
+                steps.append("Converted to grayscale")
+
+            if normalize:
+
+                steps.append("Normalized pixel values")
 
-                "augmented_images": augmented_images,
 
-                "steps": [
 
-                    "90-degree rotation",
+            if shrunk:
 
-                    "Horizontal flip",
+                steps.insert(0, f"Resized to {resize[0]}×{resize[1]}")
 
-                    "Brightness increase (1.3x)",
 
-                    "Brightness decrease (0.7x)",
 
-                    "High contrast (1.5x)",
+            processed = ImageProcessor._map_stacked(filtered, contrast_stage)
 
-                    "Increased saturation (1.5x)",
+            if resize and all(resize) and shrunk < len(images):
 
-                    "Gaussian blur",
+                processed = [
 
-                    "Sharpening filter"
+                    image if image.size == tuple(resize) else image.resize(resize, Image.Resampling.LANCZOS)
+
+                    for image in processed
 
                 ]
 
+                steps.append(f"Resized to {resize[0]}×{resize[1]}")
+
+            processed = ImageProcessor._map_stacked(processed, color_stage)
+
+            steps += ["Adjusted color balance", "Optimized brightness"]
+
+
+
+            return {
+
+                "processed_images": processed,
+
+                "steps": steps
+
+            }
+
+
+
+        except Exception as e:
+
+            raise ValueError(f"Error preprocessing image batch: {str(e)}")
+
+
+
+    @staticmethod
+
+    def _fused_contrast(pixels: np.ndarray, factor: float, grayscale: bool) -> np.ndarray:
+
+        """Contrast enhancement plus optional grayscale of an HxWx3 uint8 array; returns a new uint8 array"""
+
+        total = 0.0
+
+        for _, strip in ImageProcessor._iter_strips(pixels):
+
+            total += ImageProcessor._planar_luminance(strip).sum(dtype=np.float64)
+
+        mean = np.float32(np.floor(total / (pixels.shape[0] * pixels.shape[1]) + 0.5))
+
+
+
+        def enhance(strip: np.ndarray) -> None:
+
+            ImageProcessor._blend_inplace(mean, strip, factor)
+
+            if grayscale:
+
+                strip[...] = ImageProcessor._planar_luminance(strip)
+
+        return ImageProcessor._map_strips(pixels, enhance)
+
+
+
+    @staticmethod
+
+    def _fused_color_brightness(pixels: np.ndarray, color: float, brightness: float,
+
+                                extrema: Optional[Tuple[Tuple[int, int], ...]] = None) -> np.ndarray:
+
+        """
+
+        Optional min-max normalization to the per-channel extrema, then color
+
+        and brightness enhancement of an HxWx3 uint8 array; returns a new uint8 array
+
+        """
+
+        def enhance(strip: np.ndarray) -> None:
+
+            if extrema is not None:
+
+                ImageProcessor._normalize_levels(strip, extrema)
+
+            ImageProcessor._blend_inplace(ImageProcessor._planar_luminance(strip), strip, color)
+
+            # The brightness degenerate is black, so its blend is a scale; the result
+
+            # is non-negative and the uint8 store truncates like np.floor
+
+            strip *= np.float32(brightness)
+
+            np.minimum(strip, 255, out=strip)
+
+        return ImageProcessor._map_strips(pixels, enhance)
+
+
+
+    @staticmethod
+
+    def _normalize_levels(strip: np.ndarray, extrema: Tuple[Tuple[int, int], ...]) -> None:
+
+        """Stretch each channel of a 3xRxW strip from its (min, max) to 0-255, truncating to whole levels"""
+
+        min_val, max_val = np.array(extrema, dtype=np.float32).T
+
+        value_range = max_val - min_val
+
+        # Flat channels are left untouched
+
+        flat = value_range == 0
+
+        strip -= np.where(flat, 0, min_val)[:, None, None]
+
+        # Multiplying by 255 first keeps exact quotients exact, so flooring
+
+        # gives the same levels as the integer formula
+
+        strip *= np.where(flat, 1, 255).astype(np.float32)[:, None, None]
+
+        strip /= np.where(flat, 1, value_range)[:, None, None]
+
+        np.floor(strip, out=strip)
+
+
+
+    @staticmethod
+
+    def _blend_inplace(degenerate, pixels: np.ndarray, factor: float) -> np.ndarray:
+
+        """_blend without temporaries; the same float32 steps, so it matches PIL exactly"""
+
+        pixels -= degenerate
+
+        pixels *= np.float32(factor)
+
+        pixels += degenerate
+
+        # np.maximum/np.minimum are cheaper than np.clip
+
+        np.maximum(pixels, 0, out=pixels)
+
+        np.minimum(pixels, 255, out=pixels)
+
+        return np.floor(pixels, out=pixels)
+
+
+
+    @staticmethod
+
+    def _iter_strips(pixels: np.ndarray) -> Iterator[Tuple[slice, np.ndarray]]:
+
+        """
+
+        (rows, strip) pairs covering an HxWx3 uint8 array, where strip is a
+
+        3xRxW float32 copy of those rows with contiguous channels, so luma
+
+        broadcasts cheaply. The strip buffer is reused between steps.
+
+        """
+
+        height, width = pixels.shape[:2]
+
+        step = max(1, ImageProcessor.PIXEL_BLOCK // width)
+
+        buffer = np.empty((3, step, width), dtype=np.float32)
+
+        for top in range(0, height, step):
+
+            rows = slice(top, min(top + step, height))
+
+            strip = buffer[:, :rows.stop - top]
+
+            for channel in range(3):
+
+                strip[channel] = pixels[rows, :, channel]
+
+            yield rows, strip
+
+
+
+    @staticmethod
+
+    def _map_strips(pixels: np.ndarray, func: Callable[[np.ndarray], None]) -> np.ndarray:
+
+        """Apply func in place to each strip of an HxWx3 uint8 array; returns the results as a new uint8 array"""
+
+        result = np.empty_like(pixels)
+
+        for rows, strip in ImageProcessor._iter_strips(pixels):
+
+            func(strip)
+
+            for channel in range(3):
+
+                result[rows, :, channel] = strip[channel]
+
+        return result
+
+
+
+    @staticmethod
+
+    def _planar_luminance(pixels: np.ndarray) -> np.ndarray:
+
+        """_luminance of a 3xRxW strip, shape RxW"""
+
+        luma = ImageProcessor._LUMA_WEIGHTS @ pixels.reshape(3, -1)
+
+        luma += np.float32(32768.0)
+
+        luma *= np.float32(1 / 65536)
+
+        return np.floor(luma, out=luma).reshape(pixels.shape[1:])
+
+
+
+    @staticmethod
+
+    def _map_stacked(images: List[Image.Image], func) -> List[Image.Image]:
+
+        """Apply func to float32 stacks of same-sized RGB images, preserving input order"""
+
+        groups: Dict[Tuple[int, int], List[int]] = {}
+
+        for index, image in enumerate(images):
+
+            groups.setdefault(image.size, []).append(index)
+
+
+
+        results: List[Optional[Image.Image]] = [None] * len(images)
+
+        for indices in groups.values():
+
+            batch = np.stack([np.asarray(images[i], dtype=np.float32) for i in indices])
+
+            batch = func(batch).astype(np.uint8)
+
+            for i, array in zip(indices, batch):
+
+                results[i] = Image.fromarray(array)
+
+        return results
+
+
+
+    @staticmethod
+
+    def _blend(degenerate, batch: np.ndarray, factor: float) -> np.ndarray:
+
+        """Vectorized equivalent of PIL's Image.blend(degenerate, image, factor)"""
+
+        # PIL does the arithmetic in single precision; float32 matches it exactly
+
+        alpha = np.float32(factor)
+
+        return np.floor(np.clip(degenerate + alpha * (batch - degenerate), 0, 255))
+
+
+
+    @staticmethod
+
+    def _luminance(batch: np.ndarray) -> np.ndarray:
+
+        """ITU-R 601-2 luma with PIL's fixed-point rounding, shape (..., H, W)"""
+
+        # Weighted sums stay below 2**24, so float32 holds them exactly
+
+        luma = batch @ ImageProcessor._LUMA_WEIGHTS
+
+        luma += np.float32(32768.0)
+
+        luma *= np.float32(1 / 65536)
+
+        return np.floor(luma, out=luma)
+
+
+
+    @staticmethod
+
+    def _enhance_contrast(batch: np.ndarray, factor: float) -> np.ndarray:
+
+        # Degenerate image is the rounded mean luminance of each image
+
+        mean = np.floor(ImageProcessor._luminance(batch).mean(axis=(-2, -1)) + 0.5)
+
+        return ImageProcessor._blend(mean[..., None, None, None], batch, factor)
+
+
+
+    @staticmethod
+
+    def _enhance_color(batch: np.ndarray, factor: float) -> np.ndarray:
+
+        # Degenerate image is the grayscale version of each pixel
+
+        return ImageProcessor._blend(ImageProcessor._luminance(batch)[..., None], batch, factor)
+
+
+
+    @staticmethod
+
+    def _normalize_channels(batch: np.ndarray) -> np.ndarray:
+
+        """Min-max stretch each channel of each image to the full 0-255 range"""
+
+        min_val = batch.min(axis=(-3, -2), keepdims=True)
+
+        max_val = batch.max(axis=(-3, -2), keepdims=True)
+
+        value_range = max_val - min_val
+
+        stretched = (batch - min_val) * 255 / np.where(value_range > 0, value_range, 1)
+
+        return np.floor(np.where(value_range > 0, stretched, batch))
+
+
+
+    # name -> (function, default parameters, step description)
+
+    AUGMENTATIONS: Dict[str, Tuple[Callable[..., Image.Image], Dict[str, Any], str]] = {
+
+        "rotated": (
+
+            lambda image, angle: image.rotate(angle, expand=True),
+
+            {"angle": 90.0},
+
+            "{angle:g}-degree rotation"
+
+        ),
+
+        "flipped": (
+
+            lambda image: image.transpose(Image.FLIP_LEFT_RIGHT),
+
+            {},
+
+            "Horizontal flip"
+
+        ),
+
+        "brightened": (
+
+            lambda image, factor: ImageProcessor._adjust_brightness(image, factor),
+
+            {"factor": 1.3},
+
+            "Brightness increase ({factor:g}x)"
+
+        ),
+
+        "darkened": (
+
+            lambda image, factor: ImageProcessor._adjust_brightness(image, factor),
+
+            {"factor": 0.7},
+
+            "Brightness decrease ({factor:g}x)"
+
+        ),
+
+        "high_contrast": (
+
+            lambda image, factor: ImageEnhance.Contrast(image).enhance(factor),
+
+            {"factor": 1.5},
+
+            "High contrast ({factor:g}x)"
+
+        ),
+
+        "saturated": (
+
+            lambda image, factor: ImageEnhance.Color(image).enhance(factor),
+
+            {"factor": 1.5},
+
+            "Increased saturation ({factor:g}x)"
+
+        ),
+
+        "blurred": (
+
+            lambda image, radius: image.filter(ImageFilter.GaussianBlur(radius=radius)),
+
+            {"radius": 2.0},
+
+            "Gaussian blur (radius {radius:g})"
+
+        ),
+
+        "sharpened": (
+
+            lambda image: image.filter(ImageFilter.SHARPEN),
+
+            {},
+
+            "Sharpening filter"
+
+        )
+
+    }
+
+
+
+    @staticmethod
+
+    def resolve_augmentations(variants: Optional[Union[List[str], Dict[str, Dict[str, Any]]]] = None) -> List[Tuple[str, Dict[str, Any]]]:
+
+        """
+
+        Validate a variant selection against the registry
+
+        Args:
+
+            variants: None for every variant, a list of names, or a mapping of
+
+                name to parameter overrides
+
+        Returns:
+
+            List of (name, parameters) with defaults filled in
+
+        """
+
+        if variants is None:
+
+            variants = list(ImageProcessor.AUGMENTATIONS)
+
+        if isinstance(variants, list):
+
+            variants = {name: {} for name in variants}
+
+
+
+        resolved = []
+
+        for name, overrides in variants.items():
+
+            if name not in ImageProcessor.AUGMENTATIONS:
+
+                raise ValueError(f"Unknown augmentation: {name}")
+
+            _, defaults, _ = ImageProcessor.AUGMENTATIONS[name]
+
+            unknown = set(overrides or {}) - set(defaults)
+
+            if unknown:
+
+                raise ValueError(f"Unknown parameters for {name}: {', '.join(sorted(unknown))}")
+
+            params = dict(defaults)
+
+            for key, value in (overrides or {}).items():
+
+                try:
+
+                    params[key] = float(value)
+
+                except (TypeError, ValueError):
+
+                    raise ValueError(f"Parameter {key} for {name} must be a number")
+
+            resolved.append((name, params))
+
+        return resolved
+
+
+
+    @staticmethod
+
+    def iter_augmentations(image: Image.Image,
+
+                           variants: Optional[Union[List[str], Dict[str, Dict[str, Any]]]] = None) -> Iterator[Tuple[str, Image.Image, str]]:
+
+        """Lazily yield (name, augmented image, step description) for the selected variants"""
+
+        if image.mode != 'RGB':
+
+            image = image.convert('RGB')
+
+        for name, params in ImageProcessor.resolve_augmentations(variants):
+
+            yield name, ImageProcessor.apply_augmentation(image, name, params), ImageProcessor.describe_augmentation(name, params)
+
+
+
+    @staticmethod
+
+    def apply_augmentation(image: Image.Image, name: str, params: Dict[str, Any]) -> Image.Image:
+
+        func, _, _ = ImageProcessor.AUGMENTATIONS[name]
+
+        if image.mode != 'RGB':
+
+            image = image.convert('RGB')
+
+        return func(image, **params)
+
+
+
+    @staticmethod
+
+    def describe_augmentation(name: str, params: Dict[str, Any]) -> str:
+
+        return ImageProcessor.AUGMENTATIONS[name][2].format(**params)
+
+
+
+    @staticmethod
+
+    def augment(image: Image.Image,
+
+                variants: Optional[Union[List[str], Dict[str, Dict[str, Any]]]] = None) -> Dict[str, Any]:
+
+        """
+
+        Apply various augmentations to the image
+
+        Args:
+
+            image: Input PIL Image
+
+            variants: Optional subset of AUGMENTATIONS, as a list of names or a
+
+                mapping of name to parameter overrides; all variants by default
+
+        """
+
+        try:
+
+            augmented_images = {}
+
+            steps = []
+
+            for name, augmented, step in ImageProcessor.iter_augmentations(image, variants):
+
+                augmented_images[name] = augmented
+
+                steps.append(step)
+
+
+
+            return {
+
+                "augmented_images": augmented_images,
+
+                "steps": steps
+
             }
 
         except Exception as e:
@@ -0,0 +1,435 @@
+from collections import OrderedDict
+from scipy.spatial import cKDTree
+from typing import Any, Callable, Dict, Optional, Tuple
+import json
+import threading
+import time
+import numpy as np
+from app.core.logger import logger
+
+# Faces per BVH leaf; leaves hold consecutive faces in Morton order
+LEAF_SIZE = 4
+# Queries walked through the BVH together; bounds the (query, node) frontier
+QUERY_BLOCK = 1024
+DEGENERATE_AREA = 1e-8
+_EPSILON = 1e-12
+# Parity rays for inside tests; skewed so they rarely run along edges
+_PARITY_DIRECTION = np.array([0.5773, 0.5774, 0.5775]) / np.linalg.norm([0.5773, 0.5774, 0.5775])
+
+def _dot(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.einsum('ij,ij->i', a, b)
+
+def _morton_codes(points: np.ndarray, lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+    """30-bit Morton codes of points on a 1024^3 grid over [lower, upper]"""
+    span = np.maximum(upper - lower, _EPSILON)
+    grid = np.clip((points - lower) / span * 1023, 0, 1023).astype(np.uint64)
+    codes = np.zeros(len(points), dtype=np.uint64)
+    for bit in range(10):
+        for axis in range(3):
+            codes |= ((grid[:, axis] >> np.uint64(bit)) & np.uint64(1)) << np.uint64(3 * bit + axis)
+    return codes
+
+def _first_per_query(queries: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Index of the smallest value for each distinct query"""
+    order = np.lexsort((values, queries))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = queries[order][1:] != queries[order][:-1]
+    return order[first]
+
+def closest_on_triangles(points: np.ndarray, a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """Closest point on each triangle (a, b, c) to the matching point, by Voronoi region"""
+    ab, ac = b - a, c - a
+    ap, bp, cp = points - a, points - b, points - c
+    d1, d2 = _dot(ab, ap), _dot(ac, ap)
+    d3, d4 = _dot(ab, bp), _dot(ac, bp)
+    d5, d6 = _dot(ab, cp), _dot(ac, cp)
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denominator = va + vb + vc
+        result = a + ab * (vb / denominator)[:, None] + ac * (vc / denominator)[:, None]
+        # Regions from the interior outwards, so the vertex regions win ties
+        regions = [
+            ((va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0),
+             lambda: b + (c - b) * ((d4 - d3) / ((d4 - d3) + (d5 - d6)))[:, None]),
+            ((vb <= 0) & (d2 >= 0) & (d6 <= 0), lambda: a + ac * (d2 / (d2 - d6))[:, None]),
+            ((d6 >= 0) & (d5 <= d6), lambda: c),
+            ((vc <= 0) & (d1 >= 0) & (d3 <= 0), lambda: a + ab * (d1 / (d1 - d3))[:, None]),
+            ((d4 <= d3) & (d3 >= 0), lambda: b),
+            ((d1 <= 0) & (d2 <= 0), lambda: a),
+        ]
+        for mask, project in regions:
+            if mask.any():
+                result = np.where(mask[:, None], project(), result)
+    # Degenerate triangles can leave NaNs; any vertex is a valid fallback there
+    return np.where(np.isfinite(result), result, a)
+
+def parse_points(value: str, name: str, limit: int) -> np.ndarray:
+    """Parse a JSON [x, y, z] point or list of points; raises ValueError when malformed"""
+    try:
+        points = np.asarray(json.loads(value), dtype=np.float64)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid {name}: {str(e)}")
+    if points.shape == (3,):
+        points = points[None]
+    if points.ndim != 2 or points.shape[1] != 3 or not len(points):
+        raise ValueError(f"{name} must be a list of [x, y, z] points")
+    if len(points) > limit:
+        raise ValueError(f"Too many {name}: {len(points)} > {limit}")
+    if not np.isfinite(points).all():
+        raise ValueError(f"{name} must be finite")
+    return points
+
+def mesh_metrics(vertices: np.ndarray, faces: np.ndarray) -> Dict[str, Any]:
+    """
+    Validation metrics from one pass over the triangles: areas, volume and
+    centre of mass from signed tetrahedra, watertightness and winding from
+    edge counts, plus degenerate, duplicate and unreferenced element counts.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+    referenced = np.unique(faces)
+    metrics = {
+        "vertex_count": len(vertices),
+        "face_count": len(faces),
+        "is_empty": len(faces) == 0,
+        "unreferenced_vertices": len(vertices) - len(referenced)
+    }
+    if len(faces) == 0:
+        return {**metrics, "bounds": None, "area": 0.0, "volume": 0.0, "center_mass": None,
+                "is_watertight": False, "is_winding_consistent": False, "degenerate_faces": 0,
+                "duplicate_faces": 0, "euler_number": len(referenced)}
+
+    v0, v1, v2 = vertices[faces[:, 0]], vertices[faces[:, 1]], vertices[faces[:, 2]]
+    cross = np.cross(v1 - v0, v2 - v0)
+    areas = np.linalg.norm(cross, axis=1) / 2
+    # Signed volume of the tetrahedron (origin, v0, v1, v2)
+    tetra = _dot(v0, cross) / 6
+    volume = float(tetra.sum())
+    if abs(volume) > _EPSILON:
+        center = (tetra[:, None] * (v0 + v1 + v2)).sum(axis=0) / (4 * volume)
+    elif areas.sum() > 0:
+        center = (areas[:, None] * (v0 + v1 + v2)).sum(axis=0) / (3 * areas.sum())
+    else:
+        center = vertices[referenced].mean(axis=0)
+
+    # Edges as scalar keys; each undirected edge of a closed manifold is used by exactly two faces
+    count = np.int64(len(vertices))
+    directed = faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    undirected = np.sort(directed, axis=1)
+    _, edge_uses = np.unique(undirected[:, 0] * count + undirected[:, 1], return_counts=True)
+    watertight = bool((edge_uses == 2).all())
+    # Consistent winding traverses each shared edge once in each direction
+    consistent = watertight and len(np.unique(directed[:, 0] * count + directed[:, 1])) == len(directed)
+    sorted_faces = np.sort(faces, axis=1)
+    if len(vertices) < 2 ** 21:
+        face_keys = (sorted_faces[:, 0] * count + sorted_faces[:, 1]) * count + sorted_faces[:, 2]
+        duplicates = len(faces) - len(np.unique(face_keys))
+    else:
+        duplicates = len(faces) - len(np.unique(sorted_faces, axis=0))
+
+    bounds = np.stack([vertices[referenced].min(axis=0), vertices[referenced].max(axis=0)])
+    return {
+        **metrics,
+        "bounds": bounds.tolist(),
+        "area": float(areas.sum()),
+        "volume": volume,
+        "center_mass": center.tolist(),
+        "is_watertight": watertight,
+        "is_winding_consistent": bool(consistent),
+        "degenerate_faces": int((areas < DEGENERATE_AREA).sum()),
+        "duplicate_faces": int(duplicates),
+        "euler_number": int(len(referenced) - len(edge_uses) + len(faces))
+    }
+
+class MeshIndex:
+    """
+    Spatial index of a triangle mesh for closest-point, ray and distance
+    queries. Faces are sorted along a Morton curve and grouped into leaves
+    of LEAF_SIZE; a complete binary tree of bounding boxes over the leaves
+    is stored in heap order (node n has children 2n+1 and 2n+2), so it is
+    built with array reductions and walked breadth first for a whole block
+    of queries at once. A KD-tree over the referenced vertices bounds the
+    closest-point search.
+    """
+
+    def __init__(self, vertices: np.ndarray, faces: np.ndarray):
+        start = time.perf_counter()
+        self.vertices = np.ascontiguousarray(vertices, dtype=np.float64)
+        faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+        if len(faces) == 0:
+            raise ValueError("Mesh has no faces to index")
+        self.face_count = len(faces)
+        self.metrics = mesh_metrics(self.vertices, faces)
+        self.vertex_tree = cKDTree(self.vertices[np.unique(faces)])
+
+        triangles = self.vertices[faces]
+        lower, upper = triangles.min(axis=(0, 1)), triangles.max(axis=(0, 1))
+        # BVH slot -> original face index
+        self.order = np.argsort(_morton_codes(triangles.mean(axis=1), lower, upper), kind='stable')
+        triangles = triangles[self.order]
+        self.v0 = triangles[:, 0]
+        self.e1 = triangles[:, 1] - triangles[:, 0]
+        self.e2 = triangles[:, 2] - triangles[:, 0]
+        normals = np.cross(self.e1, self.e2)
+        self.areas = np.linalg.norm(normals, axis=1) / 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.normals = np.nan_to_num(normals / (2 * self.areas[:, None]))
+        # Face bounding spheres prune leaf candidates more tightly than the leaf boxes
+        self.centers = triangles.mean(axis=1)
+        self.radii = np.linalg.norm(triangles - self.centers[:, None], axis=2).max(axis=1)
+
+        leaves = -(-self.face_count // LEAF_SIZE)
+        self.leaf_count = 1 << int(np.ceil(np.log2(leaves)))
+        padding = self.leaf_count * LEAF_SIZE - self.face_count
+        # Padding slots get inverted boxes, which never contain anything
+        level_min = np.concatenate([triangles.min(axis=1), np.full((padding, 3), np.inf)])
+        level_max = np.concatenate([triangles.max(axis=1), np.full((padding, 3), -np.inf)])
+        level_min = level_min.reshape(self.leaf_count, LEAF_SIZE, 3).min(axis=1)
+        level_max = level_max.reshape(self.leaf_count, LEAF_SIZE, 3).max(axis=1)
+        mins, maxs = [level_min], [level_max]
+        while len(mins[-1]) > 1:
+            mins.append(mins[-1].reshape(-1, 2, 3).min(axis=1))
+            maxs.append(maxs[-1].reshape(-1, 2, 3).max(axis=1))
+        self.box_min = np.concatenate(mins[::-1])
+        self.box_max = np.concatenate(maxs[::-1])
+        self.node_valid = (self.box_min <= self.box_max).all(axis=1)
+        self.build_seconds = time.perf_counter() - start
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.vertices, self.order, self.v0, self.e1, self.e2, self.normals, self.areas,
+                  self.centers, self.radii,
+                  self.box_min, self.box_max, self.vertex_tree.data, self.vertex_tree.indices]
+        return sum(array.nbytes for array in arrays)
+
+    def _traverse(self, count: int, descend: Callable[[np.ndarray, np.ndarray], np.ndarray]):
+        """
+        Walk the tree for count queries; descend(queries, nodes) selects the
+        (query, node) pairs worth visiting. Returns the (query, face slot)
+        pairs in the visited leaves.
+        """
+        queries = np.arange(count)
+        nodes = np.zeros(count, dtype=np.int64)
+        first_leaf = self.leaf_count - 1
+        while len(nodes):
+            keep = self.node_valid[nodes] & descend(queries, nodes)
+            queries, nodes = queries[keep], nodes[keep]
+            # The tree is complete, so every pair in the frontier is at the same depth
+            if not len(nodes) or nodes[0] >= first_leaf:
+                break
+            queries = np.repeat(queries, 2)
+            nodes = (2 * nodes[:, None] + np.array([1, 2])).reshape(-1)
+        slots = ((nodes - first_leaf) * LEAF_SIZE)[:, None] + np.arange(LEAF_SIZE)
+        queries = np.repeat(queries, LEAF_SIZE)
+        slots = slots.reshape(-1)
+        valid = slots < self.face_count
+        return queries[valid], slots[valid]
+
+    def _ray_hits(self, origins: np.ndarray, directions: np.ndarray):
+        """All (ray, face slot, distance) intersections in front of the origins (Moller-Trumbore)"""
+        parallel = directions == 0
+        inverse = 1.0 / np.where(parallel, 1.0, directions)
+        any_parallel = parallel.any()
+
+        def descend(queries, nodes):
+            lower, upper, start = self.box_min[nodes], self.box_max[nodes], origins[queries]
+            near = (lower - start) * inverse[queries]
+            far = (upper - start) * inverse[queries]
+            t_near, t_far = np.minimum(near, far), np.maximum(near, far)
+            if any_parallel:
+                # A ray parallel to a slab is inside it for every t or for none,
+                # including when the origin lies on the slab's boundary plane
+                inside = (lower <= start) & (start <= upper)
+                flat = parallel[queries]
+                t_near = np.where(flat, np.where(inside, -np.inf, np.inf), t_near)
+                t_far = np.where(flat, np.where(inside, np.inf, -np.inf), t_far)
+            t_near, t_far = t_near.max(axis=1), t_far.min(axis=1)
+            return (t_near <= t_far) & (t_far >= 0)
+
+        rays, slots = self._traverse(len(origins), descend)
+        d, e1, e2 = directions[rays], self.e1[slots], self.e2[slots]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p = np.cross(d, e2)
+            determinant = _dot(e1, p)
+            inverse_det = 1.0 / determinant
+            s = origins[rays] - self.v0[slots]
+            u = _dot(s, p) * inverse_det
+            q = np.cross(s, e1)
+            v = _dot(d, q) * inverse_det
+            t = _dot(e2, q) * inverse_det
+            hit = (np.abs(determinant) > _EPSILON) & (u >= 0) & (v >= 0) & (u + v <= 1) & (t > _EPSILON)
+        return rays[hit], slots[hit], t[hit]
+
+    def ray_cast(self, origins: np.ndarray, directions: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        First hit of each ray: hit mask, distance, location, face and face
+        normal (NaN/-1 on a miss). A single origin is shared by all directions.
+        """
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+        directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+        if len(origins) != len(directions):
+            if len(origins) != 1:
+                raise ValueError("origins must be one point or one per direction")
+            origins = np.repeat(origins, len(directions), axis=0)
+        lengths = np.linalg.norm(directions, axis=1)
+        if (lengths < _EPSILON).any():
+            raise ValueError("Ray directions must be non-zero")
+        directions = directions / lengths[:, None]
+
+        distances = np.full(len(origins), np.inf)
+        faces = np.full(len(origins), -1, dtype=np.int64)
+        for start in range(0, len(origins), QUERY_BLOCK):
+            block = slice(start, start + QUERY_BLOCK)
+            rays, slots, t = self._ray_hits(origins[block], directions[block])
+            if len(rays):
+                first = _first_per_query(rays, t)
+                distances[start + rays[first]] = t[first]
+                faces[start + rays[first]] = slots[first]
+        hit = faces >= 0
+        normals = np.full((len(origins), 3), np.nan)
+        normals[hit] = self.normals[faces[hit]]
+        faces[hit] = self.order[faces[hit]]
+        distances[~hit] = np.nan
+        return {
+            "hit": hit,
+            "distances": distances,
+            "locations": origins + directions * distances[:, None],
+            "faces": faces,
+            "normals": normals
+        }
+
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        """Inside test by crossing parity; only meaningful for watertight meshes"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        inside = np.zeros(len(points), dtype=bool)
+        for start in range(0, len(points), QUERY_BLOCK):
+            block = points[start:start + QUERY_BLOCK]
+            directions = np.broadcast_to(_PARITY_DIRECTION, block.shape)
+            rays, _, _ = self._ray_hits(block, directions)
+            inside[start:start + len(block)] = np.bincount(rays, minlength=len(block)) % 2 == 1
+        return inside
+
+    def closest_points(self, points: np.ndarray) -> Dict[str, np.ndarray]:
+        """Closest surface point, its distance and face for each query point"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        closest = np.empty_like(points)
+        distances = np.empty(len(points))
+        faces = np.empty(len(points), dtype=np.int64)
+        for start in range(0, len(points), QUERY_BLOCK):
+            block = points[start:start + QUERY_BLOCK]
+            # The nearest surface vertex bounds the distance to the surface
+            bound, _ = self.vertex_tree.query(block)
+            bound_squared = (bound * (1 + 1e-9) + _EPSILON) ** 2
+
+            def descend(queries, nodes):
+                p = block[queries]
+                gap = np.maximum(self.box_min[nodes] - p, 0) + np.maximum(p - self.box_max[nodes], 0)
+                return _dot(gap, gap) <= bound_squared[queries]
+
+            queries, slots = self._traverse(len(block), descend)
+            reach = np.sqrt(bound_squared[queries]) + self.radii[slots]
+            offsets = self.centers[slots] - block[queries]
+            near = _dot(offsets, offsets) <= reach ** 2
+            queries, slots = queries[near], slots[near]
+            a = self.v0[slots]
+            candidates = closest_on_triangles(block[queries], a, a + self.e1[slots], a + self.e2[slots])
+            offsets = candidates - block[queries]
+            squared = _dot(offsets, offsets)
+            best = _first_per_query(queries, squared)
+            rows = start + queries[best]
+            closest[rows] = candidates[best]
+            distances[rows] = np.sqrt(squared[best])
+            faces[rows] = self.order[slots[best]]
+        return {"points": closest, "distances": distances, "faces": faces}
+
+    def distance(self, points: np.ndarray, signed: bool = True) -> Dict[str, Any]:
+        """
+        Distance from each point to the surface; signed (positive inside, as
+        trimesh does) when requested and the mesh is watertight.
+        """
+        result = self.closest_points(points)
+        distances = result["distances"]
+        signed = signed and self.metrics["is_watertight"]
+        if signed:
+            distances = np.where(self.contains(points), distances, -distances)
+        return {"distances": distances, "signed": signed}
+
+    def grid(self, resolution: int, padding: float = 0.05) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Points of a resolution^3 grid over the padded bounds (x varying slowest) and its corners"""
+        lower, upper = np.asarray(self.metrics["bounds"])
+        margin = (upper - lower).max() * padding
+        lower, upper = lower - margin, upper + margin
+        axes = [np.linspace(lo, hi, resolution) for lo, hi in zip(lower, upper)]
+        return np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 3), lower, upper
+
+    def sample(self, count: int, seed: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Points distributed uniformly by area, with their faces and face normals"""
+        rng = np.random.default_rng(seed)
+        cumulative = np.cumsum(self.areas)
+        if cumulative[-1] <= 0:
+            raise ValueError("Mesh has no surface area to sample")
+        slots = np.searchsorted(cumulative, rng.random(count) * cumulative[-1], side='right')
+        slots = np.minimum(slots, self.face_count - 1)
+        u, v = rng.random((2, count))
+        # Fold samples from the far half of the parallelogram back into the triangle
+        outside = u + v > 1
+        u[outside], v[outside] = 1 - u[outside], 1 - v[outside]
+        points = self.v0[slots] + self.e1[slots] * u[:, None] + self.e2[slots] * v[:, None]
+        return {"points": points, "faces": self.order[slots], "normals": self.normals[slots]}
+
+class MeshIndexCache:
+    """LRU of MeshIndex objects bounded by their total array size; each key is built once even under concurrent requests"""
+
+    def __init__(self, memory_budget: int):
+        self.memory_budget = memory_budget
+        self._indexes: "OrderedDict[str, MeshIndex]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._building: Dict[str, threading.Lock] = {}
+        self._counters = {"hits": 0, "builds": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[MeshIndex]:
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                self._counters["hits"] += 1
+            return index
+
+    def get_or_build(self, key: str, build: Callable[[], MeshIndex]) -> MeshIndex:
+        index = self.get(key)
+        if index is not None:
+            return index
+        with self._lock:
+            building = self._building.setdefault(key, threading.Lock())
+        with building:
+            index = self.get(key)
+            if index is None:
+                index = build()
+                self._store(key, index)
+                logger.info(f"Built mesh index {key[:12]} ({index.face_count} faces) in {index.build_seconds:.2f}s")
+        with self._lock:
+            self._building.pop(key, None)
+        return index
+
+    def _store(self, key: str, index: MeshIndex) -> None:
+        size = index.nbytes
+        with self._lock:
+            self._counters["builds"] += 1
+            # Indexes larger than the whole budget are returned but not kept
+            if size > self.memory_budget:
+                return
+            self._indexes[key] = index
+            self._bytes += size
+            while self._bytes > self.memory_budget:
+                _, evicted = self._indexes.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self._counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._counters, "entries": len(self._indexes), "bytes": self._bytes,
+                    "memory_budget": self.memory_budget}
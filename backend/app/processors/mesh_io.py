@@ -0,0 +1,244 @@
+from typing import Any, BinaryIO, List, NamedTuple, Optional, Tuple, Union
+import io
+import numpy as np
+import trimesh
+from app.core.logger import logger
+
+STL_HEADER_SIZE = 84  # 80-byte header and a uint32 triangle count
+STL_RECORD = np.dtype([
+    ("normal", "<f4", (3,)),
+    ("vertices", "<f4", (3, 3)),
+    ("attributes", "<u2")
+])
+PLY_TYPES = {
+    "char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2", "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4", "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4", "double": "f8", "float64": "f8"
+}
+PLY_MAX_HEADER = 65536
+# Vertices quantized and hashed per step; bounds the float64 working copy
+WELD_BLOCK = 1 << 20
+# splitmix64 constants; its finalizer spreads every input bit over the whole hash
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX = (np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB))
+
+class MeshArrays(NamedTuple):
+    vertices: np.ndarray  # (n, 3) float64
+    faces: np.ndarray  # (m, 3) int64
+
+    def to_trimesh(self) -> trimesh.Trimesh:
+        # Already welded and finite, so trimesh's processing would be a no-op
+        return trimesh.Trimesh(vertices=self.vertices, faces=self.faces, process=False)
+
+class _TriangleCorners:
+    """(3 * count, 3) corner rows of a (count, 3, 3) strided view, copied only a block at a time"""
+
+    def __init__(self, triangles: np.ndarray):
+        self.triangles = triangles
+
+    def __len__(self) -> int:
+        return 3 * len(self.triangles)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, _ = index.indices(len(self))
+            # Read whole triangles and trim to the requested rows
+            first, last = start // 3, -(-stop // 3)
+            rows = np.asarray(self.triangles[first:last]).reshape(-1, 3)
+            return rows[start - 3 * first:stop - 3 * first]
+        index = np.asarray(index)
+        return self.triangles[index // 3, index % 3]
+
+def _byte_view(content: Union[bytes, BinaryIO]) -> Optional[np.ndarray]:
+    """uint8 view of the content: zero-copy for bytes, memory-mapped for real files"""
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        return np.frombuffer(content, dtype=np.uint8)
+    if isinstance(content, io.BytesIO):
+        return np.frombuffer(content.getvalue(), dtype=np.uint8)
+    try:
+        content.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+    content.seek(0, io.SEEK_END)
+    if content.tell() == 0:
+        return None
+    return np.memmap(content, dtype=np.uint8, mode='r')
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    x = (x ^ (x >> np.uint64(30))) * _MIX[0]
+    x = (x ^ (x >> np.uint64(27))) * _MIX[1]
+    return x ^ (x >> np.uint64(31))
+
+def _hash_rows(quantized: np.ndarray) -> np.ndarray:
+    hashed = np.zeros(len(quantized), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for column in quantized.T:
+            hashed = _mix(hashed + _GOLDEN + _mix(column.astype(np.uint64)))
+    return hashed
+
+def weld(corners: np.ndarray, digits: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merge corners equal after rounding to digits decimals, as trimesh's
+    merge_vertices does: first occurrences are kept, in order. Returns the
+    vertices and each corner's vertex index. Corners are read in blocks, so
+    corners may be a memory-mapped view; rows are matched by a 64-bit hash
+    and hash collisions are checked for before the result is trusted.
+    """
+    scale = 10.0 ** digits
+
+    def quantize(rows: np.ndarray) -> np.ndarray:
+        return np.round(np.asarray(rows, dtype=np.float64) * scale).astype(np.int64)
+
+    hashes = np.empty(len(corners), dtype=np.uint64)
+    for start in range(0, len(corners), WELD_BLOCK):
+        hashes[start:start + WELD_BLOCK] = _hash_rows(quantize(corners[start:start + WELD_BLOCK]))
+    _, first, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+    del hashes
+
+    collided = False
+    for start in range(0, len(corners), WELD_BLOCK):
+        block = quantize(corners[start:start + WELD_BLOCK])
+        representatives = quantize(corners[first[inverse[start:start + WELD_BLOCK]]])
+        if not np.array_equal(block, representatives):
+            collided = True
+            break
+    if collided:
+        logger.warning("Vertex hash collision while welding; falling back to exact row matching")
+        _, first, inverse = np.unique(quantize(corners[0:len(corners)]), axis=0, return_index=True, return_inverse=True)
+
+    # np.unique orders groups by hash; renumber them by first occurrence
+    order = np.argsort(first, kind='stable')
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    vertices = np.asarray(corners[first[order]], dtype=np.float64)
+    return vertices, rank[inverse.reshape(-1)]
+
+def _merge_digits() -> int:
+    return trimesh.util.decimal_to_digits(trimesh.tol.merge)
+
+def _build(corners, faces: Optional[np.ndarray]) -> MeshArrays:
+    """
+    Weld the corners and index the faces into the welded vertices; faces
+    None means every three consecutive corners form a triangle. Faces
+    touching non-finite corners are dropped.
+    """
+    finite = np.ones(len(corners), dtype=bool)
+    for start in range(0, len(corners), WELD_BLOCK):
+        finite[start:start + WELD_BLOCK] = np.isfinite(corners[start:start + WELD_BLOCK]).all(axis=1)
+    if faces is None and finite.all():
+        vertices, inverse = weld(corners, _merge_digits())
+        return MeshArrays(vertices, inverse.reshape(-1, 3))
+
+    if faces is None:
+        faces = np.arange(len(corners), dtype=np.int64).reshape(-1, 3)
+    elif not finite.all():
+        faces = faces[finite[faces].all(axis=1)]
+    # Only corners used by a face take part, like trimesh's referenced-vertex mask
+    referenced = np.zeros(len(corners), dtype=bool)
+    referenced[faces] = True
+    if referenced.all():
+        vertices, remap = weld(corners, _merge_digits())
+    else:
+        used = np.flatnonzero(referenced)
+        vertices, inverse = weld(np.asarray(corners[used]), _merge_digits())
+        remap = np.zeros(len(corners), dtype=np.int64)
+        remap[used] = inverse
+    # Faces are a fresh int64 array here, so they are renumbered in place
+    np.take(remap, faces, out=faces)
+    return MeshArrays(vertices, faces)
+
+def read_binary_stl(raw: np.ndarray) -> Optional[MeshArrays]:
+    """Binary STL, or None when the size does not match a binary triangle count (ASCII STL)"""
+    if len(raw) < STL_HEADER_SIZE:
+        return None
+    count = int(raw[80:84].view("<u4")[0])
+    if len(raw) != STL_HEADER_SIZE + count * STL_RECORD.itemsize or count == 0:
+        return None
+    records = raw[STL_HEADER_SIZE:].view(STL_RECORD)
+    return _build(_TriangleCorners(records["vertices"]), None)
+
+def _ply_header(raw: np.ndarray) -> Optional[Tuple[List[Tuple[str, int, List[Tuple[str, Any]]]], int]]:
+    """Elements of a binary little-endian PLY header and the offset of the data, or None"""
+    head = bytes(raw[:PLY_MAX_HEADER])
+    end = head.find(b"end_header")
+    if not head.startswith(b"ply") or end < 0:
+        return None
+    offset = head.index(b"\n", end) + 1
+    elements = []
+    for line in head[:end].decode("ascii", errors="replace").splitlines():
+        words = line.split()
+        if not words:
+            continue
+        if words[0] == "format" and words[1:2] != ["binary_little_endian"]:
+            return None
+        if words[0] == "element":
+            elements.append((words[1], int(words[2]), []))
+        elif words[0] == "property" and elements:
+            if words[1] == "list":
+                if words[2] not in PLY_TYPES or words[3] not in PLY_TYPES:
+                    return None
+                elements[-1][2].append((words[4], ("list", PLY_TYPES[words[2]], PLY_TYPES[words[3]])))
+            elif words[1] in PLY_TYPES:
+                elements[-1][2].append((words[2], PLY_TYPES[words[1]]))
+            else:
+                return None
+    return elements, offset
+
+def read_binary_ply(raw: np.ndarray) -> Optional[MeshArrays]:
+    """
+    Binary little-endian PLY with triangle faces, or None when another
+    reader is needed (ASCII, big-endian, polygons, other list elements).
+    Vertex attributes other than position are not read.
+    """
+    header = _ply_header(raw)
+    if header is None:
+        return None
+    elements, offset = header
+    corners, faces = None, None
+    for name, count, properties in elements:
+        fields = []
+        for field, kind in properties:
+            if isinstance(kind, tuple):
+                # Triangles only: the list is a fixed count and three indices
+                if name != "face" or field not in ("vertex_indices", "vertex_index"):
+                    return None
+                fields += [("_count", "<" + kind[1]), ("_indices", "<" + kind[2], (3,))]
+            else:
+                fields.append((field, "<" + kind))
+        dtype = np.dtype(fields)
+        if offset + count * dtype.itemsize > len(raw):
+            return None
+        data = raw[offset:offset + count * dtype.itemsize].view(dtype)
+        offset += count * dtype.itemsize
+        if name == "vertex":
+            if not {"x", "y", "z"} <= set(dtype.names):
+                return None
+            corners = data
+        elif name == "face" and "_indices" in dtype.names:
+            if not (data["_count"] == 3).all():
+                return None
+            faces = data["_indices"].astype(np.int64)
+    if corners is None or faces is None or not len(faces):
+        return None
+    if faces.min() < 0 or faces.max() >= len(corners):
+        raise ValueError("PLY face indices out of range")
+    positions = np.empty((len(corners), 3), dtype=np.float64)
+    for axis, field in enumerate("xyz"):
+        positions[:, axis] = corners[field]
+    return _build(positions, faces)
+
+READERS = {"stl": read_binary_stl, "ply": read_binary_ply}
+
+def load_arrays(content: Union[bytes, BinaryIO], file_type: str) -> Optional[MeshArrays]:
+    """
+    Welded vertex and face arrays read straight from the bytes or a
+    memory map of the file, or None when the format needs trimesh's loader.
+    """
+    reader = READERS.get(file_type.lower())
+    if reader is None:
+        return None
+    raw = _byte_view(content)
+    if raw is None:
+        return None
+    return reader(raw)
@@ -1,46 +1,224 @@
 import nltk
-from nltk.tokenize import word_tokenize, sent_tokenize
-from nltk.corpus import stopwords
+from nltk.tokenize import word_tokenize, sent_tokenize, NLTKWordTokenizer
+from nltk.corpus import stopwords, wordnet
 from nltk.stem import WordNetLemmatizer
 import re
 import random
-from typing import Dict, Any
+import codecs
+import csv
+import io
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from functools import lru_cache
+from typing import Dict, Any, BinaryIO, Iterable, Iterator, List, Optional, Tuple, Union
+from app.core.config import settings
 from app.core.logger import logger
 
-def download_nltk_data():
-    """Download required NLTK data with error handling"""
-    required_packages = [
-        'punkt',           # Changed from punkt_tab to punkt
-        'stopwords',
-        'wordnet',
-        'averaged_perceptron_tagger'
-    ]
-    
-    try:
-        for package in required_packages:
-            try:
-                nltk.data.find(f'tokenizers/{package}')
-                logger.info(f"NLTK package '{package}' already downloaded")
-            except LookupError:
-                nltk.download(package)
+# (package, resource) pairs TextProcessor needs; NLTK 3.8.2+ reads Punkt from punkt_tab
+_PUNKT = ("punkt_tab", "tokenizers/punkt_tab/english/") if hasattr(nltk.tokenize, "PunktTokenizer") \
+    else ("punkt", "tokenizers/punkt/english.pickle")
+NLTK_PACKAGES = [
+    _PUNKT,
+    ("stopwords", "corpora/stopwords/english"),
+    ("wordnet", "corpora/wordnet/lexnames")
+]
+
+_nltk_data_checked = False
+
+def ensure_nltk_data() -> None:
+    """
+    Resolve NLTK data from settings.NLTK_DATA_DIR (then NLTK's default paths),
+    once per process. Nothing is downloaded unless NLTK_DOWNLOAD is set;
+    missing packages raise LookupError naming them.
+    """
+    global _nltk_data_checked
+    if _nltk_data_checked:
+        return
+    data_dir = settings.NLTK_DATA_DIR
+    if data_dir and data_dir not in nltk.data.path:
+        nltk.data.path.insert(0, data_dir)
+
+    missing = []
+    for package, resource in NLTK_PACKAGES:
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            if settings.NLTK_DOWNLOAD and nltk.download(package, download_dir=data_dir or None, quiet=True):
                 logger.info(f"Downloaded NLTK package '{package}'")
-    except Exception as e:
-        logger.error(f"Error downloading NLTK data: {str(e)}")
-        raise
+            else:
+                missing.append(package)
+    if missing:
+        raise LookupError(
+            f"NLTK data not found: {', '.join(missing)}. Install it with "
+            f"'python -m nltk.downloader -d {data_dir or '<NLTK_DATA_DIR>'} {' '.join(missing)}'"
+        )
+    _nltk_data_checked = True
+
+_WHITESPACE = re.compile(r'\s+')
+_NON_LETTERS = re.compile(r'[^a-zA-Z\s\.]')
+_SPECIAL_CHARS = re.compile(r'[^a-zA-Z0-9\s]')
+_NON_WORD_CHARS = re.compile(r'[^\w\s\.]')
+
+# Token frequencies are Zipfian, so most lemma lookups repeat. WordNetLemmatizer
+# keeps no state of its own, so one bounded cache per process serves every
+# TextProcessor; lru_cache is thread-safe.
+LEMMA_CACHE_SIZE = 131072
+_lemmatizer = WordNetLemmatizer()
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize(token: str) -> str:
+    return _lemmatizer.lemmatize(token)
+
+class NLTKTokenizer:
+    """Punkt sentence splitting and NLTK's Treebank-style word tokenization"""
+
+    def sentences(self, text: str) -> List[str]:
+        return sent_tokenize(text)
+
+    def words(self, sentence: str) -> List[str]:
+        return word_tokenize(sentence)
+
+def _contraction_literal(pattern: str) -> str:
+    """The word a Treebank contraction pattern such as (?i)\\b(can)(?#X)(not)\\b needs; "" if unknown"""
+    match = re.match(r"\(\?i\)\\b\((\w+)\)\(\?#X\)\((\w+)\)", pattern)
+    return "".join(match.groups()) if match else ""
+
+class FastTokenizer(NLTKTokenizer):
+    """
+    Same output as NLTKTokenizer, much faster on text already reduced to
+    lowercase ASCII letters, spaces and periods (as preprocess does).
+    On that alphabet the only Treebank rules that can fire are the final
+    period, period runs and the contractions without apostrophes, so words
+    applies just those, with NLTK's own patterns. Other text goes to NLTK.
+    """
+
+    NORMALIZED = re.compile(r'[a-z. ]*')
+    FINAL_PERIOD = re.compile(r'([^\.])(\.)([\]\)}>"\'' "»”’ " r"]*)\s*$", re.U)
+    PERIOD_RUN = re.compile(r'\.{2,}', re.U)
+    # (pattern, literal word it needs); a pattern only runs when its word occurs
+    CONTRACTIONS = [
+        (regexp, _contraction_literal(regexp.pattern))
+        for regexp in NLTKWordTokenizer.CONTRACTIONS2 if "'" not in regexp.pattern
+    ]
+
+    def words(self, sentence: str) -> List[str]:
+        if not self.NORMALIZED.fullmatch(sentence):
+            return super().words(sentence)
+        # word_tokenize splits its input into sentences again; on this alphabet
+        # punkt only considers a break at a period followed by a space
+        parts = sent_tokenize(sentence) if ". " in sentence else [sentence]
+        tokens = []
+        for part in parts:
+            part = self.FINAL_PERIOD.sub(r"\1 \2 \3 ", part)
+            part = " " + self.PERIOD_RUN.sub(r" \g<0> ", part) + " "
+            for regexp, literal in self.CONTRACTIONS:
+                if literal in part:
+                    part = regexp.sub(r" \1 \2 ", part)
+            tokens.extend(part.split())
+        return tokens
+
+TOKENIZERS = {
+    "nltk": NLTKTokenizer,
+    "fast": FastTokenizer
+}
+
+# (id, text, error) as produced by TextProcessor.iter_documents; DuplicateFilter
+# appends the matching document to duplicates, which are then not processed
+Document = Union[Tuple[Any, Optional[str], Optional[str]], Tuple[Any, Optional[str], Optional[str], Dict[str, Any]]]
+
+# One TextProcessor per worker process, so WordNet and the stopword set load once
+_worker_processor = None
+
+def init_worker(tokenizer: str = "nltk") -> None:
+    """Process pool initializer that builds this worker's TextProcessor"""
+    global _worker_processor
+    if _worker_processor is None or _worker_processor.tokenizer_name != tokenizer:
+        _worker_processor = TextProcessor(tokenizer=tokenizer)
+
+def process_shard(shard: List[Document], tokenizer: str = "nltk") -> List[Dict[str, Any]]:
+    """Preprocess a shard of documents in a worker process"""
+    # Also covers pools created without the initializer
+    init_worker(tokenizer)
+    return [_worker_processor.process_record(*document) for document in shard]
+
+class DuplicateFilter:
+    """
+    Marks duplicates in a document stream, of earlier submissions in a
+    DedupIndex and of documents earlier in the same stream. Documents join
+    the index through commit() once they processed without error, so a
+    failed document is not its own duplicate when the batch is retried.
+    """
 
-# Download NLTK data when module is imported
-download_nltk_data()
+    def __init__(self, dedup_index):
+        self.index = dedup_index
+        self._seen = dedup_index.scratch()
+        # Fingerprints of documents passed on but not committed yet, by id() as
+        # ids may be unhashable; the shard holds each document until commit
+        self._pending: Dict[int, Any] = {}
+
+    def mark(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """Yield documents in order; duplicates get their match appended and skip preprocessing"""
+        for document in documents:
+            doc_id, text, error = document[:3]
+            if error is None:
+                fingerprint = self.index.fingerprint(TextProcessor.dedup_tokens(text))
+                match = self.index.check_fingerprint(doc_id, fingerprint, add=False)
+                if match is None:
+                    match = self._seen.check_fingerprint(doc_id, fingerprint)
+                if match is not None:
+                    yield doc_id, None, None, match
+                    continue
+                self._pending[id(document)] = fingerprint
+            yield document
+
+    def commit(self, shard: List[Document], records: List[Dict[str, Any]]) -> None:
+        """Add the shard's successfully processed documents to the index"""
+        for document, record in zip(shard, records):
+            fingerprint = self._pending.pop(id(document), None)
+            if fingerprint is not None and "processed_text" in record:
+                self.index.add(document[0], fingerprint)
 
 class TextProcessor:
-    def __init__(self):
+    # Bump when processing output changes so cached results are invalidated
+    VERSION = "1"
+
+    INPUT_FORMATS = ("jsonl", "csv", "lines")
+    # Documents per task sent to a worker; amortizes pickling and scheduling
+    SHARD_SIZE = 256
+
+    def __init__(self, tokenizer: str = "nltk"):
+        """tokenizer selects a backend from TOKENIZERS; "fast" gives the same output as "nltk" """
+        if tokenizer not in TOKENIZERS:
+            raise ValueError(f"tokenizer must be one of: {', '.join(TOKENIZERS)}")
         try:
+            ensure_nltk_data()
+            self.tokenizer_name = tokenizer
+            self.tokenizer = TOKENIZERS[tokenizer]()
             self.lemmatizer = WordNetLemmatizer()
             self.stop_words = set(stopwords.words('english'))
+            # NLTK reads WordNet and the Punkt model on first use; load them here instead of in a request
+            wordnet.ensure_loaded()
+            self.tokenizer.sentences("")
             logger.info("TextProcessor initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing TextProcessor: {str(e)}")
             raise
 
+    @staticmethod
+    def lemma_cache_info() -> Dict[str, Any]:
+        """Hit-rate statistics of this process's lemma cache"""
+        info = lemmatize.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": info.hits / lookups if lookups else 0.0,
+            "entries": info.currsize,
+            "max_entries": info.maxsize
+        }
+
     def validate_text(self, text: str) -> Dict[str, Any]:
         try:
             # Basic text validation
@@ -51,7 +229,7 @@ class TextProcessor:
                 "length": len(text),
                 "word_count": len(text.split()),
                 "line_count": len(text.splitlines()),
-                "has_special_chars": bool(re.search(r'[^a-zA-Z0-9\s]', text)),
+                "has_special_chars": bool(_SPECIAL_CHARS.search(text)),
                 "is_valid": True
             }
         except Exception as e:
@@ -60,42 +238,12 @@ class TextProcessor:
 
     def preprocess(self, text: str) -> Dict[str, Any]:
         try:
-            # Store original text
-            original_text = text
-            
-            # Basic preprocessing
-            text = text.strip()  # Remove leading/trailing whitespace
-            text = re.sub(r'\s+', ' ', text)  # Normalize whitespace
-            text = text.lower()  # Convert to lowercase
-            
-            # Remove special characters and digits, but keep sentence structure
-            text = re.sub(r'[^a-zA-Z\s\.]', '', text)
-            
-            # Split into sentences and tokenize each sentence
-            sentences = sent_tokenize(text)
-            processed_sentences = []
-            
-            for sentence in sentences:
-                # Tokenize words
-                tokens = word_tokenize(sentence)
-                
-                # Remove stop words and lemmatize
-                processed_tokens = []
-                for token in tokens:
-                    if token.lower() not in self.stop_words:
-                        processed_tokens.append(self.lemmatizer.lemmatize(token))
-                
-                # Rejoin tokens into sentence
-                if processed_tokens:
-                    processed_sentences.append(' '.join(processed_tokens))
-            
-            # Join sentences back together
-            processed_text = '. '.join(processed_sentences)
+            processed_text = self._preprocess_text(text)
             
             logger.info("Text preprocessing completed successfully")
             
             return {
-                "original_text": original_text,
+                "original_text": text,
                 "processed_text": processed_text,
                 "steps": [
                     "Removed leading/trailing whitespace",
@@ -113,14 +261,248 @@ class TextProcessor:
             logger.error(f"Error preprocessing text: {str(e)}")
             raise
 
+    def process_record(self, doc_id: Any, text: Optional[str], error: Optional[str] = None,
+                       duplicate: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Preprocess one batch document; failures become an error record instead of raising"""
+        if duplicate is not None:
+            return {"id": doc_id, "duplicate": duplicate}
+        if error is None:
+            try:
+                return {"id": doc_id, "processed_text": self._preprocess_text(text)}
+            except Exception as e:
+                error = str(e)
+        return {"id": doc_id, "error": error}
+
+    def preprocess_stream(self, file: BinaryIO, chunk_size: int, include_original: bool = False,
+                          max_sentence_size: Optional[int] = None) -> Iterator[Dict[str, str]]:
+        """
+        Preprocess UTF-8 text of any size chunk by chunk, yielding one record per
+        input chunk: {"processed_text"} plus {"original_text"} (the decoded chunk)
+        when include_original is set. Concatenating the processed_text values
+        gives the same result as preprocess on the whole text.
+
+        The sentence still open at a chunk boundary is carried into the next
+        chunk, so memory stays around chunk_size plus one sentence. A sentence
+        growing past max_sentence_size is processed as it stands.
+        """
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        pending_space = ""  # Raw trailing whitespace, collapsed with the next chunk's leading whitespace
+        carry = ""  # Normalized text of the open sentence
+        started = False
+        separator = ""
+        
+        while True:
+            data = file.read(chunk_size)
+            final = not data
+            raw = decoder.decode(data, final=final)
+            
+            # Whitespace is stripped only at the ends of the whole text
+            text = pending_space + raw
+            if not started:
+                text = text.lstrip()
+                started = bool(text)
+            stripped = text.rstrip()
+            pending_space = "" if final else text[len(stripped):]
+            
+            buffer = carry + self._normalize(stripped)
+            sentences = self.tokenizer.sentences(buffer) if buffer else []
+            carry = ""
+            if sentences and not final:
+                # Sentences come back as slices of buffer, so the last one is found by rfind
+                start = buffer.rfind(sentences[-1])
+                if max_sentence_size is None or len(buffer) - start <= max_sentence_size:
+                    carry = buffer[start:]
+                    sentences.pop()
+            
+            processed = '. '.join(self._process_sentences(sentences))
+            record = {"processed_text": separator + processed if processed else ""}
+            if processed:
+                separator = ". "
+            if include_original:
+                record["original_text"] = raw
+            if data or raw or processed:
+                yield record
+            if final:
+                return
+
+    @staticmethod
+    def dedup_tokens(text: str) -> List[str]:
+        """Normalized words of text, as fingerprinted for dedup before the costly tokenization and lemmatization"""
+        return TextProcessor._normalize(text.strip()).replace('.', ' ').split()
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        text = _WHITESPACE.sub(' ', text)  # Normalize whitespace
+        text = text.lower()  # Convert to lowercase
+        
+        # Remove special characters and digits, but keep sentence structure
+        return _NON_LETTERS.sub('', text)
+
+    def _preprocess_text(self, text: str) -> str:
+        # Remove leading/trailing whitespace, then normalize
+        text = self._normalize(text.strip())
+        
+        # Join sentences back together
+        return '. '.join(self._process_sentences(self.tokenizer.sentences(text)))
+
+    def _process_sentences(self, sentences: List[str]) -> List[str]:
+        """Tokenize, drop stop words and lemmatize normalized sentences; sentences left empty are dropped"""
+        tokenized = [self.tokenizer.words(sentence) for sentence in sentences]
+        
+        # Remove stop words and lemmatize once per distinct token; None marks a stop word
+        replacements = {
+            token: None if token.lower() in self.stop_words else lemmatize(token)
+            for token in {token for tokens in tokenized for token in tokens}
+        }
+        
+        processed_sentences = []
+        for tokens in tokenized:
+            processed_tokens = [replacements[token] for token in tokens if replacements[token] is not None]
+            
+            # Rejoin tokens into sentence
+            if processed_tokens:
+                processed_sentences.append(' '.join(processed_tokens))
+        return processed_sentences
+
+    @staticmethod
+    def detect_input_format(filename: Optional[str]) -> str:
+        """Guess the batch input format from a file name: jsonl, csv or lines"""
+        extension = os.path.splitext(filename or "")[1].lower()
+        if extension in (".jsonl", ".ndjson", ".json"):
+            return "jsonl"
+        if extension == ".csv":
+            return "csv"
+        return "lines"
+
+    @staticmethod
+    def iter_documents(file: BinaryIO, input_format: str = "lines", text_field: str = "text",
+                       id_field: str = "id", max_document_size: Optional[int] = None) -> Iterator[Document]:
+        """
+        Read (id, text, error) documents from a binary file
+        Args:
+            file: JSONL objects (or JSON strings), CSV with a header row, or one document per line
+            input_format: jsonl, csv or lines
+            text_field: JSONL key or CSV column holding the text
+            id_field: JSONL key or CSV column holding the id; defaults to the document index
+            max_document_size: documents longer than this become error records
+        Malformed records are yielded with an error rather than stopping the batch.
+        """
+        if input_format not in TextProcessor.INPUT_FORMATS:
+            raise ValueError(f"input_format must be one of: {', '.join(TextProcessor.INPUT_FORMATS)}")
+        stream = io.TextIOWrapper(file, encoding='utf-8', errors='replace', newline='' if input_format == "csv" else None)
+
+        def document(doc_id: Any, text: Any) -> Document:
+            if not isinstance(text, str):
+                return doc_id, None, f"Missing text field '{text_field}'"
+            if max_document_size is not None and len(text) > max_document_size:
+                return doc_id, None, "Document too large"
+            return doc_id, text, None
+
+        if input_format == "csv":
+            if max_document_size is not None:
+                csv.field_size_limit(max(csv.field_size_limit(), max_document_size))
+            reader = csv.DictReader(stream)
+            if reader.fieldnames is None or text_field not in reader.fieldnames:
+                raise ValueError(f"CSV input has no '{text_field}' column")
+            for index, row in enumerate(reader):
+                yield document(row.get(id_field) or index, row[text_field])
+            return
+
+        index = 0
+        for line in stream:
+            line = line.rstrip("\r\n")
+            if not line.strip():
+                continue
+            if input_format == "lines":
+                yield document(index, line)
+            else:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield index, None, f"Invalid JSON: {str(e)}"
+                else:
+                    if isinstance(record, dict):
+                        yield document(record.get(id_field, index), record.get(text_field))
+                    else:
+                        yield document(index, record)
+            index += 1
+
+    @staticmethod
+    def iter_shards(documents: Iterable[Document], shard_size: int = SHARD_SIZE) -> Iterator[List[Document]]:
+        shard = []
+        for document in documents:
+            shard.append(document)
+            if len(shard) >= shard_size:
+                yield shard
+                shard = []
+        if shard:
+            yield shard
+
+    @staticmethod
+    def preprocess_batch(documents: Iterable[Union[str, Tuple[Any, str], Document]],
+                         workers: Optional[int] = None, ordered: bool = True,
+                         shard_size: int = SHARD_SIZE, tokenizer: str = "nltk",
+                         dedup_index=None) -> Iterator[Dict[str, Any]]:
+        """
+        Preprocess documents across a process pool, yielding {"id", "processed_text"}
+        (or {"id", "error"}) records. documents are strings (ids are their index),
+        (id, text) pairs or iter_documents output. With ordered=False records come
+        back shard by shard as workers finish. Input is consumed lazily, with at
+        most two shards per worker in flight. With a DedupIndex, duplicates yield
+        {"id", "duplicate"} records instead (see DuplicateFilter).
+        """
+        workers = workers or os.cpu_count() or 1
+
+        def normalized() -> Iterator[Document]:
+            for index, document in enumerate(documents):
+                if isinstance(document, str):
+                    yield index, document, None
+                elif len(document) == 2:
+                    yield document[0], document[1], None
+                else:
+                    yield document
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(tokenizer,)) as executor:
+            pending = deque()
+            shards = {}
+            duplicates = DuplicateFilter(dedup_index) if dedup_index is not None else None
+
+            def finish(future) -> List[Dict[str, Any]]:
+                records = future.result()
+                if duplicates is not None:
+                    duplicates.commit(shards.pop(future), records)
+                return records
+
+            def collect() -> Iterator[Dict[str, Any]]:
+                if ordered:
+                    yield from finish(pending.popleft())
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    yield from finish(future)
+
+            stream = normalized()
+            if duplicates is not None:
+                stream = duplicates.mark(stream)
+            for shard in TextProcessor.iter_shards(stream, shard_size):
+                future = executor.submit(process_shard, shard, tokenizer)
+                pending.append(future)
+                if duplicates is not None:
+                    shards[future] = shard
+                while len(pending) >= 2 * workers:
+                    yield from collect()
+            while pending:
+                yield from collect()
+
     def augment(self, text: str) -> Dict[str, Any]:
         try:
             # Split text into sentences
-            sentences = sent_tokenize(text)
+            sentences = self.tokenizer.sentences(text)
             
             augmented_texts = {
-                "reversed": self._reverse_text(text),
-                "shuffled": self._shuffle_sentences(sentences),
+                "reversed": self._reverse_text(sentences),
+                "shuffled": self._shuffle_sentences(list(sentences)),
                 "simplified": self._simplify_text(text),
                 "expanded": self._expand_text(text)
             }
@@ -141,10 +523,9 @@ class TextProcessor:
             logger.error(f"Error augmenting text: {str(e)}")
             raise
 
-    def _reverse_text(self, text: str) -> str:
-        """Reverse the words in the text while maintaining sentence structure"""
+    def _reverse_text(self, sentences: list) -> str:
+        """Reverse the words in each sentence while maintaining sentence structure"""
         try:
-            sentences = sent_tokenize(text)
             reversed_sentences = []
             for sentence in sentences:
                 words = sentence.split()
@@ -169,7 +550,7 @@ class TextProcessor:
         """Simplify text by removing complex structures"""
         try:
             # Remove all punctuation except periods
-            simplified = re.sub(r'[^\w\s\.]', '', text)
+            simplified = _NON_WORD_CHARS.sub('', text)
             return simplified.lower()
         except Exception as e:
             logger.error(f"Error simplifying text: {str(e)}")
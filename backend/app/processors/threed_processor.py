@@ -2,25 +2,367 @@ import trimesh
 
 import numpy as np
 
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+
+from contextlib import contextmanager
+
+from scipy.sparse import coo_matrix
+
+from scipy.sparse.csgraph import breadth_first_order, connected_components
+
+from typing import Dict, Any, List, Optional, BinaryIO, Tuple, Union
 
 import io
 
+import json
+
+import struct
+
+import time
+
 from app.core.logger import logger
 
+from app.processors.mesh_analytics import mesh_metrics
+
+from app.processors.mesh_io import MeshArrays, load_arrays
+
+
+
+MESH_BINARY_MAGIC = b'MSHB'
+
+MESH_BINARY_VERSION = 1
+
+MESH_BINARY_MEDIA_TYPE = "application/x-mesh-binary"
+
+
+
+@contextmanager
+
+def _timed(timings: Dict[str, float], step: str):
+
+    start = time.perf_counter()
+
+    try:
+
+        yield
+
+    finally:
+
+        timings[step] = timings.get(step, 0.0) + time.perf_counter() - start
+
+
+
+class MeshTopology:
+
+    """
+
+    Half-edge topology of a face array: edges shared by two faces, boundary
+
+    edges and connected components. Built once per preprocess and sliced per
+
+    group of components, so the cleanup passes never rebuild adjacency.
+
+    """
+
+
+
+    def __init__(self, faces: np.ndarray):
+
+        self.faces = faces
+
+        # Half-edge h belongs to face h // 3
+
+        self.edges = faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+
+        sorted_edges = np.sort(self.edges, axis=1)
+
+        self.interior = trimesh.grouping.group_rows(sorted_edges, require_count=2).reshape(-1, 2)
+
+        self.boundary = trimesh.grouping.group_rows(sorted_edges, require_count=1).reshape(-1)
+
+        self.adjacency = self.interior // 3
+
+        graph = coo_matrix(
+
+            (np.ones(len(self.adjacency), dtype=bool), (self.adjacency[:, 0], self.adjacency[:, 1])),
+
+            shape=(len(faces), len(faces))
+
+        )
+
+        self.component_count, self.labels = connected_components(graph, directed=False)
+
+
+
+    def group(self, face_index: np.ndarray) -> "MeshTopology":
+
+        """Topology of a subset of whole components, with faces renumbered in face_index order"""
+
+        local = np.full(len(self.faces), -1)
+
+        local[face_index] = np.arange(len(face_index))
+
+        topology = MeshTopology.__new__(MeshTopology)
+
+        topology.faces = self.faces[face_index]
+
+        topology.edges = topology.faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+
+        interior = self.interior[local[self.adjacency[:, 0]] >= 0]
+
+        topology.interior = local[interior // 3] * 3 + interior % 3
+
+        boundary = self.boundary[local[self.boundary // 3] >= 0]
+
+        topology.boundary = local[boundary // 3] * 3 + boundary % 3
+
+        topology.adjacency = topology.interior // 3
+
+        _, topology.labels = np.unique(self.labels[face_index], return_inverse=True)
+
+        topology.component_count = int(topology.labels.max()) + 1 if len(face_index) else 0
+
+        return topology
+
+
+
+    def split(self, count: int) -> List[np.ndarray]:
+
+        """Face indices of up to count groups of whole components with similar face counts"""
+
+        if count <= 1 or self.component_count <= 1:
+
+            return [np.arange(len(self.faces))]
+
+        sizes = np.bincount(self.labels, minlength=self.component_count)
+
+        order = np.argsort(-sizes)
+
+        before = np.cumsum(sizes[order]) - sizes[order]
+
+        assignment = np.empty(self.component_count, dtype=np.int64)
+
+        assignment[order] = np.minimum(before * count // len(self.faces), count - 1)
+
+        face_group = assignment[self.labels]
+
+        groups = [np.flatnonzero(face_group == group) for group in range(count)]
+
+        return [group for group in groups if len(group)]
+
+
+
+    def winding_flips(self) -> np.ndarray:
+
+        """Faces to flip so that faces sharing an edge traverse it in opposite directions"""
+
+        count = len(self.faces)
+
+        first, second = self.interior[:, 0], self.interior[:, 1]
+
+        # Consistently wound neighbours traverse their shared edge in opposite directions
+
+        mismatch = self.edges[first, 0] == self.edges[second, 0]
+
+        if not mismatch.any():
+
+            return np.zeros(count, dtype=bool)
+
+
+
+        # Breadth-first forest from a virtual root (index count) joined to one face per component
+
+        roots = np.unique(self.labels, return_index=True)[1]
+
+        rows = np.concatenate([self.adjacency[:, 0], np.full(len(roots), count)])
+
+        cols = np.concatenate([self.adjacency[:, 1], roots])
+
+        graph = coo_matrix((np.ones(len(rows), dtype=bool), (rows, cols)), shape=(count + 1, count + 1)).tocsr()
+
+        _, parent = breadth_first_order(graph, count, directed=False, return_predecessors=True)
+
+        parent = parent[:count]
+
+
+
+        # A face flips relative to its tree parent when their shared edge mismatches
+
+        pair_keys = self.adjacency.min(axis=1) * count + self.adjacency.max(axis=1)
+
+        order = np.argsort(pair_keys)
+
+        faces = np.arange(count)
+
+        tree = parent < count
+
+        tree_keys = np.minimum(parent[tree], faces[tree]) * count + np.maximum(parent[tree], faces[tree])
+
+        flips = np.zeros(count + 1, dtype=bool)
+
+        flips[faces[tree]] = mismatch[order][np.searchsorted(pair_keys[order], tree_keys)]
+
+
+
+        # Pointer jumping accumulates the parity along each face's path to the root
+
+        pointer = np.append(parent, count)
+
+        while (pointer[:count] != count).any():
+
+            flips, pointer = flips ^ flips[pointer], pointer[pointer]
+
+        return flips[:count]
+
+
+
+    def inversion_flips(self, vertices: np.ndarray, faces: np.ndarray) -> np.ndarray:
+
+        """Faces of components with negative signed volume, i.e. normals pointing inward"""
+
+        triangles = vertices[faces]
+
+        volume = np.einsum('ij,ij->i', triangles[:, 0], np.cross(triangles[:, 1], triangles[:, 2]))
+
+        component_volume = np.bincount(self.labels, weights=volume, minlength=self.component_count)
+
+        return component_volume[self.labels] < 0
+
+
+
+    def hole_faces(self, vertices: np.ndarray, flips: np.ndarray) -> np.ndarray:
+
+        """
+
+        Faces closing boundary loops of three or four edges, as trimesh's
+
+        fill_holes does, wound against the boundary of the faces as
+
+        oriented by flips.
+
+        """
+
+        empty = np.zeros((0, 3), dtype=np.int64)
+
+        if len(self.boundary) < 3:
+
+            return empty
+
+        # A flipped face traverses each of its edges the other way
+
+        directed = self.edges[self.boundary]
+
+        directed = np.where(flips[self.boundary // 3][:, None], directed[:, ::-1], directed)
+
+        used, inverse = np.unique(directed, return_inverse=True)
+
+        directed = inverse.reshape(-1, 2)
+
+
+
+        graph = coo_matrix(
+
+            (np.ones(len(directed), dtype=bool), (directed[:, 0], directed[:, 1])),
+
+            shape=(len(used), len(used))
+
+        )
+
+        _, labels = connected_components(graph, directed=False)
+
+        edge_counts = np.bincount(labels[directed[:, 0]], minlength=labels.max() + 1)
+
+        vertex_counts = np.bincount(labels, minlength=labels.max() + 1)
+
+        out_degree = np.bincount(directed[:, 0], minlength=len(used))
+
+        in_degree = np.bincount(directed[:, 1], minlength=len(used))
+
+        simple = np.ones(labels.max() + 1, dtype=bool)
+
+        simple[labels[(out_degree != 1) | (in_degree != 1)]] = False
+
+        loops = np.flatnonzero(simple & (edge_counts == vertex_counts) & np.isin(edge_counts, (3, 4)))
+
+        if not len(loops):
+
+            return empty
+
+
+
+        following = np.full(len(used), -1)
+
+        following[directed[:, 0]] = directed[:, 1]
+
+        starts = np.unique(labels[directed[:, 0]], return_index=True)
+
+        new_faces = []
+
+        for loop in loops:
+
+            vertex = directed[starts[1][np.searchsorted(starts[0], loop)], 0]
+
+            ring = [vertex]
+
+            for _ in range(edge_counts[loop] - 1):
+
+                ring.append(following[ring[-1]])
+
+            # Reversed loop order gives the winding opposite to the boundary
+
+            ring = used[ring[::-1]]
+
+            if len(ring) == 3:
+
+                new_faces.append(ring)
+
+            else:
+
+                new_faces.extend([ring[[0, 1, 2]], ring[[2, 3, 0]]])
+
+        new_faces = np.array(new_faces, dtype=np.int64)
+
+        _, valid = trimesh.triangles.normals(vertices[new_faces])
+
+        return new_faces[valid]
+
 
 
 class ThreeDProcessor:
 
+    # Bump when processing output changes so cached results are invalidated
+
+    VERSION = "4"
+
+
+
+    # Pyramid levels below this many faces are skipped
+
+    LOD_MIN_FACES = 64
+
+
+
     @staticmethod
 
-    def load_mesh(content: bytes, file_type: str) -> trimesh.Trimesh:
+    def load_mesh(content: Union[bytes, BinaryIO], file_type: str) -> trimesh.Trimesh:
 
-        """Load mesh from bytes with proper error handling"""
+        """Load mesh from bytes or a binary file object with proper error handling"""
 
         try:
 
-            buffer = io.BytesIO(content)
+            # Binary STL/PLY are read from a memory map and welded without trimesh's parser
+
+            arrays = load_arrays(content, file_type)
+
+            if arrays is not None:
+
+                return arrays.to_trimesh()
+
+            
+
+            buffer = io.BytesIO(content) if isinstance(content, (bytes, bytearray)) else content
+
+            buffer.seek(0)
 
             mesh = trimesh.load(buffer, file_type=file_type)
 
@@ -32,149 +374,465 @@ class ThreeDProcessor:
 
                 if len(mesh.geometry) > 0:
 
-                    # Get the first geometry from the scene
+                    # Get the first geometry from the scene
+
+                    mesh = next(iter(mesh.geometry.values()))
+
+                else:
+
+                    raise ValueError("Empty scene")
+
+            
+
+            # Ensure it's a Trimesh object
+
+            if not isinstance(mesh, trimesh.Trimesh):
+
+                raise ValueError("Loaded geometry is not a valid mesh")
+
+            
+
+            return mesh
+
+        except Exception as e:
+
+            logger.error(f"Error loading mesh: {str(e)}")
+
+            raise ValueError(f"Failed to load {file_type} file: {str(e)}")
+
+
+
+    @staticmethod
+
+    def load_arrays(content: Union[bytes, BinaryIO], file_type: str,
+
+                    fallback_limit: Optional[int] = None) -> MeshArrays:
+
+        """
+
+        Welded vertex and face arrays without building a Trimesh, for work
+
+        that needs no topology. Formats without a memory-mapped reader go
+
+        through load_mesh, but only up to fallback_limit bytes.
+
+        """
+
+        try:
+
+            arrays = load_arrays(content, file_type)
+
+        except Exception as e:
+
+            logger.error(f"Error loading mesh: {str(e)}")
+
+            raise ValueError(f"Failed to load {file_type} file: {str(e)}")
+
+        if arrays is not None:
+
+            return arrays
+
+        
+
+        if fallback_limit is not None:
+
+            size = len(content) if isinstance(content, (bytes, bytearray)) else content.seek(0, io.SEEK_END)
+
+            if size > fallback_limit:
+
+                raise ValueError(f"{file_type} files over {fallback_limit} bytes are only supported as binary STL or PLY")
+
+        mesh = ThreeDProcessor.load_mesh(content, file_type)
+
+        return MeshArrays(np.asarray(mesh.vertices), np.asarray(mesh.faces))
+
+
+
+    @staticmethod
+
+    def validate_mesh(mesh: trimesh.Trimesh) -> Dict[str, Any]:
+
+        """Validate mesh and return detailed information"""
+
+        try:
+
+            # One vectorized pass instead of trimesh's separate cached properties
+
+            metrics = mesh_metrics(mesh.vertices, mesh.faces)
+
+            return {
+
+                **metrics,
+
+                "volume": metrics["volume"] if metrics["is_watertight"] else None,
+
+                # trimesh derives both normal sets on demand
+
+                "has_face_normals": True,
+
+                "has_vertex_normals": True,
+
+                "has_valid_faces": metrics["degenerate_faces"] == 0
+
+            }
+
+        except Exception as e:
+
+            logger.error(f"Error validating mesh: {str(e)}")
+
+            raise ValueError(f"Mesh validation failed: {str(e)}")
+
+
+
+    @staticmethod
+
+    def _viewer_arrays(mesh: trimesh.Trimesh) -> Dict[str, Any]:
+
+        """Collect vertex, face and normal arrays scaled for the THREE.js viewer"""
+
+        vertices = mesh.vertices
+
+        faces = mesh.faces
+
+        normals = mesh.vertex_normals
+
+
+
+        # Scale to reasonable size if needed
+
+        bounds = mesh.bounds
+
+        size = np.max(bounds[1] - bounds[0])
+
+        scale = 1.0
+
+        if size > 10 or size < 0.1:
+
+            scale = 1.0 / size
+
+            vertices = vertices * scale
+
+
+
+        return {
+
+            "vertices": vertices,
+
+            "faces": faces,
+
+            "normals": normals,
+
+            "scale": float(scale),
+
+            "bounds": bounds.tolist(),
+
+            "center": mesh.center_mass.tolist()
+
+        }
+
+
+
+    @staticmethod
+
+    def mesh_to_dict(mesh: trimesh.Trimesh) -> Dict[str, Any]:
+
+        """Convert mesh to a format suitable for THREE.js"""
+
+        try:
+
+            arrays = ThreeDProcessor._viewer_arrays(mesh)
+
+
+
+            return {
+
+                "vertices": arrays["vertices"].tolist(),
+
+                "faces": arrays["faces"].tolist(),
+
+                "normals": arrays["normals"].tolist(),
+
+                "bounds": arrays["bounds"],
+
+                "center": arrays["center"]
+
+            }
+
+        except Exception as e:
+
+            logger.error(f"Error converting mesh to dict: {str(e)}")
+
+            raise ValueError(f"Mesh conversion failed: {str(e)}")
+
+
+
+    @staticmethod
+
+    def _binary_container(header: Dict[str, Any], buffers: List[bytes]) -> bytes:
+
+        header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+
+        header_bytes += b' ' * (-len(header_bytes) % 4)
+
+        prefix = MESH_BINARY_MAGIC + struct.pack('<II', MESH_BINARY_VERSION, len(header_bytes))
+
+        return b''.join([prefix, header_bytes] + buffers)
+
+
+
+    @staticmethod
+
+    def mesh_to_binary(meshes: Dict[str, trimesh.Trimesh],
+
+                       metadata: Optional[Dict[str, Any]] = None) -> bytes:
+
+        """
+
+        Pack meshes into a binary container that THREE.js can load into BufferGeometry
+
+        Layout:
+
+            4-byte magic, uint32 version and uint32 header length (little-endian),
+
+            a UTF-8 JSON header padded to 4 bytes, then for every mesh its float32
+
+            positions, float32 normals and uint32 indices. Buffer offsets in the
+
+            header are relative to the start of the body that follows the header.
+
+        """
+
+        try:
+
+            header = {"version": MESH_BINARY_VERSION, "meshes": [], "metadata": metadata or {}}
+
+            buffers = []
+
+            offset = 0
+
+
+
+            for name, mesh in meshes.items():
+
+                arrays = ThreeDProcessor._viewer_arrays(mesh)
+
+                entry = {
+
+                    "name": name,
+
+                    "vertex_count": len(arrays["vertices"]),
+
+                    "face_count": len(arrays["faces"]),
+
+                    "scale": arrays["scale"],
+
+                    "bounds": arrays["bounds"],
+
+                    "center": arrays["center"]
+
+                }
+
+                for key, data, dtype in (("position", arrays["vertices"], '<f4'),
+
+                                         ("normal", arrays["normals"], '<f4'),
+
+                                         ("index", arrays["faces"], '<u4')):
+
+                    buffer = np.ascontiguousarray(data, dtype=dtype).tobytes()
+
+                    entry[key] = {"offset": offset, "length": len(buffer)}
+
+                    buffers.append(buffer)
+
+                    offset += len(buffer)
+
+                header["meshes"].append(entry)
+
+
+
+            return ThreeDProcessor._binary_container(header, buffers)
+
+        except Exception as e:
+
+            logger.error(f"Error converting mesh to binary: {str(e)}")
+
+            raise ValueError(f"Mesh conversion failed: {str(e)}")
+
+
+
+    @staticmethod
+
+    def _cluster_vertices(vertices: np.ndarray, faces: np.ndarray, origin: np.ndarray,
+
+                          cell: float) -> Tuple[np.ndarray, np.ndarray]:
+
+        """Merge vertices sharing a grid cell into their mean; returns vertices and surviving faces"""
+
+        cells = np.floor((vertices - origin) / cell).astype(np.int64)
+
+        # One scalar key per cell; a 1-D unique is much faster than a row-wise one
+
+        span = cells.max(axis=0) + 1
+
+        keys = (cells[:, 0] * span[1] + cells[:, 1]) * span[2] + cells[:, 2]
+
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+
+        clustered = np.stack([np.bincount(inverse, weights=vertices[:, axis]) for axis in range(3)], axis=1)
+
+        clustered /= counts[:, None]
+
+        
 
-                    mesh = next(iter(mesh.geometry.values()))
+        # Drop faces collapsed by the merge, then faces duplicated by it
 
-                else:
+        remapped = inverse[faces]
 
-                    raise ValueError("Empty scene")
+        remapped = remapped[(remapped[:, 0] != remapped[:, 1]) &
 
-            
+                            (remapped[:, 1] != remapped[:, 2]) &
 
-            # Ensure it's a Trimesh object
+                            (remapped[:, 2] != remapped[:, 0])]
 
-            if not isinstance(mesh, trimesh.Trimesh):
+        ordered = np.sort(remapped, axis=1)
 
-                raise ValueError("Loaded geometry is not a valid mesh")
+        count = len(clustered)
 
-            
+        if count ** 3 < 2 ** 63:
 
-            return mesh
+            _, first = np.unique((ordered[:, 0] * count + ordered[:, 1]) * count + ordered[:, 2], return_index=True)
 
-        except Exception as e:
+        else:
 
-            logger.error(f"Error loading mesh: {str(e)}")
+            _, first = np.unique(ordered, axis=0, return_index=True)
 
-            raise ValueError(f"Failed to load {file_type} file: {str(e)}")
+        return clustered, remapped[np.sort(first)]
 
 
 
     @staticmethod
 
-    def validate_mesh(mesh: trimesh.Trimesh) -> Dict[str, Any]:
+    def decimate(mesh: trimesh.Trimesh, face_count: int, tolerance: float = 0.2) -> trimesh.Trimesh:
 
-        """Validate mesh and return detailed information"""
+        """
 
-        try:
+        Simplify a mesh to about face_count faces by vertex clustering on a
 
-            # Compute face normals if they don't exist
+        uniform grid. Face counts on a surface grow with the square of the
 
-            if not hasattr(mesh, 'face_normals'):
+        grid resolution, which sets the cell size; a few corrections bring the
 
-                mesh.face_normals
+        result within tolerance of face_count.
 
+        """
 
+        vertices = mesh.vertices.view(np.ndarray)
 
-            # Compute vertex normals if they don't exist
+        faces = mesh.faces.view(np.ndarray)
 
-            if not hasattr(mesh, 'vertex_normals'):
+        if face_count >= len(faces):
 
-                mesh.vertex_normals
+            return mesh.copy()
 
+        origin = vertices.min(axis=0)
 
+        extent = float(np.max(vertices.max(axis=0) - origin)) or 1.0
 
-            return {
+        
 
-                "vertex_count": len(mesh.vertices),
+        # Start from the resolution where a grid cell holds about one vertex on average
 
-                "face_count": len(mesh.faces),
+        resolution = max(np.sqrt(len(vertices)), 1.0) * np.sqrt(face_count / len(faces))
 
-                "is_watertight": mesh.is_watertight,
+        best = None
 
-                "is_empty": mesh.is_empty,
+        for _ in range(6):
 
-                "bounds": mesh.bounds.tolist(),
+            clustered, clustered_faces = ThreeDProcessor._cluster_vertices(vertices, faces, origin, extent / resolution)
 
-                "volume": float(mesh.volume) if mesh.is_watertight else None,
+            error = abs(len(clustered_faces) - face_count) / face_count
 
-                "center_mass": mesh.center_mass.tolist(),
+            if best is None or error < best[0]:
 
-                "has_face_normals": True if hasattr(mesh, 'face_normals') else False,
+                best = (error, clustered, clustered_faces)
 
-                "has_vertex_normals": True if hasattr(mesh, 'vertex_normals') else False,
+            if error <= tolerance or len(clustered_faces) == 0:
 
-                "has_valid_faces": not any(mesh.area_faces < 1e-8)
+                break
 
-            }
+            resolution *= np.sqrt(face_count / max(len(clustered_faces), 1))
 
-        except Exception as e:
+        
 
-            logger.error(f"Error validating mesh: {str(e)}")
+        simplified = trimesh.Trimesh(vertices=best[1], faces=best[2], process=False)
 
-            raise ValueError(f"Mesh validation failed: {str(e)}")
+        simplified.remove_unreferenced_vertices()
+
+        return simplified
 
 
 
     @staticmethod
 
-    def mesh_to_dict(mesh: trimesh.Trimesh) -> Dict[str, Any]:
+    def lod_levels(ratios: List[float], face_count: int) -> List[float]:
 
-        """Convert mesh to a format suitable for THREE.js"""
+        """Distinct LOD ratios, coarsest first, dropping those under LOD_MIN_FACES faces; full resolution is always last"""
 
-        try:
+        levels = sorted({float(ratio) for ratio in ratios if 0 < ratio < 1 and ratio * face_count >= ThreeDProcessor.LOD_MIN_FACES})
 
-            # Ensure we have vertex normals
+        return levels + [1.0]
 
-            if not hasattr(mesh, 'vertex_normals'):
 
-                mesh.vertex_normals
 
+    @staticmethod
 
+    def lod_mesh(mesh: trimesh.Trimesh, ratio: float) -> trimesh.Trimesh:
 
-            # Convert to format suitable for THREE.js
+        """One pyramid level: the mesh decimated to ratio of its faces, or the mesh itself at 1.0"""
 
-            vertices = mesh.vertices.tolist()
+        if ratio >= 1.0:
 
-            faces = mesh.faces.tolist()
+            return mesh
 
-            normals = mesh.vertex_normals.tolist()
+        return ThreeDProcessor.decimate(mesh, max(int(round(ratio * len(mesh.faces))), 1))
 
 
 
-            # Scale to reasonable size if needed
+    @staticmethod
 
-            bounds = mesh.bounds
+    def _repair_components(vertices: np.ndarray, topology: MeshTopology,
 
-            size = np.max(bounds[1] - bounds[0])
+                           fix_normals: bool, fill_holes: bool) -> Tuple[np.ndarray, np.ndarray, Dict[str, float]]:
 
-            if size > 10 or size < 0.1:
+        """Orient and fill holes in one group of components; returns face flips, new faces and timings"""
 
-                scale = 1.0 / size
+        timings = {}
 
-                vertices = (np.array(vertices) * scale).tolist()
+        faces = topology.faces
 
+        flips = np.zeros(len(faces), dtype=bool)
 
+        if fix_normals:
 
-            return {
+            with _timed(timings, "fix_winding"):
 
-                "vertices": vertices,
+                flips = topology.winding_flips()
 
-                "faces": faces,
+            with _timed(timings, "fix_inversion"):
 
-                "normals": normals,
+                oriented = np.where(flips[:, None], faces[:, ::-1], faces)
 
-                "bounds": mesh.bounds.tolist(),
+                flips ^= topology.inversion_flips(vertices, oriented)
 
-                "center": mesh.center_mass.tolist()
+        new_faces = np.zeros((0, 3), dtype=np.int64)
 
-            }
+        if fill_holes:
 
-        except Exception as e:
+            with _timed(timings, "fill_holes"):
 
-            logger.error(f"Error converting mesh to dict: {str(e)}")
+                new_faces = topology.hole_faces(vertices, flips)
 
-            raise ValueError(f"Mesh conversion failed: {str(e)}")
+        return flips, new_faces, timings
 
 
 
@@ -186,185 +844,211 @@ class ThreeDProcessor:
 
                    fix_normals: bool = True,
 
-                   fill_holes: bool = True) -> Dict[str, Any]:
+                   fill_holes: bool = True,
+
+                   workers: int = 1) -> Dict[str, Any]:
+
+        """
+
+        Preprocess the mesh with detailed steps. Every cleanup pass runs once,
+
+        in dependency order: geometry cleanup first, then winding, inversion
+
+        and hole filling per connected component on topology computed once,
+
+        with groups of components spread over up to workers threads.
+
+        Seconds per step are returned in "timings".
 
-        """Preprocess the mesh with detailed steps"""
+        """
 
         try:
 
+            timings = {}
+
             # Make a copy of the original mesh
 
             processed_mesh = mesh.copy()
 
             steps = []
 
-            original_stats = {
+            with _timed(timings, "statistics"):
 
-                "vertices": len(processed_mesh.vertices),
+                original_stats = {
 
-                "faces": len(processed_mesh.faces),
+                    "vertices": len(processed_mesh.vertices),
 
-                "volume": float(processed_mesh.volume) if processed_mesh.is_watertight else None
+                    "faces": len(processed_mesh.faces),
 
-            }
+                    "volume": float(processed_mesh.volume) if processed_mesh.is_watertight else None
 
+                }
 
 
-            # Remove duplicate vertices and faces
 
-            if remove_duplicates:
+            # Geometry cleanup; welding comes first so the face checks see shared vertices
 
-                initial_vertices = len(processed_mesh.vertices)
+            with _timed(timings, "remove_infinite_values"):
 
-                initial_faces = len(processed_mesh.faces)
+                processed_mesh.remove_infinite_values()
 
-                
+            with _timed(timings, "merge_vertices"):
 
-                # Remove duplicate faces
+                processed_mesh.merge_vertices(merge_tex=True)
 
-                if len(processed_mesh.faces) > 0:
+            steps.append("Merged vertices")
 
-                    processed_mesh.remove_duplicate_faces()
+            
 
-                    steps.append(f"Removed duplicate faces")
+            with _timed(timings, "remove_degenerate_faces"):
 
-                
+                processed_mesh.update_faces(processed_mesh.nondegenerate_faces())
 
-                # Remove unreferenced vertices
+            steps.append("Removed degenerate faces")
 
-                processed_mesh.remove_unreferenced_vertices()
+            
 
-                steps.append("Removed unreferenced vertices")
+            if remove_duplicates and len(processed_mesh.faces) > 0:
 
-                
+                with _timed(timings, "remove_duplicate_faces"):
 
-                # Remove degenerate faces
+                    processed_mesh.update_faces(processed_mesh.unique_faces())
 
-                processed_mesh.remove_degenerate_faces()
+                steps.append("Removed duplicate faces")
 
-                steps.append("Removed degenerate faces")
+            
 
-                
+            with _timed(timings, "remove_unreferenced_vertices"):
 
-                vertices_reduced = initial_vertices - len(processed_mesh.vertices)
+                processed_mesh.remove_unreferenced_vertices()
 
-                faces_reduced = initial_faces - len(processed_mesh.faces)
+            steps.append("Removed unreferenced vertices")
 
-                if vertices_reduced > 0:
+            
 
-                    steps.append(f"Reduced {vertices_reduced} vertices")
+            vertices_reduced = original_stats["vertices"] - len(processed_mesh.vertices)
 
-                if faces_reduced > 0:
+            faces_reduced = original_stats["faces"] - len(processed_mesh.faces)
 
-                    steps.append(f"Reduced {faces_reduced} faces")
+            if vertices_reduced > 0:
 
+                steps.append(f"Reduced {vertices_reduced} vertices")
 
+            if faces_reduced > 0:
 
-            # Fix surface normals
+                steps.append(f"Reduced {faces_reduced} faces")
 
-            if fix_normals:
 
-                # Compute face normals
 
-                processed_mesh.fix_normals()
+            # Orientation and hole filling per connected component
 
-                steps.append("Fixed surface normals")
+            if (fix_normals or fill_holes) and len(processed_mesh.faces) > 0:
 
-                
+                vertices = processed_mesh.vertices.view(np.ndarray)
 
-                # Fix face winding order for watertight meshes
+                with _timed(timings, "topology"):
 
-                if processed_mesh.is_watertight:
+                    topology = MeshTopology(processed_mesh.faces.view(np.ndarray))
 
-                    # Use trimesh's built-in methods to ensure consistent winding
+                    groups = topology.split(workers)
 
-                    processed_mesh.fix_normals()
+                    jobs = [(index, topology.group(index) if len(groups) > 1 else topology) for index in groups]
 
-                    processed_mesh.vertex_normals  # This recomputes vertex normals
+                
 
-                    steps.append("Fixed face winding order")
+                def repair(job):
 
+                    return ThreeDProcessor._repair_components(vertices, job[1], fix_normals, fill_holes)
 
+                
 
-            # Fill holes if the mesh is not watertight
+                with _timed(timings, "repair_components"):
 
-            if fill_holes and not processed_mesh.is_watertight:
+                    if len(jobs) > 1:
 
-                try:
+                        with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
 
-                    # Try to make the mesh watertight
+                            results = list(executor.map(repair, jobs))
 
-                    initial_faces = len(processed_mesh.faces)
+                    else:
 
-                    processed_mesh = processed_mesh.fill_holes()
+                        results = [repair(jobs[0])]
 
-                    if len(processed_mesh.faces) > initial_faces:
+                
 
-                        steps.append(f"Filled holes (added {len(processed_mesh.faces) - initial_faces} faces)")
+                flips = np.zeros(len(topology.faces), dtype=bool)
 
-                except Exception as e:
+                added = []
 
-                    logger.warning(f"Could not fill holes: {str(e)}")
+                for (index, _), (group_flips, group_faces, group_timings) in zip(jobs, results):
 
-                    steps.append("Hole filling skipped")
+                    flips[index] = group_flips
 
+                    added.append(group_faces)
 
+                    for step, seconds in group_timings.items():
 
-            # Final cleanup and optimization
+                        timings[step] = timings.get(step, 0.0) + seconds
 
-            try:
+                added = np.concatenate(added)
 
-                # Remove any remaining degenerate geometry
+                steps.append(f"Repaired {topology.component_count} components in {len(jobs)} groups")
 
-                processed_mesh.remove_degenerate_faces()
+                
 
-                processed_mesh.remove_unreferenced_vertices()
+                if flips.any() or len(added):
 
-                processed_mesh.remove_infinite_values()
+                    faces = np.where(flips[:, None], topology.faces[:, ::-1], topology.faces)
 
-                
+                    # New faces take the last face colour, as trimesh's fill_holes does
 
-                # Merge close vertices
+                    colors = processed_mesh.visual.face_colors if processed_mesh.visual.kind == "face" else None
 
-                processed_mesh.merge_vertices(merge_tex=True)
+                    processed_mesh.faces = np.vstack((faces, added))
+
+                    if colors is not None and len(added):
 
-                steps.append("Performed final geometry cleanup")
+                        processed_mesh.visual.face_colors = np.vstack((colors, np.tile(colors[-1], (len(added), 1))))
 
+                
 
+                if fix_normals and flips.any():
 
-                # Ensure proper normals
+                    steps.append(f"Fixed face winding order ({int(flips.sum())} faces flipped)")
 
-                processed_mesh.fix_normals()
+                if len(added):
 
-                processed_mesh.vertex_normals
+                    steps.append(f"Filled holes (added {len(added)} faces)")
 
-                steps.append("Finalized surface normals")
 
 
+            if fix_normals:
 
-            except Exception as e:
+                with _timed(timings, "vertex_normals"):
 
-                logger.warning(f"Some cleanup steps skipped: {str(e)}")
+                    processed_mesh.vertex_normals
 
-                steps.append("Some cleanup steps skipped")
+                steps.append("Finalized surface normals")
 
 
 
             # Calculate final statistics
 
-            final_stats = {
+            with _timed(timings, "statistics"):
 
-                "vertices": len(processed_mesh.vertices),
+                final_stats = {
 
-                "faces": len(processed_mesh.faces),
+                    "vertices": len(processed_mesh.vertices),
 
-                "volume": float(processed_mesh.volume) if processed_mesh.is_watertight else None,
+                    "faces": len(processed_mesh.faces),
 
-                "is_watertight": processed_mesh.is_watertight,
+                    "volume": float(processed_mesh.volume) if processed_mesh.is_watertight else None,
 
-                "bounds": processed_mesh.bounds.tolist()
+                    "is_watertight": processed_mesh.is_watertight,
 
-            }
+                    "bounds": processed_mesh.bounds.tolist()
+
+                }
 
 
 
@@ -374,6 +1058,8 @@ class ThreeDProcessor:
 
                 "steps": steps,
 
+                "timings": {step: round(seconds, 4) for step, seconds in timings.items()},
+
                 "statistics": {
 
                     "original": original_stats,
@@ -406,6 +1092,88 @@ class ThreeDProcessor:
 
 
 
+    @staticmethod
+
+    def augmentation_matrices(scale, rotation, mirror=None, translation=None) -> np.ndarray:
+
+        """
+
+        (N, 4, 4) transforms from per-variant scale (N,), rotation in degrees
+
+        about X, Y and Z (N, 3), X mirroring (N,) and translation (N, 3),
+
+        applied in the order mirror, scale, rotate X, Y, Z, translate
+
+        """
+
+        scale = np.atleast_1d(np.asarray(scale, dtype=np.float64))
+
+        count = len(scale)
+
+        angles = np.radians(np.asarray(rotation, dtype=np.float64).reshape(count, 3))
+
+        cos, sin = np.cos(angles), np.sin(angles)
+
+        linear = np.broadcast_to(np.eye(3), (count, 3, 3)).copy()
+
+        for axis in range(3):
+
+            # Cyclic (i, j) gives the right-handed sign for every axis
+
+            i, j = (axis + 1) % 3, (axis + 2) % 3
+
+            rotation_axis = np.broadcast_to(np.eye(3), (count, 3, 3)).copy()
+
+            rotation_axis[:, i, i] = cos[:, axis]
+
+            rotation_axis[:, j, j] = cos[:, axis]
+
+            rotation_axis[:, i, j] = -sin[:, axis]
+
+            rotation_axis[:, j, i] = sin[:, axis]
+
+            linear = rotation_axis @ linear
+
+        linear *= scale[:, None, None]
+
+        if mirror is not None:
+
+            linear[:, :, 0] *= np.where(np.asarray(mirror, dtype=bool).reshape(count), -1.0, 1.0)[:, None]
+
+
+
+        matrices = np.broadcast_to(np.eye(4), (count, 4, 4)).copy()
+
+        matrices[:, :3, :3] = linear
+
+        if translation is not None:
+
+            matrices[:, :3, 3] = np.asarray(translation, dtype=np.float64).reshape(count, 3)
+
+        return matrices
+
+
+
+    @staticmethod
+
+    def transform_mesh(mesh: trimesh.Trimesh, matrix: np.ndarray) -> trimesh.Trimesh:
+
+        """Transformed copy of the vertices sharing the faces; mirroring transforms reverse the winding, as apply_transform does"""
+
+        faces = mesh.faces if np.linalg.det(matrix[:3, :3]) >= 0 else np.fliplr(mesh.faces)
+
+        return trimesh.Trimesh(
+
+            vertices=trimesh.transform_points(mesh.vertices, matrix),
+
+            faces=faces,
+
+            process=False
+
+        )
+
+
+
     @staticmethod
 
     def augment(mesh: trimesh.Trimesh, 
@@ -426,17 +1194,23 @@ class ThreeDProcessor:
 
             steps = []
 
+            scaled, rotated, mirrored = ThreeDProcessor.augmentation_matrices(
 
+                scale=[scale, 1.0, 1.0],
 
-            # Scale the mesh
+                rotation=[[0.0, 0.0, 0.0], [rotate_x, rotate_y, rotate_z], [0.0, 0.0, 0.0]],
+
+                mirror=[False, False, True]
+
+            )
 
-            if scale != 1.0:
 
-                scaled = mesh.copy()
 
-                scaled.apply_scale(scale)
+            # Scale the mesh
+
+            if scale != 1.0:
 
-                augmented_meshes["scaled"] = scaled
+                augmented_meshes["scaled"] = ThreeDProcessor.transform_mesh(mesh, scaled)
 
                 steps.append(f"Scaled by factor {scale}")
 
@@ -446,85 +1220,261 @@ class ThreeDProcessor:
 
             if any([rotate_x, rotate_y, rotate_z]):
 
-                rotated = mesh.copy()
+                augmented_meshes["rotated"] = ThreeDProcessor.transform_mesh(mesh, rotated)
+
+                steps.append(f"Rotated: X={rotate_x}°, Y={rotate_y}°, Z={rotate_z}°")
 
-                if rotate_x:
 
-                    matrix = trimesh.transformations.rotation_matrix(
 
-                        angle=np.radians(rotate_x), direction=[1, 0, 0])
+            # Mirror the mesh
 
-                    rotated.apply_transform(matrix)
+            augmented_meshes["mirrored"] = ThreeDProcessor.transform_mesh(mesh, mirrored)
 
-                if rotate_y:
+            steps.append("Mirrored along X-axis")
 
-                    matrix = trimesh.transformations.rotation_matrix(
 
-                        angle=np.radians(rotate_y), direction=[0, 1, 0])
 
-                    rotated.apply_transform(matrix)
+            # Create a simplified version
 
-                if rotate_z:
+            if len(mesh.faces) > 1000:
 
-                    matrix = trimesh.transformations.rotation_matrix(
+                target_faces = len(mesh.faces) // 2
 
-                        angle=np.radians(rotate_z), direction=[0, 0, 1])
+                simplified = ThreeDProcessor.decimate(mesh, target_faces)
 
-                    rotated.apply_transform(matrix)
+                augmented_meshes["simplified"] = simplified
 
-                augmented_meshes["rotated"] = rotated
+                steps.append(f"Simplified to {len(simplified.faces)} faces")
 
-                steps.append(f"Rotated: X={rotate_x}°, Y={rotate_y}°, Z={rotate_z}°")
 
 
+            return {
 
-            # Mirror the mesh
+                "augmented_meshes": augmented_meshes,
 
-            mirrored = mesh.copy()
+                "steps": steps
 
-            mirror_matrix = np.eye(4)
+            }
 
-            mirror_matrix[0, 0] = -1
 
-            mirrored.apply_transform(mirror_matrix)
 
-            augmented_meshes["mirrored"] = mirrored
+        except Exception as e:
 
-            steps.append("Mirrored along X-axis")
+            logger.error(f"Error augmenting mesh: {str(e)}")
 
+            raise ValueError(f"Augmentation failed: {str(e)}")
 
 
-            # Create a simplified version
 
-            if len(mesh.faces) > 1000:
+    @staticmethod
 
-                simplified = mesh.copy()
+    def random_augmentations(count: int, seed: Optional[int] = None,
 
-                target_faces = len(mesh.faces) // 2
+                             scale_range: Tuple[float, float] = (0.8, 1.2),
 
-                simplified = simplified.simplify_quadratic_decimation(target_faces)
+                             max_rotation: float = 180.0,
 
-                augmented_meshes["simplified"] = simplified
+                             max_translation: float = 0.0,
 
-                steps.append(f"Simplified to {target_faces} faces")
+                             mirror_probability: float = 0.0) -> Dict[str, np.ndarray]:
 
+        """Per-variant parameters for augmentation_matrices, drawn uniformly"""
 
+        rng = np.random.default_rng(seed)
 
-            return {
+        return {
 
-                "augmented_meshes": augmented_meshes,
+            "scale": rng.uniform(scale_range[0], scale_range[1], count),
 
-                "steps": steps
+            "rotation": rng.uniform(-max_rotation, max_rotation, (count, 3)),
+
+            "mirror": rng.random(count) < mirror_probability,
+
+            "translation": rng.uniform(-max_translation, max_translation, (count, 3))
+
+        }
+
+
+
+    @staticmethod
+
+    def augment_batch(mesh: trimesh.Trimesh, params: Dict[str, np.ndarray],
+
+                      normals: bool = True) -> Dict[str, Any]:
+
+        """
+
+        Apply N augmentations to the shared vertex array in one batched
+
+        matmul. Returns float32 positions (N, V, 3) and optionally normals,
+
+        the faces shared by every variant, the matrices and which variants
+
+        are mirrored; those need the winding reversed.
+
+        """
+
+        try:
+
+            matrices = ThreeDProcessor.augmentation_matrices(**params)
+
+            linear = matrices[:, :3, :3].astype(np.float32)
+
+            positions = np.matmul(np.asarray(mesh.vertices, dtype=np.float32), linear.transpose(0, 2, 1))
+
+            positions += matrices[:, None, :3, 3].astype(np.float32)
+
+            batch = {
+
+                "positions": positions,
+
+                "faces": mesh.faces,
+
+                "matrices": matrices,
+
+                "flipped": np.linalg.det(matrices[:, :3, :3]) < 0,
+
+                # Affine maps carry the centre of mass along
+
+                "centers": matrices[:, :3, :3] @ mesh.center_mass + matrices[:, :3, 3],
+
+                "params": params
 
             }
 
+            if normals:
+
+                # Rotation, mirroring and uniform scale map normals by the linear part divided by the scale
+
+                unit = linear / np.asarray(params["scale"], dtype=np.float32)[:, None, None]
 
+                batch["normals"] = np.matmul(np.asarray(mesh.vertex_normals, dtype=np.float32), unit.transpose(0, 2, 1))
+
+            return batch
 
         except Exception as e:
 
-            logger.error(f"Error augmenting mesh: {str(e)}")
+            logger.error(f"Error augmenting mesh batch: {str(e)}")
 
-            raise ValueError(f"Augmentation failed: {str(e)}")
+            raise ValueError(f"Batch augmentation failed: {str(e)}")
+
+
+
+    @staticmethod
+
+    def batch_to_npz(batch: Dict[str, Any]) -> bytes:
+
+        """Compressed NumPy archive of the stacked variants, the shared faces and the parameters"""
+
+        arrays = {
+
+            "positions": batch["positions"],
+
+            "faces": batch["faces"].astype(np.uint32 if batch["positions"].shape[1] < 2 ** 32 else np.int64),
+
+            "matrices": batch["matrices"],
+
+            "flipped": batch["flipped"]
+
+        }
+
+        if "normals" in batch:
+
+            arrays["normals"] = batch["normals"]
+
+        arrays.update({key: np.asarray(value) for key, value in batch["params"].items()})
+
+        buffer = io.BytesIO()
+
+        np.savez_compressed(buffer, **arrays)
+
+        return buffer.getvalue()
+
+
+
+    @staticmethod
+
+    def batch_to_binary(batch: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None) -> bytes:
+
+        """
+
+        mesh_to_binary container with one entry per variant. Positions are
+
+        not rescaled for the viewer, and every entry points at one shared
+
+        index buffer (a second, reversed one for mirrored variants).
+
+        """
+
+        try:
+
+            header = {"version": MESH_BINARY_VERSION, "meshes": [], "metadata": metadata or {}}
+
+            faces = batch["faces"]
+
+            index_buffers = [np.ascontiguousarray(faces, dtype='<u4').tobytes()]
+
+            if batch["flipped"].any():
+
+                index_buffers.append(np.ascontiguousarray(np.fliplr(faces), dtype='<u4').tobytes())
+
+            indices = []
+
+            offset = 0
+
+            for buffer in index_buffers:
+
+                indices.append({"offset": offset, "length": len(buffer)})
+
+                offset += len(buffer)
+
+            buffers = list(index_buffers)
+
+
+
+            lower, upper = batch["positions"].min(axis=1), batch["positions"].max(axis=1)
+
+            for number, positions in enumerate(batch["positions"]):
+
+                entry = {
+
+                    "name": f"variant_{number}",
+
+                    "vertex_count": len(positions),
+
+                    "face_count": len(faces),
+
+                    "scale": 1.0,
+
+                    "bounds": [lower[number].tolist(), upper[number].tolist()],
+
+                    "center": batch["centers"][number].tolist(),
+
+                    "index": indices[int(batch["flipped"][number])]
+
+                }
+
+                for key, data in (("position", positions), ("normal", batch["normals"][number])):
+
+                    buffer = np.ascontiguousarray(data, dtype='<f4').tobytes()
+
+                    entry[key] = {"offset": offset, "length": len(buffer)}
+
+                    buffers.append(buffer)
+
+                    offset += len(buffer)
+
+                header["meshes"].append(entry)
+
+
+
+            return ThreeDProcessor._binary_container(header, buffers)
+
+        except Exception as e:
+
+            logger.error(f"Error converting mesh batch to binary: {str(e)}")
+
+            raise ValueError(f"Mesh batch conversion failed: {str(e)}")
 
 
 
@@ -0,0 +1,106 @@
+import io
+import json
+import struct
+import numpy as np
+import pytest
+import trimesh
+from app.processors.threed_processor import MESH_BINARY_MAGIC, ThreeDProcessor
+
+@pytest.fixture(scope="module")
+def mesh():
+    # Off-centre so translation and the centre of mass are exercised
+    return trimesh.creation.icosphere(subdivisions=2).apply_translation([0.3, -0.2, 0.5])
+
+def _params(seed: int, count: int = 8):
+    return ThreeDProcessor.random_augmentations(
+        count, seed=seed, max_translation=2.0, mirror_probability=0.5
+    )
+
+def _sequential(scale, rotation, mirror, translation) -> np.ndarray:
+    """The same transform built step by step from trimesh's matrices"""
+    matrix = np.eye(4)
+    if mirror:
+        matrix = trimesh.transformations.reflection_matrix([0, 0, 0], [1, 0, 0]) @ matrix
+    matrix = trimesh.transformations.scale_matrix(scale) @ matrix
+    for angle, axis in zip(rotation, np.eye(3)):
+        matrix = trimesh.transformations.rotation_matrix(np.radians(angle), axis) @ matrix
+    return trimesh.transformations.translation_matrix(translation) @ matrix
+
+def test_fixed_seed_is_deterministic():
+    first, second = _params(7), _params(7)
+    for key in first:
+        assert np.array_equal(first[key], second[key])
+    assert np.array_equal(
+        ThreeDProcessor.augmentation_matrices(**first),
+        ThreeDProcessor.augmentation_matrices(**second)
+    )
+    other = _params(8)
+    assert not np.array_equal(first["rotation"], other["rotation"])
+
+def test_matrices_match_sequential_transforms():
+    params = _params(1)
+    matrices = ThreeDProcessor.augmentation_matrices(**params)
+    assert matrices.shape == (8, 4, 4)
+    for number, matrix in enumerate(matrices):
+        expected = _sequential(*(params[key][number] for key in ("scale", "rotation", "mirror", "translation")))
+        assert np.allclose(matrix, expected, atol=1e-12)
+
+def test_mirrored_variants_are_flipped(mesh):
+    params = _params(2)
+    assert params["mirror"].any() and not params["mirror"].all()
+    batch = ThreeDProcessor.augment_batch(mesh, params)
+    assert np.array_equal(batch["flipped"], params["mirror"])
+
+def test_batch_matches_per_variant_transform(mesh):
+    params = _params(3)
+    batch = ThreeDProcessor.augment_batch(mesh, params)
+    assert batch["positions"].shape == (8, len(mesh.vertices), 3)
+    assert batch["positions"].dtype == np.float32
+    for number, matrix in enumerate(batch["matrices"]):
+        assert np.allclose(batch["positions"][number], trimesh.transform_points(mesh.vertices, matrix), atol=1e-4)
+        assert np.allclose(batch["centers"][number], trimesh.transform_points([mesh.center_mass], matrix)[0])
+
+def test_batch_normals_match_transformed_mesh(mesh):
+    params = _params(4)
+    batch = ThreeDProcessor.augment_batch(mesh, params)
+    for number, matrix in enumerate(batch["matrices"]):
+        transformed = ThreeDProcessor.transform_mesh(mesh, matrix)
+        assert np.allclose(batch["normals"][number], transformed.vertex_normals, atol=1e-4)
+    assert "normals" not in ThreeDProcessor.augment_batch(mesh, params, normals=False)
+
+def test_transform_mesh_keeps_mirrored_mesh_outward(mesh):
+    mirrored = ThreeDProcessor.augmentation_matrices([1.0], [[0.0, 0.0, 0.0]], mirror=[True])[0]
+    transformed = ThreeDProcessor.transform_mesh(mesh, mirrored)
+    assert np.array_equal(transformed.faces, mesh.faces[:, ::-1])
+    assert transformed.is_winding_consistent
+    assert transformed.volume == pytest.approx(mesh.volume)
+
+def test_npz_round_trip(mesh):
+    params = _params(5)
+    batch = ThreeDProcessor.augment_batch(mesh, params)
+    archive = np.load(io.BytesIO(ThreeDProcessor.batch_to_npz(batch)))
+    assert np.array_equal(archive["positions"], batch["positions"])
+    assert np.array_equal(archive["normals"], batch["normals"])
+    assert np.array_equal(archive["faces"], mesh.faces)
+    assert np.array_equal(archive["flipped"], batch["flipped"])
+    assert np.array_equal(archive["scale"], params["scale"])
+
+def test_binary_shares_index_buffers(mesh):
+    batch = ThreeDProcessor.augment_batch(mesh, _params(2))
+    content = ThreeDProcessor.batch_to_binary(batch, {"seed": 2})
+    assert content[:4] == MESH_BINARY_MAGIC
+    _, header_length = struct.unpack('<II', content[4:12])
+    header = json.loads(content[12:12 + header_length])
+    body = content[12 + header_length:]
+    assert header["metadata"] == {"seed": 2}
+    assert len(header["meshes"]) == 8
+
+    def read(view, dtype):
+        return np.frombuffer(body[view["offset"]:view["offset"] + view["length"]], dtype=dtype)
+    # One index buffer for upright variants and one reversed buffer for mirrored ones
+    assert len({json.dumps(entry["index"], sort_keys=True) for entry in header["meshes"]}) == 2
+    for number, entry in enumerate(header["meshes"]):
+        faces = read(entry["index"], '<u4').reshape(-1, 3)
+        expected = mesh.faces[:, ::-1] if batch["flipped"][number] else mesh.faces
+        assert np.array_equal(faces, expected)
+        assert np.array_equal(read(entry["position"], '<f4').reshape(-1, 3), batch["positions"][number])
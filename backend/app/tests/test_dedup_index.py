@@ -0,0 +1,35 @@
+import pytest
+from app.utils.dedup_index import DedupIndex
+
+TOKENS = "the quick brown fox jumps over the lazy dog while the cat sleeps in the sun".split()
+
+@pytest.fixture
+def index():
+    return DedupIndex(None, num_perm=64, bands=16, shingle_size=3, threshold=0.8)
+
+def test_check_without_add_leaves_index_empty(index):
+    assert index.check("a.txt", TOKENS, add=False) is None
+    assert index.stats()["documents"] == 0
+    assert index.check("b.txt", TOKENS) is None
+
+def test_exact_and_near_duplicates(index):
+    index.check("a.txt", TOKENS)
+    assert index.check("b.txt", TOKENS) == {"id": "a.txt", "kind": "exact", "similarity": 1.0}
+    near = index.check("c.txt", TOKENS + ["today"], add=False)
+    assert near["id"] == "a.txt" and near["kind"] == "near"
+
+def test_exclude_self(index):
+    index.check("a.txt", TOKENS)
+    assert index.check("a.txt", TOKENS, exclude_self=True) is None
+    assert index.check("a.txt", TOKENS + ["today"], add=False, exclude_self=True) is None
+    assert index.check("b.txt", TOKENS, exclude_self=True)["id"] == "a.txt"
+    # Re-adding the same document under the same id stores it once
+    assert index.stats()["documents"] == 1
+
+def test_add_after_check_fingerprint(index):
+    fingerprint = index.fingerprint(TOKENS)
+    assert index.check_fingerprint("a.txt", fingerprint, add=False) is None
+    index.add("a.txt", fingerprint)
+    index.add("a.txt", fingerprint)
+    assert index.stats()["documents"] == 1
+    assert index.check_fingerprint("b.txt", fingerprint, add=False)["id"] == "a.txt"
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from app.core.executor import WorkerPool
+
+def test_cancelled_request_keeps_its_slot_until_the_job_ends():
+    pool = WorkerPool("test", thread_workers=1, process_workers=0, queue_size=0)
+    started, release = threading.Event(), threading.Event()
+
+    def job():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    async def scenario():
+        task = asyncio.ensure_future(pool.run(job))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The job is still running, so the pool is still full
+        with pytest.raises(HTTPException) as raised:
+            await pool.run(job)
+        assert raised.value.status_code == 503
+        release.set()
+        for _ in range(100):
+            if pool.threads.stats()["pending"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        return await pool.run(lambda: "next")
+
+    try:
+        assert asyncio.run(scenario()) == "next"
+    finally:
+        release.set()
+        pool.shutdown()
+
+def test_job_errors_release_the_slot():
+    pool = WorkerPool("test", thread_workers=1, process_workers=0, queue_size=0)
+
+    def fail():
+        raise ValueError("bad input")
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await pool.run(fail)
+        return await pool.run(lambda: "next")
+
+    try:
+        assert asyncio.run(scenario()) == "next"
+        assert pool.threads.stats()["pending"] == 0
+    finally:
+        pool.shutdown()
@@ -0,0 +1,45 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.core.config import settings
+from app.utils.file_handler import FileHandler
+
+class ChunkedUpload:
+    """UploadFile stand-in serving chunks, then raising error instead of ending"""
+
+    def __init__(self, chunks, error=None):
+        self.filename = "upload.bin"
+        self.content_type = "application/octet-stream"
+        self._chunks = list(chunks)
+        self._error = error
+
+    async def read(self, size=-1):
+        if self._chunks:
+            return self._chunks.pop(0)
+        if self._error is not None:
+            raise self._error
+        return b""
+
+@pytest.fixture(autouse=True)
+def small_spool(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_TEMP_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "UPLOAD_SPOOL_THRESHOLD", 8)
+
+def test_large_upload_is_spooled_and_removed_on_close(tmp_path):
+    upload = asyncio.run(FileHandler.ingest_upload(ChunkedUpload([b"0123456789"] * 3)))
+    assert upload.size == 30 and len(list(tmp_path.iterdir())) == 1
+    with upload:
+        assert upload.read() == b"0123456789" * 3
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.parametrize("error", [asyncio.CancelledError(), HTTPException(status_code=400)])
+def test_interrupted_upload_leaves_no_spool(tmp_path, error):
+    with pytest.raises(type(error)):
+        asyncio.run(FileHandler.ingest_upload(ChunkedUpload([b"0123456789"] * 2, error)))
+    assert list(tmp_path.iterdir()) == []
+
+def test_size_limit_removes_spool(tmp_path):
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(FileHandler.ingest_upload(ChunkedUpload([b"0123456789"] * 3), max_size=25))
+    assert raised.value.status_code == 413
+    assert list(tmp_path.iterdir()) == []
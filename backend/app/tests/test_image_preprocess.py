@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageEnhance, ImageFilter
+from app.processors.image_processor import ImageProcessor
+
+def pillow_preprocess(image, resize=None, grayscale=False, normalize=False):
+    """
+    The Pillow enhance chain preprocess ran before it was fused. Its
+    normalize computed (x - min) * 255 in uint8, which wrapped; this one
+    does the same arithmetic without wrapping.
+    """
+    image = image.copy()
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image = image.filter(ImageFilter.MedianFilter(size=3))
+    image = ImageEnhance.Sharpness(image).enhance(1.5)
+    image = ImageEnhance.Contrast(image).enhance(1.2)
+    if grayscale:
+        image = image.convert('L').convert('RGB')
+    if normalize:
+        pixels = np.array(image)
+        for channel in range(3):
+            channel_data = pixels[:, :, channel].astype(np.int64)
+            min_val, max_val = channel_data.min(), channel_data.max()
+            if max_val > min_val:
+                pixels[:, :, channel] = (channel_data - min_val) * 255 // (max_val - min_val)
+        image = Image.fromarray(pixels)
+    if resize and all(resize):
+        image = image.resize(resize, Image.Resampling.LANCZOS)
+    image = ImageEnhance.Color(image).enhance(1.2)
+    return ImageEnhance.Brightness(image).enhance(1.1)
+
+def _noise(seed: int, size=(96, 64)) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8))
+
+def _gradient(size=(80, 120)) -> Image.Image:
+    x = np.linspace(0, 255, size[0], dtype=np.float32)
+    y = np.linspace(0, 255, size[1], dtype=np.float32)[:, None]
+    pixels = np.stack(np.broadcast_arrays(x + 0 * y, y + 0 * x, (x + y) / 2), axis=-1)
+    return Image.fromarray(pixels.astype(np.uint8))
+
+IMAGES = {
+    "noise": _noise(0),
+    "noise_palette": _noise(1).convert('P'),
+    "noise_gray": _noise(2).convert('L'),
+    "noise_rgba": _noise(3).convert('RGBA'),
+    "gradient": _gradient(),
+    "dark": Image.fromarray((np.asarray(_noise(4)) // 8).astype(np.uint8)),
+    "flat": Image.new('RGB', (32, 32), (200, 30, 90)),
+}
+
+def _max_difference(image, **options) -> int:
+    expected = np.asarray(pillow_preprocess(image, **options), dtype=np.int16)
+    actual = np.asarray(ImageProcessor.preprocess(image, **options)["processed_image"], dtype=np.int16)
+    assert actual.shape == expected.shape
+    return int(np.abs(actual - expected).max())
+
+@pytest.mark.parametrize("name", IMAGES)
+@pytest.mark.parametrize("grayscale", [False, True])
+@pytest.mark.parametrize("resize", [None, (150, 130)])
+def test_fused_preprocess_matches_pillow_chain(name, grayscale, resize):
+    # The float32 steps mirror Image.blend, so this is exact in practice
+    assert _max_difference(IMAGES[name], resize=resize, grayscale=grayscale) <= 1
+
+@pytest.mark.parametrize("name", IMAGES)
+@pytest.mark.parametrize("grayscale", [False, True])
+@pytest.mark.parametrize("resize", [None, (150, 130)])
+def test_normalize_matches_unwrapped_chain(name, grayscale, resize):
+    assert _max_difference(IMAGES[name], resize=resize, grayscale=grayscale, normalize=True) <= 1
+
+def test_strips_cover_the_image(monkeypatch):
+    # Strips of a few rows, including a short last one
+    monkeypatch.setattr(ImageProcessor, "PIXEL_BLOCK", 96 * 5)
+    assert _max_difference(IMAGES["noise"], normalize=True) == 0
+
+def test_normalize_stretches_each_channel():
+    result = ImageProcessor.preprocess(IMAGES["dark"], normalize=True)
+    assert "Normalized pixel values" in result["steps"]
+    # Color and brightness run after normalization, so the range is close to full
+    pixels = np.asarray(result["processed_image"])
+    assert pixels.min() <= 10 and pixels.max() == 255
@@ -0,0 +1,146 @@
+import numpy as np
+import pytest
+import trimesh
+from app.processors import mesh_analytics
+from app.processors.mesh_analytics import MeshIndex, MeshIndexCache, closest_on_triangles, mesh_metrics
+
+@pytest.fixture(scope="module")
+def sphere():
+    return trimesh.creation.icosphere(subdivisions=3)
+
+@pytest.fixture(scope="module")
+def index(sphere):
+    return MeshIndex(sphere.vertices, sphere.faces)
+
+def _brute_closest(mesh: trimesh.Trimesh, points: np.ndarray) -> np.ndarray:
+    triangles = mesh.triangles
+    distances = []
+    for point in points:
+        repeated = np.repeat(point[None], len(triangles), axis=0)
+        closest = closest_on_triangles(repeated, triangles[:, 0], triangles[:, 1], triangles[:, 2])
+        distances.append(np.linalg.norm(closest - point, axis=1).min())
+    return np.array(distances)
+
+def _brute_ray(mesh: trimesh.Trimesh, origin: np.ndarray, direction: np.ndarray) -> float:
+    """Distance to the nearest triangle along a unit direction (Moller-Trumbore over every face), inf on a miss"""
+    a, b, c = mesh.triangles[:, 0], mesh.triangles[:, 1], mesh.triangles[:, 2]
+    e1, e2 = b - a, c - a
+    p = np.cross(direction, e2)
+    det = np.einsum('ij,ij->i', e1, p)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inverse = 1.0 / det
+        s = origin - a
+        u = np.einsum('ij,ij->i', s, p) * inverse
+        q = np.cross(s, e1)
+        v = (q @ direction) * inverse
+        t = np.einsum('ij,ij->i', e2, q) * inverse
+        hit = (np.abs(det) > 1e-12) & (u >= 0) & (v >= 0) & (u + v <= 1) & (t >= 0)
+    return t[hit].min() if hit.any() else np.inf
+
+def test_closest_on_triangles_regions():
+    a, b, c = np.array([[0.0, 0, 0]]), np.array([[1.0, 0, 0]]), np.array([[0.0, 1, 0]])
+    cases = {
+        (0.2, 0.2, 5.0): (0.2, 0.2, 0.0),  # face interior
+        (-1.0, -1.0, 0.0): (0.0, 0.0, 0.0),  # vertex a
+        (2.0, -0.5, 1.0): (1.0, 0.0, 0.0),  # vertex b
+        (0.5, -2.0, 0.0): (0.5, 0.0, 0.0),  # edge ab
+        (1.0, 1.0, 0.0): (0.5, 0.5, 0.0),  # edge bc
+    }
+    for point, expected in cases.items():
+        result = closest_on_triangles(np.array([point]), a, b, c)
+        assert np.allclose(result, [expected])
+
+def test_closest_points_match_brute_force(sphere, index):
+    rng = np.random.default_rng(0)
+    # Near the surface, inside, and far away
+    directions = rng.normal(size=(60, 3))
+    directions /= np.linalg.norm(directions, axis=1)[:, None]
+    points = directions * rng.choice([0.2, 0.95, 1.05, 5.0], size=60)[:, None]
+    result = index.closest_points(points)
+    assert np.allclose(result["distances"], _brute_closest(sphere, points), atol=1e-12)
+    # The reported point lies on the reported face
+    assert np.allclose(np.linalg.norm(result["points"] - points, axis=1), result["distances"])
+    on_face = closest_on_triangles(result["points"], *(sphere.triangles[result["faces"]].transpose(1, 0, 2)))
+    assert np.allclose(on_face, result["points"], atol=1e-9)
+
+def test_ray_cast_matches_brute_force(sphere, index):
+    rng = np.random.default_rng(1)
+    origins = rng.uniform(-2, 2, size=(50, 3))
+    directions = rng.normal(size=(50, 3))
+    directions /= np.linalg.norm(directions, axis=1)[:, None]
+    result = index.ray_cast(origins, directions)
+    expected = np.array([_brute_ray(sphere, o, d) for o, d in zip(origins, directions)])
+    assert np.array_equal(result["hit"], np.isfinite(expected))
+    assert np.allclose(result["distances"][result["hit"]], expected[np.isfinite(expected)])
+    assert np.isnan(result["distances"][~result["hit"]]).all()
+
+def test_ray_cast_axis_aligned_rays_on_box_faces():
+    box = trimesh.creation.box()
+    index = MeshIndex(box.vertices, box.faces)
+    # Rays with zero direction components; the third starts on the y = 0.5 plane
+    # that bounds the tree's nodes and hits the top edge of the -x face
+    origins = np.array([[-2.0, 0.0, 0.0], [0.0, 0.0, 2.0], [-2.0, 0.5, 0.1], [0.0, 0.0, 0.0]])
+    directions = np.array([[1.0, 0, 0], [0, 0, -1.0], [1.0, 0, 0], [0, 1.0, 0]])
+    result = index.ray_cast(origins, directions)
+    assert result["hit"].all()
+    assert np.allclose(result["distances"], [1.5, 1.5, 1.5, 0.5])
+
+def test_ray_cast_shared_origin_and_zero_direction(index):
+    result = index.ray_cast([0, 0, 0], [[1, 0, 0], [0, -1, 0], [0, 0, 3]])
+    assert result["hit"].all()
+    assert np.allclose(np.linalg.norm(result["locations"], axis=1), result["distances"])
+    with pytest.raises(ValueError):
+        index.ray_cast([0, 0, 0], [[0, 0, 0]])
+
+def test_contains_and_signed_distance_match_sphere(index):
+    rng = np.random.default_rng(2)
+    directions = rng.normal(size=(200, 3))
+    directions /= np.linalg.norm(directions, axis=1)[:, None]
+    radii = rng.choice([0.0, 0.5, 0.9, 1.1, 3.0], size=200)
+    points = directions * radii[:, None]
+    # The icosphere lies between radius 0.98 and 1
+    assert np.array_equal(index.contains(points), radii < 1)
+    distance = index.distance(points)
+    assert distance["signed"]
+    assert np.array_equal(distance["distances"] > 0, radii < 1)
+    assert np.allclose(np.abs(distance["distances"]), np.abs(1 - radii), atol=0.02)
+
+def test_sample_is_seeded_and_on_surface(index):
+    first, second = index.sample(500, seed=3), index.sample(500, seed=3)
+    assert np.array_equal(first["points"], second["points"])
+    assert np.allclose(index.closest_points(first["points"])["distances"], 0, atol=1e-12)
+    # Face normals of a sphere point away from the centre
+    assert (np.einsum('ij,ij->i', first["points"], first["normals"]) > 0).all()
+
+def test_metrics_match_trimesh(sphere):
+    metrics = mesh_metrics(sphere.vertices, sphere.faces)
+    assert metrics["is_watertight"] and metrics["is_winding_consistent"]
+    assert metrics["area"] == pytest.approx(sphere.area)
+    assert metrics["volume"] == pytest.approx(sphere.volume)
+    assert np.allclose(metrics["center_mass"], sphere.center_mass, atol=1e-12)
+    assert metrics["euler_number"] == sphere.euler_number == 2
+    open_mesh = mesh_metrics(sphere.vertices, np.vstack([sphere.faces[1:], sphere.faces[2:3]]))
+    assert not open_mesh["is_watertight"]
+    assert open_mesh["duplicate_faces"] == 1
+
+def test_cache_builds_once_and_evicts(sphere):
+    built = []
+
+    def build():
+        built.append(1)
+        return MeshIndex(sphere.vertices, sphere.faces)
+    size = build().nbytes
+    cache = MeshIndexCache(memory_budget=int(size * 1.5))
+    first = cache.get_or_build("a", build)
+    assert cache.get_or_build("a", build) is first
+    cache.get_or_build("b", build)
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["builds"] == 2 and stats["evictions"] == 1 and stats["entries"] == 1
+    assert len(built) == 3
+
+def test_small_query_blocks_give_same_result(sphere, index, monkeypatch):
+    points = np.random.default_rng(4).uniform(-1.5, 1.5, size=(40, 3))
+    expected = index.closest_points(points)["distances"]
+    monkeypatch.setattr(mesh_analytics, "QUERY_BLOCK", 7)
+    assert np.array_equal(index.closest_points(points)["distances"], expected)
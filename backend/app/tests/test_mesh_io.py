@@ -0,0 +1,86 @@
+import io
+import numpy as np
+import pytest
+import trimesh
+from app.processors import mesh_io
+from app.processors.mesh_io import load_arrays, weld
+
+@pytest.fixture(scope="module")
+def sphere():
+    return trimesh.creation.icosphere(subdivisions=3)
+
+def _export(mesh: trimesh.Trimesh, file_type: str, **options) -> bytes:
+    return mesh.export(file_type=file_type, **options)
+
+def _assert_same_mesh(arrays, reference: trimesh.Trimesh):
+    assert len(arrays.vertices) == len(reference.vertices)
+    assert len(arrays.faces) == len(reference.faces)
+    # Same triangles, compared as sorted corner coordinates
+    ours = np.sort(arrays.vertices[arrays.faces].reshape(len(arrays.faces), -1), axis=0)
+    theirs = np.sort(reference.vertices[reference.faces].reshape(len(reference.faces), -1), axis=0)
+    assert np.allclose(ours, theirs, atol=1e-6)
+
+@pytest.mark.parametrize("file_type", ["stl", "ply"])
+def test_binary_load_matches_trimesh(sphere, file_type):
+    content = _export(sphere, file_type)
+    reference = trimesh.load(io.BytesIO(content), file_type=file_type)
+    arrays = load_arrays(content, file_type)
+    assert arrays is not None
+    assert len(arrays.vertices) == len(sphere.vertices) == 642
+    _assert_same_mesh(arrays, reference)
+    assert arrays.to_trimesh().is_watertight
+
+@pytest.mark.parametrize("file_type", ["stl", "ply"])
+def test_memory_mapped_file_matches_bytes(sphere, file_type, tmp_path):
+    content = _export(sphere, file_type)
+    path = tmp_path / f"sphere.{file_type}"
+    path.write_bytes(content)
+    from_bytes = load_arrays(content, file_type)
+    with open(path, "rb") as f:
+        from_file = load_arrays(f, file_type)
+    assert np.array_equal(from_file.vertices, from_bytes.vertices)
+    assert np.array_equal(from_file.faces, from_bytes.faces)
+
+def test_stl_weld_keeps_first_occurrence_order(sphere):
+    arrays = load_arrays(_export(sphere, "stl"), "stl")
+    reference = trimesh.load(io.BytesIO(_export(sphere, "stl")), file_type="stl")
+    assert np.allclose(arrays.vertices, reference.vertices)
+    assert np.array_equal(arrays.faces, reference.faces)
+
+@pytest.mark.parametrize("file_type, options", [
+    ("stl", {"file_type": "stl_ascii"}),
+    ("ply", {"encoding": "ascii"}),
+    ("obj", {}),
+])
+def test_other_encodings_fall_back(sphere, file_type, options):
+    content = sphere.export(**{"file_type": file_type, **options})
+    assert load_arrays(content, file_type) is None
+
+def test_weld_merges_within_tolerance_and_not_sign_flips():
+    corners = np.array([
+        [1.0, 2.0, 3.0],
+        [-1.0, 2.0, 3.0],
+        [1.0 + 1e-12, 2.0, 3.0],
+        [1.0, -2.0, -3.0],
+        [-1.0, 2.0, 3.0],
+        [0.0, 0.0, 0.0],
+    ])
+    vertices, inverse = weld(corners, digits=8)
+    assert inverse.tolist() == [0, 1, 0, 2, 1, 3]
+    assert np.array_equal(vertices, corners[[0, 1, 3, 5]])
+
+def test_weld_hash_collision_falls_back_to_exact_rows(monkeypatch):
+    # Every row hashes alike, so only the verification keeps them apart
+    monkeypatch.setattr(mesh_io, "_hash_rows", lambda quantized: np.zeros(len(quantized), dtype=np.uint64))
+    corners = np.array([[0.0, 0.0, 1.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]])
+    vertices, inverse = weld(corners, digits=8)
+    assert inverse.tolist() == [0, 1, 0]
+    assert np.array_equal(vertices, corners[:2])
+
+def test_ply_faces_out_of_range_are_rejected(sphere):
+    broken = trimesh.Trimesh(sphere.vertices[:10], sphere.faces[:5] % 10, process=False)
+    content = bytearray(_export(broken, "ply"))
+    # The last index of the last face points past the vertex list
+    content[-4:] = np.array([1000], dtype="<i4").tobytes()
+    with pytest.raises(ValueError):
+        load_arrays(bytes(content), "ply")
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+import trimesh
+from app.processors.threed_processor import MeshTopology, ThreeDProcessor
+
+def _damaged_sphere(seed: int = 0, removed=(0,), center=(0.0, 0.0, 0.0)) -> trimesh.Trimesh:
+    """Icosphere with a random third of its faces flipped and the given faces removed"""
+    sphere = trimesh.creation.icosphere(subdivisions=2)
+    rng = np.random.default_rng(seed)
+    faces = sphere.faces.copy()
+    flipped = rng.random(len(faces)) < 0.33
+    faces[flipped] = faces[flipped][:, ::-1]
+    faces = np.delete(faces, list(removed), axis=0)
+    return trimesh.Trimesh(sphere.vertices + center, faces, process=False)
+
+def _quad_hole(mesh: trimesh.Trimesh):
+    """Two faces sharing an edge, whose removal leaves a four-edge hole"""
+    first = 0
+    second = next(
+        index for index, face in enumerate(mesh.faces[1:], start=1)
+        if len(set(face) & set(mesh.faces[first])) == 2
+    )
+    return first, second
+
+def test_consistent_mesh_needs_no_flips():
+    topology = MeshTopology(trimesh.creation.icosphere(subdivisions=2).faces)
+    assert topology.component_count == 1
+    assert not topology.winding_flips().any()
+    assert len(topology.boundary) == 0
+
+@pytest.mark.parametrize("seed", range(3))
+def test_flipped_faces_and_triangle_hole_are_repaired(seed):
+    mesh = _damaged_sphere(seed)
+    assert not mesh.is_watertight and not mesh.is_winding_consistent
+    result = ThreeDProcessor.preprocess(mesh)
+    repaired = result["processed_mesh"]
+    assert repaired.is_watertight
+    assert repaired.is_winding_consistent
+    assert repaired.volume > 0
+    assert len(repaired.faces) == 320
+    assert any(step.startswith("Fixed face winding order") for step in result["steps"])
+
+def test_clean_mesh_reports_no_repairs():
+    steps = ThreeDProcessor.preprocess(trimesh.creation.icosphere(subdivisions=2))["steps"]
+    assert steps[0] == "Merged vertices"
+    assert not any(step.startswith(("Fixed", "Filled")) for step in steps)
+
+def test_quad_hole_is_filled():
+    sphere = trimesh.creation.icosphere(subdivisions=2)
+    repaired = ThreeDProcessor.preprocess(_damaged_sphere(1, removed=_quad_hole(sphere)))["processed_mesh"]
+    assert repaired.is_watertight and repaired.is_winding_consistent
+    assert len(repaired.faces) == 320
+
+def test_inverted_component_is_turned_outward():
+    inside_out = trimesh.creation.icosphere(subdivisions=2)
+    inside_out.faces = inside_out.faces[:, ::-1]
+    assert inside_out.volume < 0
+    repaired = ThreeDProcessor.preprocess(inside_out)["processed_mesh"]
+    assert repaired.volume > 0
+
+@pytest.mark.parametrize("workers", [1, 2, 4])
+def test_components_repaired_in_groups(workers):
+    parts = [_damaged_sphere(seed, center=(3.0 * seed, 0.0, 0.0)) for seed in range(4)]
+    mesh = trimesh.util.concatenate(parts)
+    topology = MeshTopology(mesh.faces)
+    assert topology.component_count == 4
+    groups = topology.split(workers)
+    assert len(groups) == min(workers, 4)
+    # Groups hold whole components and cover every face once
+    assert sorted(np.concatenate(groups).tolist()) == list(range(len(mesh.faces)))
+    for group in groups:
+        labels = set(topology.labels[group].tolist())
+        assert all((topology.labels == label).sum() == (topology.labels[group] == label).sum() for label in labels)
+
+    repaired = ThreeDProcessor.preprocess(mesh, workers=workers)["processed_mesh"]
+    assert repaired.is_watertight and repaired.is_winding_consistent
+    assert len(repaired.split(only_watertight=True)) == 4
+    assert all(part.volume > 0 for part in repaired.split())
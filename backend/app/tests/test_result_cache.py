@@ -0,0 +1,59 @@
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+import pytest
+from app.utils import result_cache as cache_module
+from app.utils.result_cache import ResultCache, cached_response
+
+KEY = "ab" * 32
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ResultCache(memory_budget=1024 * 1024, disk_dir=str(tmp_path), ttl=3600)
+    monkeypatch.setattr(cache_module, "result_cache", cache)
+    return cache
+
+@pytest.fixture
+def client(cache):
+    app = FastAPI()
+    app.state.computed = 0
+
+    @app.post("/result")
+    async def result(request: Request):
+        async def compute():
+            app.state.computed += 1
+            return Response(
+                content=b"payload",
+                media_type="audio/wav",
+                headers={"Content-Disposition": 'inline; filename="processed.wav"', "X-Sample-Rate": "16000"}
+            )
+        return await cached_response(request, KEY, compute)
+
+    client = TestClient(app)
+    client.app_state = app.state
+    return client
+
+def test_hit_replays_endpoint_headers(client):
+    miss = client.post("/result")
+    hit = client.post("/result")
+    assert miss.headers["x-cache"] == "MISS"
+    assert hit.headers["x-cache"] == "HIT"
+    assert hit.content == b"payload"
+    for name in ("content-disposition", "x-sample-rate", "etag"):
+        assert hit.headers[name] == miss.headers[name]
+    assert client.app_state.computed == 1
+
+def test_disk_entry_keeps_headers(cache):
+    cache.put(KEY, b"payload", "audio/wav", {"x-sample-rate": "16000"})
+    cache.clear()
+    assert cache.get(KEY) == (b"payload", "audio/wav", {"x-sample-rate": "16000"})
+
+def test_wildcard_if_none_match_requires_entry(client):
+    first = client.post("/result", headers={"If-None-Match": "*"})
+    assert first.status_code == 200
+    assert first.content == b"payload"
+    repeat = client.post("/result", headers={"If-None-Match": "*"})
+    assert repeat.status_code == 304
+
+def test_known_etag_is_not_modified(client):
+    etag = client.post("/result").headers["etag"]
+    assert client.post("/result", headers={"If-None-Match": etag}).status_code == 304
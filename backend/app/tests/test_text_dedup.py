@@ -0,0 +1,122 @@
+import json
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+from app.api.endpoints import text as text_endpoints
+from app.core.executor import WorkerPool
+from app.processors.text_processor import DuplicateFilter
+from app.utils import result_cache as cache_module
+from app.utils.dedup_index import DedupIndex
+from app.utils.result_cache import ResultCache
+
+TEXT = b"The quick brown fox jumps over the lazy dog while the cat sleeps in the sun."
+
+class StubProcessor:
+    """Stands in for TextProcessor, whose WordNet data may be missing; fails while failing is set"""
+
+    def __init__(self):
+        self.failing = False
+        self.calls = 0
+
+    def preprocess(self, text):
+        self.calls += 1
+        if self.failing:
+            raise RuntimeError("preprocessing failed")
+        return {"original_text": text, "processed_text": text.lower(), "steps": []}
+
+@pytest.fixture
+def index():
+    return DedupIndex(None, num_perm=64, bands=16, shingle_size=3, threshold=0.8)
+
+@pytest.fixture
+def processor():
+    return StubProcessor()
+
+def stub_process_shard(shard, tokenizer="nltk"):
+    """process_shard without NLTK; documents mentioning "fail" become error records"""
+    records = []
+    for doc_id, text, error, *duplicate in shard:
+        if duplicate:
+            records.append({"id": doc_id, "duplicate": duplicate[0]})
+        elif error is None and "fail" not in text:
+            records.append({"id": doc_id, "processed_text": text.lower()})
+        else:
+            records.append({"id": doc_id, "error": error or "preprocessing failed"})
+    return records
+
+@pytest.fixture
+def client(index, processor, tmp_path, monkeypatch):
+    monkeypatch.setattr(text_endpoints, "dedup_index", index)
+    monkeypatch.setattr(text_endpoints, "text_processor", processor)
+    monkeypatch.setattr(text_endpoints, "process_shard", stub_process_shard)
+    # Thread pool only, so the stub never has to be pickled
+    monkeypatch.setattr(text_endpoints, "pool", WorkerPool("text", 2, 0, 16))
+    monkeypatch.setattr(cache_module, "result_cache", ResultCache(1024 * 1024, str(tmp_path), 3600))
+    app = FastAPI()
+    app.include_router(text_endpoints.router)
+    return TestClient(app, raise_server_exceptions=False)
+
+def _preprocess(client, name="input.txt", content=TEXT, **form):
+    return client.post("/text/preprocess", files={"file": (name, content, "text/plain")},
+                       data={"dedup": "true", **form})
+
+def test_resubmission_under_the_same_name_is_a_duplicate(client, processor):
+    first = _preprocess(client)
+    assert "processed_text" in first.json()
+    second = _preprocess(client)
+    assert second.json()["duplicate"]["kind"] == "exact"
+    assert processor.calls == 1
+
+def test_different_uploads_with_a_generic_name_are_compared(client):
+    _preprocess(client)
+    other = _preprocess(client, content=TEXT.replace(b"sun", b"shade"))
+    assert other.json()["duplicate"]["kind"] == "near"
+
+def test_explicit_doc_id_excludes_itself(client):
+    _preprocess(client, doc_id="report")
+    assert "processed_text" in _preprocess(client, doc_id="report").json()
+    assert _preprocess(client, doc_id="other").json()["duplicate"]["id"] == "report"
+
+def test_failed_document_is_not_its_own_duplicate(client, index, processor):
+    processor.failing = True
+    assert _preprocess(client).status_code == 500
+    assert index.stats()["documents"] == 0
+    processor.failing = False
+    assert "processed_text" in _preprocess(client).json()
+
+def test_dedup_endpoint_resubmission(client):
+    def check(content=TEXT, **form):
+        return client.post("/text/dedup", files={"file": ("input.txt", content, "text/plain")}, data=form).json()
+    first = check()
+    assert not first["duplicate"] and first["id"] != "input.txt"
+    assert check()["match"]["id"] == first["id"]
+    other = b"An entirely different document about sampling audio signals at a fixed rate."
+    assert not check(other, doc_id="report")["duplicate"]
+    assert not check(other, doc_id="report")["duplicate"]
+
+def _batch(client, documents):
+    content = "".join(json.dumps({"id": doc_id, "text": text}) + "\n" for doc_id, text in documents)
+    response = client.post("/text/preprocess/batch", files={"file": ("batch.jsonl", content, "application/json")},
+                           data={"dedup": "true"})
+    return {record["id"]: record for record in map(json.loads, response.text.splitlines())}
+
+def test_batch_adds_documents_only_after_they_process(client, index):
+    other = "A different document about sampling audio signals at a fixed rate, which will fail."
+    first = _batch(client, [("a", TEXT.decode()), ("a-copy", TEXT.decode()), ("b", other)])
+    assert "processed_text" in first["a"]
+    assert first["a-copy"]["duplicate"]["id"] == "a"
+    assert "error" in first["b"]
+    assert index.stats()["documents"] == 1
+    # On retry the failed document is checked again, not matched against itself
+    retry = _batch(client, [("b", other.replace("fail", "pass")), ("a", TEXT.decode())])
+    assert "processed_text" in retry["b"]
+    assert retry["a"]["duplicate"]["id"] == "a"
+
+def test_filter_catches_near_duplicates_within_a_batch(index):
+    duplicates = DuplicateFilter(index)
+    text = TEXT.decode()
+    shard = list(duplicates.mark([(0, text, None), (1, text.replace("sun", "shade"), None), (2, None, "bad")]))
+    assert len(shard[0]) == 3 and shard[1][3]["kind"] == "near" and shard[2][2] == "bad"
+    assert index.stats()["documents"] == 0
+    duplicates.commit(shard, stub_process_shard(shard))
+    assert index.stats()["documents"] == 1
@@ -0,0 +1,82 @@
+import random
+import nltk
+import pytest
+from app.processors.text_processor import _PUNKT, FastTokenizer, NLTKTokenizer, TextProcessor
+
+try:
+    nltk.data.find(_PUNKT[1])
+except LookupError:
+    pytest.skip(f"NLTK {_PUNKT[0]} data not installed", allow_module_level=True)
+
+VOCABULARY = [
+    "the", "a", "dog", "runs", "fast", "mr", "dr", "u.s", "e.g", "etc", "no", "st",
+    "cannot", "gimme", "gonna", "gotta", "lemme", "wanna", "tis", "twas", "more", "n", "d", "ye",
+    "can", "not", "gon", "na", "wan", "i", "x", "ok"
+]
+SEPARATORS = [" ", " ", " ", "  ", ". ", ".", "..", "...", " . ", ".... ", " .. "]
+
+CASES = [
+    "",
+    " ",
+    ".",
+    "...",
+    "the dog runs.",
+    "the dog runs",
+    "the dog runs. the cat sleeps.",
+    "i cannot go. you gonna stay",
+    "wanna go gimme that lemme see gotta run",
+    "wanna",
+    "she said wanna. then left",
+    "the end...",
+    "wait.. what. really....",
+    "mr. smith went to washington. dr. jones stayed",
+    "u.s. e.g. etc. the list goes on.",
+    "a . b .. c ... d",
+    "tis the season twas the night",
+    "cannot.cannot. cannot",
+    "trailing spaces.   ",
+    "  leading spaces. and inner   runs  .",
+]
+
+def _random_text(rng: random.Random) -> str:
+    parts = [rng.choice(VOCABULARY)]
+    for _ in range(rng.randint(0, 30)):
+        parts.append(rng.choice(SEPARATORS))
+        parts.append(rng.choice(VOCABULARY))
+    if rng.random() < 0.5:
+        parts.append(rng.choice(SEPARATORS).rstrip() or ".")
+    return "".join(parts)
+
+FUZZED = [_random_text(random.Random(seed)) for seed in range(300)]
+
+@pytest.fixture(scope="module")
+def tokenizers():
+    return NLTKTokenizer(), FastTokenizer()
+
+@pytest.mark.parametrize("text", CASES + FUZZED)
+def test_words_match_nltk(tokenizers, text):
+    nltk_tokenizer, fast_tokenizer = tokenizers
+    assert fast_tokenizer.words(text) == nltk_tokenizer.words(text)
+
+@pytest.mark.parametrize("text", CASES + FUZZED)
+def test_sentence_words_match_nltk(tokenizers, text):
+    nltk_tokenizer, fast_tokenizer = tokenizers
+    sentences = nltk_tokenizer.sentences(text)
+    assert fast_tokenizer.sentences(text) == sentences
+    assert [fast_tokenizer.words(s) for s in sentences] == [nltk_tokenizer.words(s) for s in sentences]
+
+@pytest.mark.parametrize("text", [
+    "Hello, World! It's 3 o'clock.",
+    "He said \"don't\" (twice)...",
+    "Mr. Smith can't stay; he'll go.",
+    "Ünïcode tëxt — with dashes",
+])
+def test_normalized_text_matches_nltk(tokenizers, text):
+    nltk_tokenizer, fast_tokenizer = tokenizers
+    normalized = TextProcessor._normalize(text.strip())
+    assert fast_tokenizer.words(normalized) == nltk_tokenizer.words(normalized)
+
+@pytest.mark.parametrize("text", ["Hello, World!", "It's (not) fine.", "don't stop"])
+def test_unnormalized_text_falls_back_to_nltk(tokenizers, text):
+    nltk_tokenizer, fast_tokenizer = tokenizers
+    assert fast_tokenizer.words(text) == nltk_tokenizer.words(text)
@@ -0,0 +1,194 @@
+from typing import Any, Dict, List, NamedTuple, Optional
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+import numpy as np
+from app.core.logger import logger
+
+class Fingerprint(NamedTuple):
+    digest: str  # SHA-256 of the token stream, for exact duplicates
+    signature: np.ndarray  # MinHash signature, for near duplicates
+
+_MAX_HASH = np.uint32(0xFFFFFFFF)
+# FNV-1a 64-bit prime, used to combine token hashes into shingle hashes
+_SHINGLE_PRIME = np.uint64(1099511628211)
+# Shingles hashed per step; bounds the num_perm x block intermediate
+_BLOCK_SIZE = 4096
+
+class DedupIndex:
+    """Exact and near-duplicate index of token streams.
+
+    Exact duplicates match on a SHA-256 digest. Near duplicates are found by
+    MinHash signatures over word shingles, bucketed per LSH band and
+    confirmed when the estimated Jaccard similarity reaches the threshold.
+    Documents and buckets persist in SQLite, so repeated submissions are
+    caught across requests and restarts.
+    """
+
+    def __init__(self, path: Optional[str], num_perm: int, bands: int, shingle_size: int,
+                 threshold: float, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path or ":memory:"
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.seed = seed
+        # Multiply-shift hash family (a * x + b) >> 32, one (a, b) per permutation
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 2**62, size=num_perm, dtype=np.int64).astype(np.uint64) | np.uint64(1)
+        self._b = rng.randint(0, 2**62, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self._lock = threading.Lock()
+        self._connection = self._connect({
+            "num_perm": num_perm, "bands": bands, "shingle_size": shingle_size, "seed": seed
+        })
+
+    def _connect(self, params: Dict[str, Any]) -> sqlite3.Connection:
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        connection.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS documents (doc_id TEXT, digest TEXT, signature BLOB);
+            CREATE INDEX IF NOT EXISTS documents_digest ON documents (digest);
+            CREATE TABLE IF NOT EXISTS buckets (band INTEGER, bucket INTEGER, document INTEGER);
+            CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (band, bucket);
+        """)
+        # Signatures are only comparable under the same parameters
+        stored = connection.execute("SELECT value FROM meta WHERE key = 'params'").fetchone()
+        if stored is None:
+            with connection:
+                connection.execute("INSERT INTO meta VALUES ('params', ?)", (json.dumps(params, sort_keys=True),))
+        elif json.loads(stored[0]) != params:
+            connection.close()
+            raise ValueError(f"Dedup index {self.path} was built with {stored[0]}, not {json.dumps(params, sort_keys=True)}")
+        return connection
+
+    def fingerprint(self, tokens: List[str]) -> Fingerprint:
+        digest = hashlib.sha256(" ".join(tokens).encode('utf-8')).hexdigest()
+        return Fingerprint(digest, self.signature(tokens))
+
+    def signature(self, tokens: List[str]) -> np.ndarray:
+        """MinHash signature of the word shingles in tokens; all _MAX_HASH when empty"""
+        signature = np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        if not tokens:
+            return signature
+        vocabulary = {token: zlib.crc32(token.encode('utf-8')) for token in set(tokens)}
+        token_hashes = np.fromiter((vocabulary[token] for token in tokens), dtype=np.uint64, count=len(tokens))
+
+        # Documents shorter than a shingle become a single shingle
+        width = min(self.shingle_size, len(tokens))
+        count = len(tokens) - width + 1
+        shingles = np.zeros(count, dtype=np.uint64)
+        for offset in range(width):
+            shingles = shingles * _SHINGLE_PRIME + token_hashes[offset:offset + count]
+        shingles = np.unique(shingles)
+
+        for start in range(0, len(shingles), _BLOCK_SIZE):
+            block = shingles[start:start + _BLOCK_SIZE]
+            # uint64 arithmetic wraps, which the multiply-shift family relies on
+            hashed = (np.outer(self._a, block) + self._b[:, None]) >> np.uint64(32)
+            np.minimum(signature, hashed.min(axis=1).astype(np.uint32), out=signature)
+        return signature
+
+    def _band_buckets(self, signature: np.ndarray) -> List[int]:
+        return [
+            int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8).digest(), 'little', signed=True)
+            for band in signature.reshape(self.bands, self.rows)
+        ]
+
+    def _query(self, fingerprint: Fingerprint, exclude: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        row = self._connection.execute(
+            "SELECT doc_id FROM documents WHERE digest = ? AND doc_id IS NOT ? LIMIT 1", (fingerprint.digest, exclude)
+        ).fetchone()
+        if row is not None:
+            return {"id": row[0], "kind": "exact", "similarity": 1.0}
+        if (fingerprint.signature == _MAX_HASH).all():
+            return None
+
+        candidates = set()
+        for band, bucket in enumerate(self._band_buckets(fingerprint.signature)):
+            candidates.update(document for (document,) in self._connection.execute(
+                "SELECT document FROM buckets WHERE band = ? AND bucket = ?", (band, bucket)
+            ))
+        best = None
+        for document in candidates:
+            doc_id, blob = self._connection.execute(
+                "SELECT doc_id, signature FROM documents WHERE rowid = ?", (document,)
+            ).fetchone()
+            if doc_id == exclude:
+                continue
+            similarity = float((np.frombuffer(blob, dtype=np.uint32) == fingerprint.signature).mean())
+            if similarity >= self.threshold and (best is None or similarity > best["similarity"]):
+                best = {"id": doc_id, "kind": "near", "similarity": similarity}
+        return best
+
+    def _add(self, doc_id: Any, fingerprint: Fingerprint) -> None:
+        known = self._connection.execute(
+            "SELECT 1 FROM documents WHERE doc_id = ? AND digest = ? LIMIT 1", (str(doc_id), fingerprint.digest)
+        ).fetchone()
+        if known is not None:
+            return
+        with self._connection:
+            document = self._connection.execute(
+                "INSERT INTO documents VALUES (?, ?, ?)",
+                (str(doc_id), fingerprint.digest, fingerprint.signature.tobytes())
+            ).lastrowid
+            if not (fingerprint.signature == _MAX_HASH).all():
+                self._connection.executemany(
+                    "INSERT INTO buckets VALUES (?, ?, ?)",
+                    [(band, bucket, document) for band, bucket in enumerate(self._band_buckets(fingerprint.signature))]
+                )
+
+    def check(self, doc_id: Any, tokens: List[str], add: bool = True,
+              exclude_self: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Look tokens up in the index and return the best match, {"id", "kind"
+        ("exact" or "near"), "similarity"}, or None. Unmatched documents are
+        added under doc_id when add is set. With exclude_self, documents
+        stored under the same doc_id never match, so a resubmission is not
+        its own duplicate.
+        """
+        return self.check_fingerprint(doc_id, self.fingerprint(tokens), add=add, exclude_self=exclude_self)
+
+    def check_fingerprint(self, doc_id: Any, fingerprint: Fingerprint, add: bool = True,
+                          exclude_self: bool = False) -> Optional[Dict[str, Any]]:
+        """check() for a fingerprint computed beforehand"""
+        with self._lock:
+            match = self._query(fingerprint, str(doc_id) if exclude_self else None)
+            if match is None and add:
+                self._add(doc_id, fingerprint)
+        return match
+
+    def add(self, doc_id: Any, fingerprint: Fingerprint) -> None:
+        """Add a document without looking it up, e.g. once it was processed successfully"""
+        with self._lock:
+            self._add(doc_id, fingerprint)
+
+    def scratch(self) -> "DedupIndex":
+        """Empty in-memory index with the same parameters, whose fingerprints are comparable with this one's"""
+        return DedupIndex(None, self.num_perm, self.bands, self.shingle_size, self.threshold, self.seed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            documents = self._connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {
+            "documents": documents,
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "shingle_size": self.shingle_size,
+            "threshold": self.threshold,
+            "path": self.path
+        }
+
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM buckets")
+            self._connection.execute("DELETE FROM documents")
+        logger.info(f"Cleared dedup index {self.path}")
@@ -1,14 +1,83 @@
-from fastapi import HTTPException
-from typing import List, Set, Dict, Any
+from fastapi import HTTPException, UploadFile
+from typing import List, Set, Dict, Any, BinaryIO, Optional, Tuple, Union
+import io
+import mmap
 import os
 import shutil
 import hashlib
+import tarfile
+import tempfile
 import time
+import zipfile
 from app.core.config import settings
 from app.core.logger import logger
 
+class SpooledUpload:
+    """Upload content held in memory or, past the spool threshold, in a temp file"""
+
+    def __init__(self, name: str, content_type: Optional[str], file_hash: str, size: int,
+                 data: Optional[bytes] = None, path: Optional[str] = None):
+        self.name = name
+        self.content_type = content_type
+        self.hash = file_hash
+        self.size = size
+        self._data = data
+        self._path = path
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "hash": self.hash,
+            "size": self.size,
+            "name": self.name
+        }
+
+    @property
+    def on_disk(self) -> bool:
+        return self._path is not None
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        """Picklable handle for worker processes: the bytes if in memory, else the temp file path"""
+        return self._path if self.on_disk else self._data
+
+    def open(self) -> BinaryIO:
+        """Return a fresh file-like view of the content"""
+        return FileHandler.open_source(self.source)
+
+    def read(self) -> bytes:
+        if not self.on_disk:
+            return self._data
+        with open(self._path, "rb") as f:
+            return f.read()
+
+    def mmap(self) -> Union[memoryview, mmap.mmap]:
+        """Zero-copy read-only view of the content"""
+        if not self.on_disk:
+            return memoryview(self._data)
+        if self.size == 0:
+            return memoryview(b"")
+        with open(self._path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self) -> None:
+        self._data = None
+        if self._path is not None:
+            try:
+                os.remove(self._path)
+            except FileNotFoundError:
+                pass
+            self._path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
 class FileHandler:
     UPLOAD_DIR = "uploads"
+    ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
     
     @staticmethod
     def validate_file_type(content_type: str, allowed_types: Set[str]) -> bool:
@@ -23,7 +92,7 @@ class FileHandler:
         file_hash = hashlib.sha256(file_content).hexdigest()
         file_size = len(file_content)
         
-        if file_size > 100 * 1024 * 1024:  # 100MB
+        if file_size > settings.MAX_UPLOAD_SIZE:
             raise HTTPException(status_code=413, detail="File too large")
             
         return {
@@ -32,6 +101,100 @@ class FileHandler:
             "name": file_name
         }
 
+    @staticmethod
+    async def ingest_upload(file: UploadFile, max_size: Optional[int] = None) -> SpooledUpload:
+        """Read an upload in chunks, hashing and enforcing size limits as it streams in.
+
+        Content stays in memory up to UPLOAD_SPOOL_THRESHOLD and is spooled to a
+        temp file under UPLOAD_TEMP_DIR beyond that. max_size defaults to
+        MAX_UPLOAD_SIZE. Callers must close() the result.
+        """
+        limit = max_size or settings.MAX_UPLOAD_SIZE
+        hasher = hashlib.sha256()
+        size = 0
+        buffer = io.BytesIO()
+        spool = None
+
+        try:
+            while True:
+                chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    raise HTTPException(status_code=413, detail="File too large")
+                hasher.update(chunk)
+
+                if spool is None and size > settings.UPLOAD_SPOOL_THRESHOLD:
+                    os.makedirs(settings.UPLOAD_TEMP_DIR, exist_ok=True)
+                    spool = tempfile.NamedTemporaryFile(
+                        dir=settings.UPLOAD_TEMP_DIR, prefix="upload_", delete=False
+                    )
+                    spool.write(buffer.getbuffer())
+                    buffer = None
+                if spool is not None:
+                    spool.write(chunk)
+                else:
+                    buffer.write(chunk)
+        except BaseException:
+            # Also on CancelledError, raised when the client disconnects mid-upload
+            if spool is not None:
+                spool.close()
+                os.remove(spool.name)
+            raise
+
+        if spool is not None:
+            spool.close()
+            return SpooledUpload(file.filename, file.content_type, hasher.hexdigest(), size, path=spool.name)
+        return SpooledUpload(file.filename, file.content_type, hasher.hexdigest(), size, data=buffer.getvalue())
+
+    @staticmethod
+    def is_archive(file_name: str) -> bool:
+        return file_name.lower().endswith(FileHandler.ARCHIVE_EXTENSIONS)
+
+    @staticmethod
+    def extract_archive(upload: SpooledUpload, allowed_extensions: Set[str],
+                        max_member_size: int, max_members: int) -> List[Tuple[str, bytes]]:
+        """Extract matching members of a zip or tar upload, enforcing per-member and total limits"""
+        members = []
+        total_size = 0
+
+        def accept(name: str, size: int) -> bool:
+            nonlocal total_size
+            if os.path.splitext(name)[1].lower() not in allowed_extensions:
+                return False
+            if size > max_member_size:
+                raise HTTPException(status_code=413, detail=f"Archive member too large: {name}")
+            total_size += size
+            if total_size > settings.MAX_UPLOAD_SIZE:
+                raise HTTPException(status_code=413, detail="Archive contents too large")
+            if len(members) >= max_members:
+                raise HTTPException(status_code=413, detail="Too many files in archive")
+            return True
+
+        try:
+            with upload.open() as f:
+                if upload.name.lower().endswith('.zip'):
+                    with zipfile.ZipFile(f) as archive:
+                        for info in archive.infolist():
+                            if not info.is_dir() and accept(info.filename, info.file_size):
+                                members.append((info.filename, archive.read(info)))
+                else:
+                    with tarfile.open(fileobj=f, mode="r:*") as archive:
+                        for info in archive:
+                            if info.isfile() and accept(info.name, info.size):
+                                members.append((info.name, archive.extractfile(info).read()))
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid archive: {str(e)}")
+        return members
+
+    @staticmethod
+    def open_source(source: Union[bytes, str]) -> BinaryIO:
+        """Open a SpooledUpload.source (bytes or temp file path) as a binary file object"""
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return io.BytesIO(source)
+        return open(source, "rb")
+
     @staticmethod
     def save_upload_file(file_name: str, file_content, metadata: Dict[str, Any]) -> str:
         """Save uploaded file with metadata validation"""
@@ -0,0 +1,24 @@
+from typing import Dict, Iterable, Optional, Tuple
+import uuid
+
+def new_boundary() -> str:
+    return uuid.uuid4().hex
+
+def multipart_media_type(boundary: str) -> str:
+    return f"multipart/mixed; boundary={boundary}"
+
+def encode_part(boundary: str, body: bytes, content_type: str,
+                headers: Optional[Dict[str, str]] = None) -> bytes:
+    """Encode one part of a multipart/mixed body, including its leading boundary"""
+    lines = [f"--{boundary}", f"Content-Type: {content_type}", f"Content-Length: {len(body)}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('utf-8') + body + b"\r\n"
+
+def encode_end(boundary: str) -> bytes:
+    return f"--{boundary}--\r\n".encode('utf-8')
+
+def encode_multipart(parts: Iterable[Tuple[bytes, str, Optional[Dict[str, str]]]]) -> Tuple[bytes, str]:
+    """Build a complete multipart/mixed body from (body, content type, extra headers) parts"""
+    boundary = new_boundary()
+    body = b"".join(encode_part(boundary, *part) for part in parts) + encode_end(boundary)
+    return body, multipart_media_type(boundary)
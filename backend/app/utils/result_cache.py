@@ -0,0 +1,284 @@
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from app.core.config import settings
+from app.core.logger import logger
+
+class CachedResult(NamedTuple):
+    body: bytes
+    media_type: str
+    headers: Dict[str, str] = {}  # response headers replayed on a hit, e.g. Content-Disposition
+
+# Headers owned by the cache or recomputed per response; never stored with an entry
+UNCACHED_HEADERS = {"content-length", "content-type", "content-range", "accept-ranges", "etag", "x-cache"}
+
+KEY_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+class ResultCache:
+    """Two-tier cache of rendered responses keyed by input hash and processing parameters.
+
+    The memory tier is an LRU bounded by total body size; the disk tier keeps
+    one file per key and expires entries older than the TTL.
+    """
+
+    def __init__(self, memory_budget: int, disk_dir: Optional[str], ttl: int):
+        self.memory_budget = memory_budget
+        self.disk_dir = disk_dir
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, CachedResult]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(content_hash: str, endpoint: str, params: Dict[str, Any], version: str) -> str:
+        """Build a cache key from the content hash, endpoint, canonicalized params and processor version"""
+        canonical = json.dumps(
+            {"hash": content_hash, "endpoint": endpoint, "params": params, "version": version},
+            sort_keys=True,
+            separators=(',', ':'),
+            default=str
+        )
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return result
+
+        result = self._read_disk(key)
+        with self._lock:
+            if result is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["disk_hits"] += 1
+        self._store_memory(key, result)
+        return result
+
+    def put(self, key: str, body: bytes, media_type: str,
+            headers: Optional[Dict[str, str]] = None) -> None:
+        result = CachedResult(body, media_type, dict(headers or {}))
+        self._store_memory(key, result)
+        self._write_disk(key, result)
+        with self._lock:
+            self._counters["stores"] += 1
+            sweep = self._counters["stores"] % 100 == 0
+        if sweep:
+            self.evict_expired()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["memory_hits"] + self._counters["disk_hits"] + self._counters["misses"]
+            hits = lookups - self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "memory_budget": self.memory_budget
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def evict_expired(self) -> int:
+        """Remove disk entries older than the TTL; returns the number removed"""
+        if not self.disk_dir or not os.path.isdir(self.disk_dir):
+            return 0
+        removed = 0
+        cutoff = time.time() - self.ttl
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    pass
+        with self._lock:
+            self._counters["evictions"] += removed
+        return removed
+
+    def _store_memory(self, key: str, result: CachedResult) -> None:
+        size = len(result.body)
+        # Entries too large for a fair share of the budget only live on disk
+        if size > self.memory_budget // 4:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous.body)
+            self._memory[key] = result
+            self._memory_bytes += size
+            while self._memory_bytes > self.memory_budget:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted.body)
+                self._counters["evictions"] += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def _read_disk(self, key: str) -> Optional[CachedResult]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                with self._lock:
+                    self._counters["evictions"] += 1
+                return None
+            with open(path, "rb") as f:
+                meta = json.loads(f.readline())
+                return CachedResult(f.read(), meta["media_type"], meta["headers"])
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Error reading cache entry {key}: {str(e)}")
+            return None
+
+    def _write_disk(self, key: str, result: CachedResult) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file first so readers never see a partial entry
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                meta = {"media_type": result.media_type, "headers": result.headers}
+                f.write(json.dumps(meta, separators=(',', ':')).encode('utf-8') + b"\n")
+                f.write(result.body)
+            os.replace(temp_path, path)
+        except Exception as e:
+            logger.warning(f"Error writing cache entry {key}: {str(e)}")
+
+result_cache = ResultCache(
+    memory_budget=settings.RESULT_CACHE_MEMORY_BYTES,
+    disk_dir=settings.RESULT_CACHE_DIR or None,
+    ttl=settings.RESULT_CACHE_TTL
+)
+
+def is_not_modified(request: Request, etag: str, exists: bool = True) -> bool:
+    """Check the If-None-Match header against an ETag; "*" only matches when the entry exists"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return (exists and "*" in candidates) or etag in candidates or f"W/{etag}" in candidates
+
+def replayable_headers(response: Response) -> Dict[str, str]:
+    """Headers set by the endpoint itself, stored with the body so a hit can replay them"""
+    return {name: value for name, value in response.headers.items() if name not in UNCACHED_HEADERS}
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=" range into inclusive (start, end) offsets.
+    Returns None when the header should be ignored (other units, multiple
+    ranges, malformed) and raises ValueError when the range is unsatisfiable.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    if (first and not first.isdigit()) or (last and not last.isdigit()) or not (first or last):
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        if int(last) == 0 or size == 0:
+            raise ValueError("Unsatisfiable suffix range")
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if last and end < start:
+        return None
+    if start >= size:
+        raise ValueError("Range starts past the end")
+    return start, min(end, size - 1)
+
+def body_response(request: Request, body: bytes, media_type: str,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """Response for a complete body that honours Range and If-Range requests"""
+    headers = {**(headers or {}), "Accept-Ranges": "bytes"}
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range == headers.get("ETag")):
+        try:
+            span = parse_range(range_header, len(body))
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{len(body)}"})
+        if span is not None:
+            start, end = span
+            return Response(
+                content=body[start:end + 1],
+                status_code=206,
+                media_type=media_type,
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{len(body)}"}
+            )
+    return Response(content=body, media_type=media_type, headers=headers)
+
+async def cached_response(request: Request, key: str,
+                          compute: Callable[[], Awaitable[Response]],
+                          headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Serve a response from the result cache, computing and storing it on a miss.
+    Cached bodies can also be fetched by key from /api/v1/cache/results/{key}.
+    """
+    etag = f'"{key}"'
+    headers = {**(headers or {}), "ETag": etag}
+
+    if not settings.RESULT_CACHE_ENABLED:
+        response = await compute()
+        response.headers.update(headers)
+        return response
+
+    # A known ETag can be answered without a lookup; "*" needs the entry to exist
+    if is_not_modified(request, etag, exists=False):
+        return Response(status_code=304, headers=headers)
+
+    cached = await run_in_threadpool(result_cache.get, key)
+    if cached is not None:
+        if is_not_modified(request, etag):
+            return Response(status_code=304, headers=headers)
+        return body_response(request, cached.body, cached.media_type,
+                             {**cached.headers, **headers, "X-Cache": "HIT"})
+
+    response = await compute()
+    if response.status_code == 200:
+        extra = replayable_headers(response)
+        await run_in_threadpool(result_cache.put, key, response.body, response.media_type, extra)
+        headers["Accept-Ranges"] = "bytes"
+        if request.headers.get("range"):
+            return body_response(request, response.body, response.media_type,
+                                 {**extra, **headers, "X-Cache": "MISS"})
+    response.headers.update({**headers, "X-Cache": "MISS"})
+    return response
+
+async def stored_response(request: Request, key: str) -> Optional[Response]:
+    """Serve a previously cached result by key, or None when it is not cached"""
+    if not KEY_PATTERN.match(key):
+        return None
+    etag = f'"{key}"'
+    if is_not_modified(request, etag, exists=False):
+        return Response(status_code=304, headers={"ETag": etag})
+    cached = await run_in_threadpool(result_cache.get, key)
+    if cached is None:
+        return None
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return body_response(request, cached.body, cached.media_type,
+                         {**cached.headers, "ETag": etag, "X-Cache": "HIT"})
@@ -0,0 +1,108 @@
+"""
+ImageProcessor.preprocess on large RGB images against the Pillow enhance
+chain it replaced, with the per-pixel steps (contrast through brightness)
+timed separately from the median and sharpness filters both share.
+
+Memory of the pixel steps is reported twice, each run in a fresh process:
+the tracemalloc peak, which sees NumPy arrays but not Pillow's image
+buffers, and the growth of peak RSS (Linux), which sees both.
+
+Run from backend/:  python -m benchmarks.bench_image_preprocess --size 4096
+"""
+import argparse
+import multiprocessing
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image, ImageEnhance, ImageFilter
+from app.processors.image_processor import ImageProcessor
+
+def timed(func, *args, repeat: int = 1):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def pillow_pixel_steps(image: Image.Image, grayscale: bool) -> Image.Image:
+    image = ImageEnhance.Contrast(image).enhance(1.2)
+    if grayscale:
+        image = image.convert('L').convert('RGB')
+    image = ImageEnhance.Color(image).enhance(1.2)
+    return ImageEnhance.Brightness(image).enhance(1.1)
+
+def pillow_preprocess(image: Image.Image) -> Image.Image:
+    """The default preprocess chain (no grayscale, normalize or resize) before it was fused"""
+    image = ImageEnhance.Sharpness(image.filter(ImageFilter.MedianFilter(size=3))).enhance(1.5)
+    return pillow_pixel_steps(image, grayscale=False)
+
+def fused_pixel_steps(image: Image.Image, grayscale: bool) -> Image.Image:
+    pixels = ImageProcessor._fused_contrast(np.asarray(image), 1.2, grayscale)
+    return Image.fromarray(ImageProcessor._fused_color_brightness(pixels, 1.2, 1.1))
+
+def _peak_rss() -> int:
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmHWM:"))
+
+def _measure(func, args, queue):
+    try:
+        # Reset the RSS high-water mark to the current RSS
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        baseline = _peak_rss()
+    except OSError:
+        baseline = None
+    tracemalloc.start()
+    func(*args)
+    traced = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    queue.put((traced, None if baseline is None else _peak_rss() - baseline))
+
+def peak_memory(func, *args):
+    """(tracemalloc peak, peak RSS growth or None) of one call of func in a fresh process"""
+    # Spawned, so neither Pillow's block cache nor freed heap from the timing runs is reused
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(func, args, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+def _megabytes(size) -> str:
+    return "n/a" if size is None else f"{size / 1e6:.0f} MB"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=4096)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    # Smooth content plus noise, so the median and sharpness filters do real work
+    ramp = np.linspace(0, 200, args.size, dtype=np.float32)
+    base = np.stack([ramp[None, :] + 0 * ramp[:, None], ramp[:, None] + 0 * ramp[None, :],
+                     np.full((args.size, args.size), 100, dtype=np.float32)], axis=-1)
+    image = Image.fromarray(np.clip(base + rng.normal(0, 20, base.shape), 0, 255).astype(np.uint8))
+    filtered = ImageEnhance.Sharpness(image.filter(ImageFilter.MedianFilter(size=3))).enhance(1.5)
+    print(f"{args.size}x{args.size} RGB, best of {args.repeat}")
+
+    for grayscale in (False, True):
+        expected, pillow_seconds = timed(pillow_pixel_steps, filtered, grayscale, repeat=args.repeat)
+        actual, fused_seconds = timed(fused_pixel_steps, filtered, grayscale, repeat=args.repeat)
+        diff = np.abs(np.asarray(actual, dtype=np.int16) - np.asarray(expected, dtype=np.int16)).max()
+        print(f"pixel steps, grayscale={grayscale}: pillow {pillow_seconds:.2f}s, "
+              f"fused {fused_seconds:.2f}s, max diff {diff}")
+        for name, func in (("pillow", pillow_pixel_steps), ("fused", fused_pixel_steps)):
+            traced, rss = peak_memory(func, filtered, grayscale)
+            print(f"  {name:>6} memory: tracemalloc peak {_megabytes(traced)}, peak RSS growth {_megabytes(rss)}")
+
+    expected, pillow_seconds = timed(pillow_preprocess, image)
+    actual, fused_seconds = timed(lambda: ImageProcessor.preprocess(image)["processed_image"])
+    diff = np.abs(np.asarray(actual, dtype=np.int16) - np.asarray(expected, dtype=np.int16)).max()
+    print(f"end to end: pillow {pillow_seconds:.2f}s, preprocess {fused_seconds:.2f}s, max diff {diff}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Word tokenization throughput of the "nltk" and "fast" backends on a
+synthetic Zipfian corpus, normalized the way TextProcessor.preprocess
+normalizes it. Output of the two backends is compared as well.
+
+Run from backend/:  python -m benchmarks.bench_tokenizers --megabytes 5
+"""
+import argparse
+import random
+import time
+import numpy as np
+from app.processors.text_processor import FastTokenizer, NLTKTokenizer, TextProcessor
+
+WORDS = [
+    "the", "of", "and", "to", "in", "a", "is", "that", "for", "it", "as", "was", "with", "be",
+    "by", "on", "not", "he", "this", "are", "or", "his", "from", "at", "which", "but", "have",
+    "an", "had", "they", "you", "were", "their", "one", "all", "we", "can", "her", "has", "there",
+    "cannot", "gonna", "wanna", "gotta", "mr.", "dr.", "u.s.", "e.g.", "etc.", "processing",
+    "data", "model", "signal", "mesh", "image", "audio", "sample", "vertex", "result", "value"
+]
+
+def make_corpus(size: int, seed: int) -> str:
+    rng = random.Random(seed)
+    weights = 1.0 / np.arange(1, len(WORDS) + 1)  # Zipf's law
+    parts, length = [], 0
+    while length < size:
+        sentence = " ".join(rng.choices(WORDS, weights=weights, k=rng.randint(5, 30)))
+        sentence = sentence[0].upper() + sentence[1:] + rng.choice([".", ".", "...", "!", "?"]) + " "
+        parts.append(sentence)
+        length += len(sentence)
+    return "".join(parts)
+
+def run(tokenizer, sentences):
+    start = time.perf_counter()
+    tokens = [tokenizer.words(sentence) for sentence in sentences]
+    return tokens, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megabytes", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    text = TextProcessor._normalize(make_corpus(int(args.megabytes * 1024 * 1024), args.seed))
+    start = time.perf_counter()
+    sentences = NLTKTokenizer().sentences(text)
+    split = time.perf_counter() - start
+    print(f"{len(text) / 1e6:.1f} MB, {len(sentences)} sentences, split in {split:.2f}s")
+
+    reference, nltk_seconds = run(NLTKTokenizer(), sentences)
+    fast, fast_seconds = run(FastTokenizer(), sentences)
+    mismatches = sum(a != b for a, b in zip(reference, fast))
+    for name, seconds in (("nltk", nltk_seconds), ("fast", fast_seconds)):
+        print(f"{name:>5}: {seconds:.2f}s, {len(text) / 1e6 / seconds:.1f} MB/s")
+    print(f"speedup {nltk_seconds / fast_seconds:.1f}x, {mismatches} mismatching sentences")
+
+if __name__ == "__main__":
+    main()
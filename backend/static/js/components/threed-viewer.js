@@ -47,6 +47,34 @@ class ThreeDViewer {
         this.renderer.render(this.scene, this.camera);
     }
 
+    static parseBinaryMesh(arrayBuffer) {
+        // Container layout: "MSHB", uint32 version, uint32 header length,
+        // JSON header, then float32 positions/normals and uint32 indices
+        const view = new DataView(arrayBuffer);
+        const magic = String.fromCharCode(...new Uint8Array(arrayBuffer, 0, 4));
+        if (magic !== 'MSHB') {
+            throw new Error('Invalid binary mesh data');
+        }
+        const headerLength = view.getUint32(8, true);
+        const headerText = new TextDecoder().decode(new Uint8Array(arrayBuffer, 12, headerLength));
+        const header = JSON.parse(headerText);
+        const bodyOffset = 12 + headerLength;
+
+        const meshes = {};
+        header.meshes.forEach((entry) => {
+            const geometry = new THREE.BufferGeometry();
+            const positions = new Float32Array(arrayBuffer, bodyOffset + entry.position.offset, entry.position.length / 4);
+            const normals = new Float32Array(arrayBuffer, bodyOffset + entry.normal.offset, entry.normal.length / 4);
+            const indices = new Uint32Array(arrayBuffer, bodyOffset + entry.index.offset, entry.index.length / 4);
+            geometry.setAttribute('position', new THREE.BufferAttribute(positions, 3));
+            geometry.setAttribute('normal', new THREE.BufferAttribute(normals, 3));
+            geometry.setIndex(new THREE.BufferAttribute(indices, 1));
+            meshes[entry.name] = geometry;
+        });
+
+        return { metadata: header.metadata, meshes };
+    }
+
     async handleFileUpload(response) {
         try {
             const meshData = response.mesh_data;
@@ -68,41 +96,57 @@ class ThreeDViewer {
             // Calculate normals
             geometry.computeVertexNormals();
             
-            // Create mesh
-            const material = new THREE.MeshPhongMaterial({
-                color: 0x808080,
-                side: THREE.DoubleSide
-            });
-            
-            if (this.mesh) {
-                this.scene.remove(this.mesh);
+            this.showGeometry(geometry, response.validation);
+        } catch (error) {
+            console.error('Error loading 3D model:', error);
+            showAlert('danger', 'Error loading 3D model');
+        }
+    }
+
+    async handleBinaryUpload(arrayBuffer) {
+        try {
+            const { metadata, meshes } = ThreeDViewer.parseBinaryMesh(arrayBuffer);
+            if (!meshes.mesh_data) {
+                throw new Error('No mesh data received');
             }
-            
-            this.mesh = new THREE.Mesh(geometry, material);
-            this.scene.add(this.mesh);
-            
-            // Center and scale the model
-            geometry.computeBoundingSphere();
-            const center = geometry.boundingSphere.center;
-            const radius = geometry.boundingSphere.radius;
-            
-            this.mesh.position.sub(center);
-            const scale = 2 / radius;
-            this.mesh.scale.multiplyScalar(scale);
-            
-            // Update camera
-            this.camera.position.z = 5;
-            this.controls.reset();
-            
-            // Display model info
-            this.displayModelInfo(response.validation);
-            
+            this.showGeometry(meshes.mesh_data, metadata.validation);
         } catch (error) {
             console.error('Error loading 3D model:', error);
             showAlert('danger', 'Error loading 3D model');
         }
     }
 
+    showGeometry(geometry, validation) {
+        // Create mesh
+        const material = new THREE.MeshPhongMaterial({
+            color: 0x808080,
+            side: THREE.DoubleSide
+        });
+        
+        if (this.mesh) {
+            this.scene.remove(this.mesh);
+        }
+        
+        this.mesh = new THREE.Mesh(geometry, material);
+        this.scene.add(this.mesh);
+        
+        // Center and scale the model
+        geometry.computeBoundingSphere();
+        const center = geometry.boundingSphere.center;
+        const radius = geometry.boundingSphere.radius;
+        
+        this.mesh.position.sub(center);
+        const scale = 2 / radius;
+        this.mesh.scale.multiplyScalar(scale);
+        
+        // Update camera
+        this.camera.position.z = 5;
+        this.controls.reset();
+        
+        // Display model info
+        this.displayModelInfo(validation);
+    }
+
     displayModelInfo(validation) {
         const infoDiv = document.getElementById('originalModelInfo');
         if (infoDiv) {
@@ -102,7 +102,7 @@ function displayImageContent(response) {
     if (container && response.image_data) {
         container.innerHTML = `
             <div class="image-container">
-                <img src="data:image/png;base64,${response.image_data}" class="img-fluid" alt="Uploaded image" />
+                <img src="data:${response.content_type || 'image/png'};base64,${response.image_data}" class="img-fluid" alt="Uploaded image" />
             </div>`;
     }
 }
@@ -113,7 +113,7 @@ function displayAudioContent(response) {
         container.innerHTML = `
             <div class="audio-container">
                 <audio controls class="w-100">
-                    <source src="data:audio/mpeg;base64,${response.audio_data}" type="audio/mpeg">
+                    <source src="data:${response.content_type || 'audio/wav'};base64,${response.audio_data}" type="${response.content_type || 'audio/wav'}">
                     Your browser does not support the audio element.
                 </audio>
             </div>`;
@@ -390,7 +390,7 @@ function displayProcessedContent(result, fileType) {
             container.innerHTML = `
                 <div class="audio-container">
                     <audio controls class="w-100">
-                        <source src="data:audio/wav;base64,${result.processed_audio}" type="audio/wav">
+                        <source src="data:${result.media_type || 'audio/wav'};base64,${result.processed_audio}" type="${result.media_type || 'audio/wav'}">
                         Your browser does not support the audio element.
                     </audio>
                     ${result.steps ? `
@@ -528,7 +528,7 @@ function displayAugmentedContent(result, fileType) {
                                  data-bs-parent="#augmentedAudioAccordion">
                                 <div class="accordion-body">
                                     <audio controls class="w-100">
-                                        <source src="data:audio/wav;base64,${audioData}" type="audio/wav">
+                                        <source src="data:${result.media_type || 'audio/wav'};base64,${audioData}" type="${result.media_type || 'audio/wav'}">
                                         Your browser does not support the audio element.
                                     </audio>
                                 </div>